@@ -1,216 +1,408 @@
+import argparse
+import sys
 import pandas as pd
 from scripts.dataEngine import ThermalDispatchInput  # Correct import
-from scripts.dispatchBase import DispatchModel
-from scripts.dispatchPpa import DispatchModelPPA
+from scripts.contractConfig import ContractConfigError, mover_closure
 from scripts.report import OutputReport
+from scripts.export import ResultExporter, FORMATS, read_export, missing_package
+from scripts import instrumentation
 from datetime import datetime
 import time
 
 # Defining the file path for the Excel file
 file_path = "inputs/Thermal_Dispatch_Input.xlsx"
+# Snapshot cache of the parsed workbook and the feature frame (None disables it)
+cache_dir = "cache"
+# Reuse yearly results from cache_dir whose inputs are unchanged; also resumes an interrupted run
+reuse_results = True
+# Model builder: "pyomo" builds expressions per hour, "matrix" assembles the sparse matrix from NumPy arrays,
+# "dp" solves each unit exactly by dynamic programming (MILP only for check_maint_con or uncertified years),
+# "persistent" reuses one Pyomo template per horizon length and contract type and only updates its parameters
+model_engine = "pyomo"
+# Commitment formulation of the MILP engines: "tight" (same optimum, stronger LP relaxation, fewer rows) or "weak"
+formulation = "tight"
+# Reports: "xlsx" (one streamed workbook), "parquet" or "csv" (gzip), written to output_dir
+output_dir = "output"
+export_format = "xlsx"
+# Solve each base year as overlapping windows of this many months in parallel (None solves whole years)
+decompose_months = None
+# MILP backend ("scip", "highs" in-process, "cbc") and its per-run limits; solver_path None finds the binary on PATH
+solve_options = {"solver_name": "scip", "solver_path": None, "time_limit": None, "threads": None, "presolve": None}
+# Contracts to run (None runs the Base unit and every enabled PPA; movers of the ones named are added) and
+# the first and last year to solve (None solves every contract year)
+contracts = None
+years = None
+# Year range of the monthly report tables, and the contract of the ON_base/Percent On_base sheets
+report_years = (2025, 2050)
+report_contract = "PPA2"
+# Solve each year on this many representative days/weeks (aggregate_by) instead of every hour (None);
+# aggregate_check_year is also solved in full and the aggregation error reported
+aggregate_periods = None
+aggregate_by = "day"
+aggregate_check_year = 2025
+# Solve a mover and the PPAs following it (Mover_Dependency) as one joint model per year instead of one
+# after another; uses the Pyomo builder and replaces decompose_months for the Base group
+fleet_model = False
+# Seed every solve with a feasible commitment from the price-spread heuristic. HiGHS takes it with every
+# engine, SCIP only with the matrix engine (its Pyomo interface reads no start, so the heuristic is skipped
+# there) and CBC with the Pyomo engine when its binary can
+warm_start = True
+# Fix the hours whose commitment the prices and costs already decide before the MILP is solved
+prescreen = True
+# Worker processes for the independent yearly solves (None uses every core)
+n_workers = None
+# Models built ahead of the solver when years run one after another (a single worker, decompose_months)
+pipeline_depth = 1
+# Monte Carlo price paths to value every contract under (None skips the scenario run) and their seed
+n_scenarios = None
+scenario_seed = 0
+# Phase timings (wall, CPU, peak memory with instrument_memory) are written to output_dir as JSON or CSV;
+# profile_phase (e.g. "solver call") runs that phase under cProfile and dumps the stats to output_dir/profiles
+timings_file = "timings.json"
+instrument_memory = False
+profile_phase = None
 
-# Creating an instance of the ThermalDispatchInput class
-time_1 = time.time()
-print("Reading Inputs...")
-thermal_input = ThermalDispatchInput(file_path)
-time_2 = time.time()
-print(f"Reading Inputs finished (took {time_2 - time_1} seconds)...")
-# Creating a new dataframe based on df_lmp
-df_new = thermal_input.df_lmp.copy()
-
-time_3 = time.time()
-print("Getting inputs for base...")
-# Apply functions in order
-df_new = thermal_input.add_gas(df_new)
-df_new = thermal_input.add_vom(df_new)
-df_new = thermal_input.add_gox(df_new, "NOx")
-df_new = thermal_input.add_gox(df_new, "SOx")
-df_new = thermal_input.add_gox(df_new, "CO2")
-
-# Base model inputs
-gas_price_col = thermal_input.get_hub("Gas_Hub","Base")
-power_price_col = thermal_input.get_hub("LMP_Hub","Base")
-nox_zone = thermal_input.get_gox_zone("NOx", "Base")
-co2_zone = thermal_input.get_gox_zone("CO2", "Base")
-sox_zone = thermal_input.get_gox_zone("SOx", "Base")
-t_lowers, t_uppers = thermal_input.get_start_time("Base")
-heat_rate = thermal_input.get_heat_rate("Base")
-MinUpTime = 8
-MinDownTime = 8
-Startcost_hot, Startcost_warm, Startcost_cold = thermal_input.get_start_cost("Base")
-sox_rate, nox_rate, co2_rate = thermal_input.get_gox_rate(name1 = "SOx_Rate", name2 = "NOx_Rate", name3="CO2_Rate")
-mincap, maxcap = thermal_input.get_cap("Base")
-vom_type = thermal_input.get_vom_type("Base")
-status = thermal_input.check_ppa_status("Base")
-ltsa = thermal_input.get_ltsa("Base")
-eoh = thermal_input.get_eoh("Base")
-df_new["Adder_st"] = df_new.apply(thermal_input.get_adder, axis=1)
-df_new["Adder_bid"] = df_new.apply(thermal_input.get_adder_bid, axis=1)
-df_new.drop(columns=["Weekday", "Type", "Leap"], axis=1, inplace=True)
-time_4 = time.time()
-print(f"Input to base finished (took {time_4-time_3} seconds)")
-
-if status == True:
-    st_year, end_year = thermal_input.get_time("Base")
-    data = thermal_input.get_data_file("Base", df_new)
-    results_list = [] 
-    for year in range(st_year, end_year+1):   #st_year is 2025
-        df_new_base = thermal_input.get_year_data(data, year)
-        maint_per = thermal_input.get_maint_per(year)
-        if df_new_base.shape[0] ==0:
-            print(f"Null year {year}...")
-            print("*************************")
-            continue
-        else:
-            T = df_new_base.shape[0]
-            print(f"Running year {year}...")
-            dispatchModelBase = DispatchModel(df_new_base, gas_price_col, power_price_col, nox_zone, co2_zone, sox_zone, 
-                 t_lowers, t_uppers, heat_rate, MinUpTime, MinDownTime, Startcost_hot, 
-                 Startcost_warm, Startcost_cold, sox_rate, nox_rate, co2_rate, 
-                 mincap, maxcap, vom_type, maint_per, T, ltsa, eoh)
-    
-            print("Starting Solver...")
-            dispatchModelBase.solve()
-            print("Solver Stoped")
-            print("**********************")
-            dispatchModelBase.get_results()
-            yearly_result = dispatchModelBase.get_results()
-            results_list.append(yearly_result)
 
-# Concatenate all yearly results into one DataFrame
-final_results = pd.concat(results_list, ignore_index=True)
+def parse_args(argv):
+    """ Command line of the toolkit; every option defaults to the settings above. Without a
+    command the full run is made, as `python main.py` always did """
+    parser = argparse.ArgumentParser(prog="main.py", description="Economic dispatch of the thermal plant and its PPAs")
+    commands = parser.add_subparsers(dest="command")
 
-    
-print("Base Run Sucessful")
-print("**************************")
-n = thermal_input.df_ppa.shape[1]
-for i in range(2,n):
-    name = thermal_input.df_ppa.columns[i]
-    status = thermal_input.check_ppa_status(name)
-    if status == False:
-        continue
-    else:
-        st_year, end_year = thermal_input.get_time(name)
-        gas_price_col = thermal_input.get_hub("Gas_Hub",name)
-        power_price_col = thermal_input.get_hub("LMP_Hub",name)
-        nox_zone = thermal_input.get_gox_zone("NOx", name)
-        co2_zone = thermal_input.get_gox_zone("CO2", name)
-        sox_zone = thermal_input.get_gox_zone("SOx", name)
-        t_lowers, t_uppers = thermal_input.get_start_time(name)
-        heat_rate = thermal_input.get_heat_rate(name)
-        Startcost_hot, Startcost_warm, Startcost_cold = thermal_input.get_start_cost(name)
-        mincap, maxcap = thermal_input.get_cap(name)
-        vom_type = thermal_input.get_vom_type(name)
-        data = thermal_input.get_data_file(name, final_results)
-        ltsa = thermal_input.get_ltsa(name)
-        eoh = thermal_input.get_eoh(name)
-        mover_dep = thermal_input.get_mover_dependency(name)
-        print(f"mover dependency {mover_dep}")
-        if pd.notna(mover_dep):
-            print(f"running for {name}...")
-            results_list = [] 
-            for year in range(st_year, end_year+1):   #st_year is 2025
-                df_new_ppa = thermal_input.get_year_data(data, year)
-                if df_new_ppa.shape[0] ==0:
-                    print(f"Null year {year}...")
-                    print("**********************")
-                    continue
-                else:
-                    T = df_new_ppa.shape[0]
-                    print(f"Running year {year}...")
-                    dispatchmodelppa = DispatchModelPPA(df_new_ppa, gas_price_col, power_price_col, nox_zone, 
-                                                        co2_zone, sox_zone, t_lowers, t_uppers, heat_rate, 
-                                                        Startcost_hot, Startcost_warm, Startcost_cold, sox_rate, nox_rate, co2_rate, mincap, 
-                                                        maxcap, vom_type,mover_dep,name, T, ltsa, eoh)
-
-                    print(f"Starting Solver...")
-                    dispatchmodelppa.solve()
-                    print(f"Solver Stoped")
-                    print("**********************")
-                    dispatchModelBase.get_results()
-                    yearly_result = dispatchmodelppa.get_results()
-                    results_list.append(yearly_result)
-
-            final_results_ppa = pd.concat(results_list, ignore_index=True)
-
-            if final_results.shape[0] == final_results_ppa.shape[0]:
-                final_results = final_results_ppa
+    run_parser = commands.add_parser("run", help="solve the selected contracts and years and write the reports")
+    run_parser.add_argument("--input", default=file_path, help="input workbook")
+    run_parser.add_argument("--contracts", nargs="+", default=contracts, metavar="NAME",
+                            help="contracts to run (Base and/or PPA names); the movers they depend on run too")
+    run_parser.add_argument("--years", nargs="+", type=int, default=years, metavar="YEAR",
+                            help="first and last year to solve, or a single year")
+    run_parser.add_argument("--solver", default=solve_options["solver_name"], choices=["scip", "highs", "cbc"])
+    run_parser.add_argument("--solver-path", default=solve_options["solver_path"], help="solver binary")
+    run_parser.add_argument("--time-limit", type=float, default=solve_options["time_limit"],
+                            help="seconds per solve")
+    run_parser.add_argument("--engine", default=model_engine, choices=["pyomo", "matrix", "dp", "persistent"])
+    run_parser.add_argument("--workers", type=int, default=n_workers, help="worker processes (default every core)")
+    run_parser.add_argument("--no-cache", action="store_true",
+                            help="solve every year again instead of reusing unchanged yearly results")
+
+    report_parser = commands.add_parser("report", help="write the reports again from the dispatch_results "
+                                                       "of an earlier run, without solving")
+    report_parser.add_argument("results", help="workbook or dataset directory of an earlier run, or its "
+                                               "dispatch_results file")
+    report_parser.add_argument("--input", default=file_path, help="input workbook, for the contract capacities")
+    report_parser.add_argument("--contracts", nargs="+", default=contracts, metavar="NAME",
+                               help="contracts to report (default every contract in the results)")
+
+    for sub in (run_parser, report_parser):
+        sub.add_argument("--output-dir", default=output_dir)
+        sub.add_argument("--format", default=export_format, choices=FORMATS)
+        sub.add_argument("--report-years", nargs=2, type=int, default=report_years, metavar=("FIRST", "LAST"))
+        sub.add_argument("--report-contract", default=report_contract,
+                         help="contract of the ON_base/Percent On_base sheets")
+
+    argv = list(argv)
+    if not argv or argv[0] not in ("run", "report", "-h", "--help"):
+        argv = ["run"] + argv
+    args = parser.parse_args(argv)
+    if args.command == "run" and args.years is not None:
+        if len(args.years) > 2:
+            parser.error("--years takes a first and last year, or a single year")
+        args.years = (args.years[0], args.years[-1])
+    # Checked here so a missing writer fails before the solves, not after them
+    missing = missing_package(args.format)
+    if missing is not None:
+        parser.error(f"--format {args.format} needs the {missing} package; install it or choose another format")
+    return args
+
+
+def export_contract(exporter, results, name, maxcap, start_year, end_year):
+    """ Capacity factor and pivot table of one contract, from the frame of its solved hours """
+    report = OutputReport(results, start_year, end_year)
+    exporter.submit(f"CF_{name}", report.get_capacity_factor(name, results, maxcap))
+    exporter.submit(f"Pivot Table_{name}", report.get_pivot_table(results, name))
+
+
+def export_summary(exporter, final_results, name, start_year, end_year):
+    """ ON hours and percent on per month and year of one contract """
+    output_base = OutputReport(final_results, start_year, end_year)
+    test_file1 = output_base.get_output(name)
+    test_file2 = output_base.compute_monthly_percentage()
+
+    exporter.submit("ON_base", test_file1, index=True)
+    exporter.submit("Percent On_base", test_file2, index=True)
+
+
+def report(cli):
+    """ Writes the contract and summary reports of an earlier run's dispatch_results """
+    time_1 = time.time()
+    print(f"Reading results from {cli.results}...")
+    final_results = read_export(cli.results, "dispatch_results")
+    thermal_input = ThermalDispatchInput(cli.input, cache_dir=cache_dir)
+    solved = [col[3:] for col in final_results.columns if str(col).startswith("ON_")]
+    names = cli.contracts or solved
+    missing = [name for name in names if name not in solved]
+    if missing:
+        raise SystemExit(f"{cli.results} has no results for {', '.join(missing)}")
+
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    exporter = ResultExporter(cli.output_dir, f"report_{timestamp}", fmt=cli.format)
+    for name in names:
+        export_contract(exporter, final_results[["Year", "Month", "Day", "Hour", "ON_" + name, "Power_" + name]],
+                        name, thermal_input.contracts[name].maxcap, *cli.report_years)
+    summary_name = cli.report_contract if cli.report_contract in names else names[0]
+    export_summary(exporter, final_results, summary_name, *cli.report_years)
+    print(f"Writing reports to {exporter.close()}...")
+    print(f"Time taken to finish the process {time.time() - time_1} seconds")
+
+
+def run(cli):
+    # The solver stack (Pyomo and the models) is only imported by the run command
+    from scripts.dispatchBase import DispatchModel
+    from scripts.dispatchPpa import DispatchModelPPA
+    from scripts.runner import YearJob, run_jobs, default_workers
+    from scripts.scheduler import PPAScheduler
+    from scripts.resultCache import ResultCache
+    from scripts.resultStore import ResultStore
+    from scripts.decomposition import WindowedDispatch
+    from scripts.fleetModel import FleetDispatch
+    from scripts.aggregation import AggregatedDispatch
+    from scripts.scenarios import ScenarioEngine, sample_scenarios, contract_groups
+    from scripts.solvers import takes_start
+
+    n_workers = cli.workers
+    solve_kwargs = dict(solve_options, solver_name=cli.solver, solver_path=cli.solver_path, time_limit=cli.time_limit)
+    # The models skip the heuristic start where the solver would drop it; say so once for the run
+    engines = {cli.engine} | ({"pyomo"} if fleet_model else set())
+    unseeded = sorted(engine for engine in engines if engine != "dp" and not takes_start(cli.solver, engine))
+    if warm_start and unseeded:
+        print(f"Warning: {cli.solver} reads no start solution with the {' and '.join(unseeded)} engine, "
+              f"warm_start is skipped for this run; use --engine matrix to seed {cli.solver}")
+    timer = instrumentation.configure(instrument_memory, profile_phase, f"{cli.output_dir}/profiles")
+    # Creating an instance of the ThermalDispatchInput class
+    time_1 = time.time()
+    print("Reading Inputs...")
+    with timer.phase("excel read"):
+        thermal_input = ThermalDispatchInput(cli.input, cache_dir=cache_dir)
+    result_cache = ResultCache(cache_dir) if cache_dir and reuse_results and not cli.no_cache else None
+    time_2 = time.time()
+    print(f"Reading Inputs finished (took {time_2 - time_1} seconds)...")
+
+    # Contracts of this run: the ones asked for and the movers whose results they need
+    available = ["Base"] + thermal_input.enabled_ppas()
+    try:
+        names = available if cli.contracts is None else mover_closure(thermal_input.contracts, cli.contracts,
+                                                                      available)
+    except ContractConfigError as e:
+        raise SystemExit(str(e))
+    if cli.contracts is not None:
+        added = [name for name in names if name not in cli.contracts]
+        print(f"Running {', '.join(names)}" + (f" (movers added: {', '.join(added)})" if added else ""))
+    first_year, last_year = cli.years or (None, None)
+
+    time_3 = time.time()
+    print("Getting inputs for base...")
+    # Hourly feature frame (gas, VOM, emissions and adders merged onto the LMP sheet)
+    with timer.phase("feature assembly"):
+        df_new = thermal_input.get_features()
+    if cli.years is not None:
+        df_new = df_new[df_new["Year"].between(first_year, last_year)]
+
+    # Base model inputs
+    base = thermal_input.contracts["Base"]
+    plant = thermal_input.plant
+    MinUpTime = 8
+    MinDownTime = 8
+    model_kwargs = {"engine": cli.engine, "formulation": formulation, "warm_start": warm_start,
+                    "prescreen": prescreen}
+    time_4 = time.time()
+    print(f"Input to base finished (took {time_4-time_3} seconds)")
+    run_base = base.dispatch_run and "Base" in names
+
+    # Mover groups solved jointly; a group of the Base unit only when the Base unit is dispatched
+    fleet_groups = []
+    if fleet_model:
+        groups = contract_groups(thermal_input.contracts, names)
+        fleet_groups = [group for group in groups if len(group) > 1 and (group[0] != "Base" or run_base)]
+    base_group = next((group for group in fleet_groups if group[0] == "Base"), None)
+
+    def make_aggregated_job(name, year, model_cls, args):
+        """ Yearly job solved on representative periods, in full as well for aggregate_check_year """
+        return YearJob(name, year, AggregatedDispatch, args,
+                       dict(model_kwargs, model_cls=model_cls, periods=aggregate_periods, period=aggregate_by,
+                            compare=year == aggregate_check_year), solve_kwargs)
+
+    def make_fleet_job(group, year, data_year):
+        """ Joint yearly job of a mover group, with the members that have hours in `data_year` """
+        units = []
+        maint_per = thermal_input.get_maint_per(year)
+        for name in group:
+            config = thermal_input.contracts[name]
+            if thermal_input.get_data_file(name, data_year).shape[0] == 0:
+                continue
+            period = (config.ppa_start, config.ppa_end)
+            if name == "Base" or config.mover_dependency is None:
+                units.append((name, "base", config.dispatch_args(plant, None, None, maint_per, MinUpTime, MinDownTime),
+                              {"formulation": formulation}, period))
             else:
-                combined_df = pd.concat([final_results, final_results_ppa], axis=0, ignore_index=True)
-                combined_df['ON_'+name] = combined_df['ON_'+name].fillna(0)
-                combined_df['Power_'+name] = combined_df['Power_ppa'+name].fillna(0)
+                units.append((name, "ppa", config.ppa_args(plant, None, None), {"formulation": formulation}, period))
+        return YearJob("+".join(group), year, FleetDispatch, (data_year, units),
+                       {"name": "+".join(group), "warm_start": warm_start}, solve_kwargs)
 
-        else:
-            print(f"running for {name}...")
-            results_list = [] 
-            for year in range(st_year, end_year+1): 
-                df_new_ppa = thermal_input.get_year_data(data, year)
-                if df_new_ppa.shape[0] ==0:
-                    print(f"Null year {year}...")
-                    print("**********************")
-                    continue
-                else:
-                    T = df_new_ppa.shape[0]
-                    maint_per = thermal_input.get_maint_per(year)
-                    print(f"Running year {year}...")
-                    dispatchModelBase = DispatchModel(df_new_ppa, gas_price_col, power_price_col, nox_zone,
-                                            co2_zone, sox_zone, t_lowers, t_uppers, heat_rate,
-                                            MinUpTime, MinDownTime, Startcost_hot, Startcost_warm, 
-                                            Startcost_cold, sox_rate, nox_rate, co2_rate, mincap, 
-                                            maxcap, vom_type, maint_per,T,ltsa, eoh, name)
-
-                    print(f"Starting Solver...")
-                    dispatchModelBase.solve()
-                    print(f"Solver Stoped")
-                    print("**********************")
-                    dispatchModelBase.get_results()
-                    yearly_result = dispatchModelBase.get_results()
-                    results_list.append(yearly_result)
-
-            final_results_ppa = pd.concat(results_list, ignore_index=True)
-
-            if final_results.shape[0] == final_results_ppa.shape[0]:
-                final_results = final_results_ppa
+    def write_results(result):
+        """ Writes a solve's ON_/Power_ columns into the store, every unit of a fleet result """
+        for name in store.names:
+            if f"ON_{name}" in result.columns:
+                store.write(name, result)
+
+    # Hours of the run: the base unit's years, or every hour when the base unit is not dispatched
+    timeline = df_new
+    if run_base:
+        st_year, end_year = base.years
+        if cli.years is not None:
+            st_year, end_year = max(st_year, first_year), min(end_year, last_year)
+        data = thermal_input.get_data_file("Base", df_new)
+        jobs = []
+        for year in range(st_year, end_year+1):   #st_year is 2025
+            df_new_base = thermal_input.get_year_data(data, year)
+            maint_per = thermal_input.get_maint_per(year)
+            if df_new_base.shape[0] ==0:
+                print(f"Null year {year}...")
+                print("*************************")
+                continue
             else:
-                merge_keys = ["Year", "Month", "Day", "Hour"]
-
-                # Merge PPA values based on date/time only
-                final_results = final_results.merge(
-                                final_results_ppa[merge_keys + ["ON_"+name, "Power_"+name]],
-                                on=merge_keys,
-                                how="left"
-                                )
-
-                # Fill missing values with 0
-                final_results["ON_"+name] = final_results["ON_"+name].fillna(0)
-                final_results["Power_"+name] = final_results["Power_"+name].fillna(0)
-
-
-timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-filename1 = f"output/ON_base_{timestamp}.xlsx"
-filename2 = f"output/Percent On_base_{timestamp}.xlsx"
-filename3 = f"output/dispatch_results_{timestamp}.xlsx"
-
-output_base = OutputReport(final_results, 2025, 2050)
-test_file1 = output_base.get_output("PPA2")
-test_file2 = output_base.compute_monthly_percentage()
-
-test_file1.to_excel(filename1, index = True)
-test_file2.to_excel(filename2, index = True)
-final_results.to_excel(filename3, index=False)
-
-for i in range(1,thermal_input.df_ppa.shape[1]):
-    ppa_name = thermal_input.df_ppa.columns[i]
-    status = thermal_input.check_ppa_status(ppa_name)
-    if status == True:
-        _,maxcap = thermal_input.get_cap(ppa_name)
-        df1 = output_base.get_capacity_factor(ppa_name, final_results, maxcap)
-        df2 = output_base.get_pivot_table(final_results, ppa_name)
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        df1.to_excel(f"output/CF_{ppa_name}_{timestamp}.xlsx", index = False)
-        df2.to_excel(f"output/Pivot Table_{ppa_name}_{timestamp}.xlsx", index = False)
+                T = df_new_base.shape[0]
+                args = base.dispatch_args(plant, df_new_base, T, maint_per, MinUpTime, MinDownTime)
+                if base_group is not None:
+                    jobs.append(make_fleet_job(base_group, year, df_new_base))
+                elif aggregate_periods:
+                    jobs.append(make_aggregated_job("Base", year, DispatchModel, args))
+                elif decompose_months:
+                    # Windows of a year run in parallel, so the years themselves run one after another
+                    jobs.append(YearJob("Base", year, WindowedDispatch, args,
+                                        dict(model_kwargs, months_per_window=decompose_months, workers=n_workers),
+                                        solve_kwargs))
+                else:
+                    jobs.append(YearJob("Base", year, DispatchModel, args, model_kwargs, solve_kwargs))
+
+        print(f"Running years {[job.year for job in jobs]} on {n_workers or default_workers()} worker(s)...")
+        results_list = run_jobs(jobs, workers=1 if decompose_months and base_group is None else n_workers,
+                                cache=result_cache, depth=pipeline_depth)
+        print("Solver Stoped")
+        print("**********************")
+        timeline = data[data["Year"].isin([job.year for job in jobs])]
+
+    # ON/Power of every contract, preallocated on the timeline; solves write their hours into it
+    store = ResultStore(timeline, names)
+    if run_base:
+        with timer.phase("merge", "Base"):
+            for result in results_list:
+                write_results(result)
+            del results_list
+
     
+    print("Base Run Sucessful")
+    print("**************************")
+
+    def make_ppa_job(name, year, df_new_ppa):
+        """ Yearly job for one PPA: DispatchModelPPA when it follows a mover, DispatchModel otherwise """
+        config = thermal_input.contracts[name]
+        T = df_new_ppa.shape[0]
+        if config.mover_dependency is not None:
+            model_cls, args = DispatchModelPPA, config.ppa_args(plant, df_new_ppa, T)
+        else:
+            maint_per = thermal_input.get_maint_per(year)
+            model_cls = DispatchModel
+            args = config.dispatch_args(plant, df_new_ppa, T, maint_per, MinUpTime, MinDownTime)
+        if aggregate_periods:
+            return make_aggregated_job(name, year, model_cls, args)
+        return YearJob(name, year, model_cls, args, model_kwargs, solve_kwargs)
+
+    # Reports are written on a background thread while the PPAs are still solving
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    exporter = ResultExporter(cli.output_dir, f"dispatch_{timestamp}", fmt=cli.format)
+
+    def export_results(name, results):
+        """ Capacity factor and pivot table of one contract, as soon as its results exist """
+        export_contract(exporter, results, name, thermal_input.contracts[name].maxcap, *cli.report_years)
+
+    if run_base:
+        for name in base_group or ["Base"]:
+            export_results(name, store.frame([name], features=False, only=name))
+
+    # The other mover groups, each year as one joint model
+    fleet_jobs = []
+    for group in fleet_groups:
+        if group is base_group:
+            continue
+        for year in sorted(set(timeline["Year"])):
+            data_year = thermal_input.get_year_data(timeline, year)
+            if any(thermal_input.get_data_file(name, data_year).shape[0] > 0 for name in group):
+                fleet_jobs.append(make_fleet_job(group, year, data_year))
+    if fleet_jobs:
+        print(f"Running {len(fleet_jobs)} joint mover group year(s)...")
+        fleet_results = run_jobs(fleet_jobs, workers=n_workers, cache=result_cache, depth=pipeline_depth)
+        with timer.phase("merge", "Fleet"):
+            for result in fleet_results:
+                write_results(result)
+            del fleet_results
+        for group in fleet_groups:
+            if group is not base_group:
+                for name in group:
+                    export_results(name, store.frame([name], features=False, only=name))
+
+    # PPAs run as a dependency graph: independent contracts and years in parallel,
+    # dependents as soon as their mover's year is solved
+    scheduler = PPAScheduler(thermal_input, store, make_ppa_job, workers=n_workers, on_complete=export_results,
+                             cache=result_cache, solved=[name for group in fleet_groups for name in group],
+                             depth=pipeline_depth, names=[name for name in names if name != "Base"])
+    scheduler.run()
+    with timer.phase("merge"):
+        # The only full hourly table of the run, built once for the reports
+        final_results = store.frame()
+
+    export_summary(exporter, final_results, cli.report_contract if cli.report_contract in names else names[0],
+                   *cli.report_years)
+    exporter.submit("dispatch_results", final_results)
+
+    if n_scenarios:
+        n_months = df_new[["Year", "Month"]].drop_duplicates().shape[0]
+        scenarios = sample_scenarios(n_scenarios, n_months, seed=scenario_seed)
+        engine = ScenarioEngine(thermal_input, df_new, scenarios, MinUpTime, MinDownTime,
+                                model_kwargs, solve_kwargs, n_workers, names=[name for name in names
+                                                                              if name != "Base" or run_base])
+        exporter.submit("Scenario results", engine.run())
+        exporter.submit("Scenario summary", engine.summary())
+    timings = timer.to_frame()
+    if "full_objective" in timings.columns:
+        checked = timings[timings["full_objective"].notna()]
+        exporter.submit("Aggregation error", checked[["contract", "year", "objective", "full_objective",
+                                                      "objective_error", "on_hours_error", "hours_mismatched",
+                                                      "aggregated_time", "full_time"]])
+    if result_cache is not None:
+        print(f"Yearly results: {result_cache.report()}")
+    with timer.phase("report export"):
+        report_path = exporter.close()
+    print(f"Writing reports to {report_path}...")
+    print(timer.summary().to_string())
+    timings = timer.to_frame()
+    if "prescreen_hours" in timings.columns:
+        fixed = timings["prescreen_fixed_off"].sum() + timings["prescreen_fixed_on"].sum()
+        print(f"Prescreen fixed {fixed:.0f} of {timings['prescreen_hours'].sum():.0f} commitment hours "
+              f"({timings['prescreen_variables'].sum():.0f} variables) before solving")
+    if timings_file:
+        print(f"Phase timings written to {timer.export(f'{cli.output_dir}/{timestamp}_{timings_file}')}")
+
+    time_finish = time.time()
+    print(f"Time taken to finish the process {time_finish - time_1} seconds")
+    print("Thank you for using the toolkit")
+
+
+def main(argv=()):
+    cli = parse_args(argv)
+    if cli.command == "report":
+        report(cli)
+    else:
+        run(cli)
+
 
-time_finish = time.time()
-print(f"Time taken to finish the process {time_finish - time_1} seconds")
-print("Thank you for using the toolkit")
\ No newline at end of file
+if __name__ == "__main__":
+    main(sys.argv[1:])
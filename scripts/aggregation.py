@@ -0,0 +1,209 @@
+import inspect
+import time
+import numpy as np
+from scripts.dispatchBase import DispatchModel
+from scripts.economics import hourly_margin, hourly_on_value, hourly_output, start_adders, start_type_costs
+from scripts.resultCache import input_columns
+from scripts.solvers import SolveResult
+from scripts.warmStart import heuristic_schedule, warm_start_values
+
+# Hours per period of the aggregation modes
+PERIOD_HOURS = {"day": 24, "week": 168}
+CALENDAR_COLUMNS = ("Date", "Year", "Month", "Day", "Hour")
+
+
+def kmeans(X, k, seed=0, iterations=100):
+    """ Lloyd's k-means with k-means++ seeding. Returns (labels, centers) """
+    rng = np.random.default_rng(seed)
+    n = len(X)
+    k = min(k, n)
+    centers = [X[rng.integers(n)]]
+    for _ in range(1, k):
+        dist = ((X[:, None, :] - np.array(centers)[None]) ** 2).sum(axis=2).min(axis=1)
+        centers.append(X[rng.choice(n, p=dist / dist.sum())] if dist.sum() > 0 else X[rng.integers(n)])
+    centers = np.array(centers)
+    labels = np.full(n, -1)
+    for _ in range(iterations):
+        new = ((X[:, None, :] - centers[None]) ** 2).sum(axis=2).argmin(axis=1)
+        if np.array_equal(new, labels):
+            break
+        labels = new
+        for j in range(k):
+            if (labels == j).any():
+                centers[j] = X[labels == j].mean(axis=0)
+    return labels, centers
+
+
+def representative_periods(data, columns, period_hours, k, seed=0):
+    """ Clusters the periods of `data` (consecutive blocks of period_hours rows) on the hourly
+    profiles of `columns`, each standardized over the frame. Returns (bounds, labels, medoids):
+    the (start, end) rows of every period, its cluster, and for every cluster the period that
+    represents it (the member closest to the centroid). A trailing short period is its own cluster """
+    T = len(data)
+    n_full = T // period_hours
+    bounds = [(p * period_hours, (p + 1) * period_hours) for p in range(n_full)]
+    values = data[list(columns)].to_numpy(dtype=float)
+    spread = values.std(axis=0)
+    values = np.nan_to_num((values - values.mean(axis=0)) / np.where(spread > 0, spread, 1.0))
+    X = values[:n_full * period_hours].reshape(n_full, -1)
+    labels, centers = kmeans(X, k, seed)
+    medoids = []
+    for j in range(len(centers)):
+        members = np.flatnonzero(labels == j)
+        if len(members):
+            medoids.append(members[((X[members] - centers[j]) ** 2).sum(axis=1).argmin()])
+        else:
+            medoids.append(-1)
+    if n_full * period_hours < T:
+        bounds.append((n_full * period_hours, T))
+        labels = np.append(labels, len(medoids))
+        medoids.append(n_full)
+    return bounds, labels, np.array(medoids)
+
+
+def trim_maintenance(model, on):
+    """ Switches off the weakest blocks of each maintenance month until it is under its limit. The
+    warm-start heuristic drops whole runs instead, which loses the year when the mapped schedule
+    runs through the month; blocks are at least MinDownTime long so the repair keeps them off """
+    on = np.asarray(on, dtype=float).copy()
+    value = hourly_on_value(model)
+    for i, share in enumerate(model.maint_per):
+        if share == 0.0:
+            continue
+        st = model.start_index[i]
+        end = min(st + model.month_days[i] + 1, model.T)
+        limit = model.month_days[i] - int(np.ceil(model.month_days[i] * share))
+        while on[st:end].sum() > limit:
+            length = min(int(max(on[st:end].sum() - limit, model.MinDownTime)), end - st)
+            kept = np.concatenate([[0.0], np.cumsum((value * on)[st:end])])
+            hours = np.concatenate([[0.0], np.cumsum(on[st:end])])
+            # Cheapest window that still switches something off
+            loss = np.where(hours[length:] > hours[:-length], kept[length:] - kept[:-length], np.inf)
+            s = st + int(loss.argmin())
+            on[s:s + length] = 0.0
+    return on
+
+
+def schedule_value(model, on):
+    """ Objective of a DispatchModel/DispatchModelPPA at a 0/1 ON schedule with the best output
+    in every hour, as the MILP would value it """
+    values = warm_start_values(model, on)
+    starts = values["switch_on"]
+    if hasattr(model, "MinUpTime"):
+        type_costs = values["delta_type"] @ start_type_costs(model)
+    else:
+        type_costs = starts * model.Startcost_hot
+    return float(hourly_margin(model) @ values["elect"] - float(model.eoh) * values["ON"].sum()
+                 - starts @ start_adders(model) - type_costs.sum())
+
+
+class AggregatedDispatch:
+    """ A yearly DispatchModel or DispatchModelPPA solved on k representative days or weeks.
+
+    The periods of the year are clustered on the hourly inputs the model reads (prices, gas,
+    emissions, VOM and adders, the mover's ON column); the representative period of each cluster
+    is the member closest to its centroid, and its weight the number of periods it stands for.
+    Each representative is solved as its own short model with the usual engine and options
+    (without the monthly maintenance limits), and the weighted sum of their objectives is the
+    reduced estimate of the year. Every period then takes its representative's schedule, and the
+    year's schedule is repaired by the warm-start heuristic for min up/down time across period
+    boundaries, the mover and the maintenance limits (after trim_maintenance has cut each capped
+    month down in blocks); when it cannot be repaired the full year is solved instead. Output
+    is the best level of each actual hour, so ON_/Power_ results are approximate hourly values.
+    With compare=True the full year is solved as well and the aggregation error is reported.
+    """
+    def __init__(self, *args, model_cls=DispatchModel, periods=12, period="day", seed=0, compare=False,
+                 **kwargs):
+        params = inspect.signature(model_cls).bind(*args, **kwargs).arguments
+        self.model_cls = model_cls
+        self.params = dict(params)
+        self.data = self.params.pop("data")
+        self.T = self.params.pop("T")
+        self.name = self.params.get("name", "Base")
+        self.periods = periods
+        self.period_hours = PERIOD_HOURS[period]
+        self.seed = seed
+        self.compare = compare
+        self.stats = {}
+        # Holds the year's coefficients for the repair and the valuation; the DP engine builds nothing
+        self.full = self._model(self.data, engine="dp", warm_start=None, prescreen=False,
+                                **({"check_maint_con": False} if "check_maint_con" in self.params else {}))
+
+    def _model(self, data, **overrides):
+        return self.model_cls(**dict(self.params, data=data, T=len(data), **overrides))
+
+    def solve(self, **solve_kwargs):
+        time_start = time.time()
+        columns = [col for col in input_columns(self.data, list(self.params.values()), self.name)
+                   if col not in CALENDAR_COLUMNS]
+        bounds, labels, medoids = representative_periods(self.data, columns, self.period_hours, self.periods,
+                                                         self.seed)
+        used = sorted(m for m in medoids if m >= 0)
+        # Periods each representative stands for, by its period number in the year
+        counts = np.bincount(labels, minlength=len(medoids))
+        self.weights = {int(medoids[j]): int(w) for j, w in enumerate(counts) if medoids[j] >= 0}
+
+        # Each representative is solved on its own: its periods follow different ones in the calendar, so
+        # min up/down and start costs do not carry across its boundaries. The weights scale the reduced
+        # objective (an estimate of the year's), not the schedules, which are separate optima
+        overrides = {}
+        if "maint_per" in self.params:
+            overrides = {"maint_per": [], "start_index": [], "month_days": [], "check_maint_con": False}
+        schedules, results = {}, []
+        for p in used:
+            start, end = bounds[p]
+            reduced = self._model(self.data.iloc[start:end], **overrides)
+            results.append(reduced.solve(**solve_kwargs))
+            schedules[p] = np.round(np.nan_to_num(reduced.get_results()["ON_" + self.name].to_numpy(dtype=float)))
+        reduced_objective = sum(self.weights[p] * r.objective for p, r in zip(used, results))
+        status = "optimal" if all(r.status == "optimal" for r in results) else "feasible"
+        self.solve_result = SolveResult(results[0].solver, status, "representative periods", reduced_objective,
+                                        seconds=sum(r.seconds or 0.0 for r in results))
+
+        # Every period takes the schedule of its representative
+        on = np.zeros(self.T)
+        for (start, end), label in zip(bounds, labels):
+            on[start:end] = schedules[medoids[label]][:end - start]
+        if hasattr(self.full, "maint_per"):
+            on = trim_maintenance(self.full, on)
+        repaired = heuristic_schedule(self.full, on)
+        self.stats = {
+            "periods": len(bounds),
+            "representatives": len(used),
+            "reduced_hours": int(sum(bounds[p][1] - bounds[p][0] for p in used)),
+            "reduced_objective": reduced_objective,
+            "repaired": repaired is not None,
+        }
+        if repaired is None:
+            # The mapped schedule may break min up/down, the mover or the maintenance limits
+            print(f"{self.name}: the aggregated schedule could not be repaired, solving the full year instead")
+            full = self._model(self.data)
+            self.solve_result = full.solve(**solve_kwargs)
+            repaired = np.round(np.nan_to_num(full.get_results()["ON_" + self.name].to_numpy(dtype=float)))
+        self.on = repaired
+        self.objective = schedule_value(self.full, self.on)
+        self.stats["aggregated_time"] = time.time() - time_start
+        self.stats["objective"] = self.objective
+        if self.compare:
+            time_full = time.time()
+            full = self._model(self.data)
+            full.solve(**solve_kwargs)
+            full_on = np.round(np.nan_to_num(full.get_results()["ON_" + self.name].to_numpy(dtype=float)))
+            full_obj = full.get_objective()
+            self.stats["full_objective"] = full_obj
+            self.stats["full_time"] = time.time() - time_full
+            self.stats["objective_error"] = (self.objective - full_obj) / abs(full_obj) if full_obj else 0.0
+            self.stats["on_hours_error"] = int(self.on.sum() - full_on.sum())
+            self.stats["hours_mismatched"] = float((self.on != full_on).mean())
+            print(f"{self.name}: aggregated objective {self.objective:.2f} vs full {full_obj:.2f} "
+                  f"({100 * self.stats['objective_error']:.2f}%), ON hours {self.on.sum():.0f} vs "
+                  f"{full_on.sum():.0f}, {100 * self.stats['hours_mismatched']:.1f}% of hours differ, "
+                  f"{self.stats['aggregated_time']:.1f}s vs {self.stats['full_time']:.1f}s")
+        return self.solve_result
+
+    def get_objective(self):
+        return self.objective
+
+    def get_results(self):
+        return self.data.assign(**{"ON_" + self.name: self.on,
+                                   "Power_" + self.name: self.on * hourly_output(self.full)})
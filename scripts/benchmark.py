@@ -0,0 +1,286 @@
+import argparse
+import json
+import os
+import pandas as pd
+from scripts.dataEngine import ThermalDispatchInput
+from scripts.dispatchBase import DispatchModel, MONTH_DAYS, START_INDEX
+from scripts.dispatchPpa import DispatchModelPPA
+from scripts.fleetModel import FleetDispatch
+from scripts.instrumentation import Instrumentation, solver_stats
+from scripts.report import OutputReport
+from scripts.scenarios import contract_groups
+from scripts.scheduler import attach_mover_on
+from scripts.synthetic import synthetic_sheets, write_workbook
+
+MinUpTime = 8
+MinDownTime = 8
+# Phases compared against the baseline, and the slowdown that is reported
+TIMED_PHASES = ("excel read", "feature assembly", "model build", "solver call", "result extraction", "report build")
+SLOWDOWN = 1.25
+
+
+def run_case(months=12, ppas=3, years=1, engine="pyomo", solve_kwargs=None, excel=False, workdir="benchmarks",
+             seed=0, formulation="weak", prescreen=False):
+    """ Times one synthetic run: input load, feature assembly, the build, solve and extraction of
+    every (contract, year) model over the first `months` months of each year, and the reports.
+    Returns (Instrumentation, {"<contract>/<year>": objective}) """
+    solve_kwargs = solve_kwargs or {}
+    timer = Instrumentation()
+    case = case_label(months, ppas, years)
+    if excel:
+        os.makedirs(workdir, exist_ok=True)
+        path = write_workbook(os.path.join(workdir, f"{case}.xlsx"), years=years, ppas=ppas, seed=seed)
+        with timer.phase("excel read", tag=case):
+            thermal_input = ThermalDispatchInput(path)
+    else:
+        sheets = synthetic_sheets(years=years, ppas=ppas, seed=seed)
+        with timer.phase("excel read", tag=case):
+            thermal_input = ThermalDispatchInput.from_frames(sheets)
+    with timer.phase("feature assembly", tag=case):
+        features = thermal_input.get_features()
+
+    contracts = thermal_input.contracts
+    names = list(contracts)
+    order = [name for group in contract_groups(contracts, names) for name in group]
+    T = sum(MONTH_DAYS[:months])
+    results, objectives = {}, {}
+    for name in order:
+        config = contracts[name]
+        data = thermal_input.get_data_file(name, features)
+        for year in range(config.years[0], config.years[1] + 1):
+            data_year = thermal_input.get_year_data(data, year)
+            data_year = data_year[data_year["Month"] <= months]
+            if data_year.shape[0] != T:
+                continue
+            mover = config.mover_dependency
+            with timer.phase("model build", name, year, tag=case) as build:
+                if mover is not None:
+                    data_year = attach_mover_on(data_year, mover, results.get((mover, year)))
+                    model = DispatchModelPPA(*config.ppa_args(thermal_input.plant, data_year, T), engine=engine,
+                                             formulation=formulation, prescreen=prescreen)
+                else:
+                    maint_per = thermal_input.get_maint_per(year)[:months]
+                    args = config.dispatch_args(thermal_input.plant, data_year, T, maint_per, MinUpTime, MinDownTime)
+                    model = DispatchModel(*args, engine=engine, start_index=START_INDEX[:months],
+                                          month_days=MONTH_DAYS[:months], formulation=formulation,
+                                          prescreen=prescreen)
+            build.update({f"prescreen_{key}": value for key, value in (model.prescreen_stats or {}).items()})
+            with timer.phase("solver call", name, year, tag=case) as record:
+                model.solve(**solve_kwargs)
+            record.update(solver_stats(model))
+            with timer.phase("result extraction", name, year, tag=case):
+                results[(name, year)] = model.get_results()
+            objectives[f"{name}/{year}"] = float(model.get_objective())
+
+    with timer.phase("report build", tag=case):
+        frames = {}
+        for (name, year), result in results.items():
+            frames.setdefault(year, []).append(result.set_index(["Year", "Month", "Day", "Hour"])
+                                               [["ON_" + name, "Power_" + name]])
+        merged = pd.concat([pd.concat(parts, axis=1) for parts in frames.values()]).fillna(0).reset_index()
+        solved = [name for name in order if "ON_" + name in merged.columns]
+        report = OutputReport(merged, min(frames), max(frames))
+        report.get_all_outputs(solved)
+        report.get_all_capacity_factors(merged, {name: contracts[name].maxcap for name in solved})
+    return timer, objectives
+
+
+def formulation_case(months=12, ppas=3, years=1, engine="pyomo", solve_kwargs=None, seed=0):
+    """ Solves the same synthetic case with the weak and the tight formulation; one row per
+    contract and year with both objectives, branch-and-bound nodes and solver seconds """
+    stats = {}
+    for formulation in ("weak", "tight"):
+        timer, _ = run_case(months, ppas, years, engine, solve_kwargs, seed=seed, formulation=formulation)
+        solves = timer.to_frame()
+        solves = solves[solves["phase"] == "solver call"].set_index(["contract", "year"])
+        stats[formulation] = solves[["solver_objective", "solver_nodes", "solver_seconds", "wall"]]
+    table = stats["weak"].join(stats["tight"], lsuffix="_weak", rsuffix="_tight").reset_index()
+    return table.rename(columns=lambda col: col.replace("solver_", ""))
+
+
+def prescreen_case(months=12, ppas=3, years=1, engine="pyomo", solve_kwargs=None, seed=0, formulation="weak"):
+    """ Solves the same synthetic case with and without prescreening; one row per contract and
+    year with both objectives, the share of hours prescreening fixed and the solver seconds """
+    stats = {}
+    for prescreen in (False, True):
+        timer, _ = run_case(months, ppas, years, engine, solve_kwargs, seed=seed, formulation=formulation,
+                            prescreen=prescreen)
+        records = timer.to_frame().set_index(["contract", "year"])
+        solves = records[records["phase"] == "solver call"][["solver_objective", "solver_seconds"]]
+        if prescreen:
+            builds = records[records["phase"] == "model build"]
+            solves = solves.join(builds[["prescreen_share", "prescreen_variables"]])
+        stats[prescreen] = solves
+    table = stats[False].join(stats[True], lsuffix="_full", rsuffix="_screened").reset_index()
+    return table.rename(columns=lambda col: col.replace("solver_", "").replace("prescreen_", "fixed_"))
+
+
+def fleet_case(months=12, ppas=3, years=1, solve_kwargs=None, seed=0):
+    """ Solves every mover group and year of a synthetic input twice: sequentially (mover first,
+    dependents on its fixed schedule) and as one FleetDispatch. Returns one row per group and
+    year with both total objectives and wall times; the fleet objective is never lower than
+    the sequential one beyond the solver gap """
+    solve_kwargs = solve_kwargs or {}
+    thermal_input = ThermalDispatchInput.from_frames(synthetic_sheets(years=years, ppas=ppas, seed=seed))
+    features = thermal_input.get_features()
+    contracts = thermal_input.contracts
+    plant = thermal_input.plant
+    T = sum(MONTH_DAYS[:months])
+    base_kwargs = {"start_index": START_INDEX[:months], "month_days": MONTH_DAYS[:months]}
+    timer = Instrumentation()
+    rows = []
+    for group in contract_groups(contracts, list(contracts)):
+        if len(group) == 1:
+            continue
+        label = "+".join(group)
+        for year in range(min(contracts[n].years[0] for n in group), max(contracts[n].years[1] for n in group) + 1):
+            data_year = thermal_input.get_year_data(features, year)
+            data_year = data_year[data_year["Month"] <= months]
+            if data_year.shape[0] != T:
+                continue
+            maint_per = thermal_input.get_maint_per(year)[:months]
+            units, results, sequential = [], {}, 0.0
+            with timer.phase("solver call", label, year, mode="sequential") as seq:
+                for name in group:
+                    config = contracts[name]
+                    data = thermal_input.get_data_file(name, data_year)
+                    if data.shape[0] == 0:
+                        continue
+                    period = (config.ppa_start, config.ppa_end)
+                    mover = config.mover_dependency
+                    if mover is None:
+                        units.append((name, "base", config.dispatch_args(plant, None, None, maint_per, MinUpTime,
+                                                                         MinDownTime), base_kwargs, period))
+                        model = DispatchModel(*config.dispatch_args(plant, data, data.shape[0], maint_per, MinUpTime,
+                                                                    MinDownTime), **base_kwargs)
+                    else:
+                        units.append((name, "ppa", config.ppa_args(plant, None, None), {}, period))
+                        data = attach_mover_on(data, mover, results.get(mover))
+                        model = DispatchModelPPA(*config.ppa_args(plant, data, data.shape[0]))
+                    model.solve(**solve_kwargs)
+                    results[name] = model.get_results()
+                    sequential += float(model.get_objective())
+            with timer.phase("solver call", label, year, mode="fleet") as joint:
+                fleet = FleetDispatch(data_year, units, name=label, warm_start=True)
+                fleet.solve(**solve_kwargs)
+            rows.append((label, year, sequential, float(fleet.get_objective()), seq["wall"], joint["wall"]))
+    return pd.DataFrame(rows, columns=["group", "year", "sequential", "fleet", "sequential_s", "fleet_s"])
+
+
+def case_label(months, ppas, years):
+    return f"m{months}_p{ppas}_y{years}"
+
+
+def run_suite(months=(1, 3, 12), ppas=(1, 3), years=1, engine="pyomo", solve_kwargs=None, excel=False,
+              workdir="benchmarks", formulation="weak"):
+    """ Sweeps the horizon length and the contract count; returns {case: {"phases", "objectives"}} """
+    suite = {}
+    for m in months:
+        for p in ppas:
+            case = case_label(m, p, years)
+            print(f"Benchmark {case} (T = {sum(MONTH_DAYS[:m])}, {p + 1} contracts)...")
+            timer, objectives = run_case(m, p, years, engine, solve_kwargs, excel, workdir, formulation=formulation)
+            phases = timer.summary()
+            suite[case] = {"phases": {phase: float(phases.at[phase, "wall"]) for phase in phases.index},
+                           "objectives": objectives}
+    return suite
+
+
+def save_baseline(suite, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(suite, f, indent=1)
+    return path
+
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(suite, baseline, rel_tol=1e-4, slowdown=SLOWDOWN):
+    """ One row per case and metric: phase wall times (flagged "slower" beyond `slowdown` times
+    the baseline) and objectives (flagged "regressed" beyond rel_tol, which should cover the
+    solver's relative gap) """
+    rows = []
+    for case, current in suite.items():
+        if case not in baseline:
+            continue
+        base = baseline[case]
+        for phase in TIMED_PHASES:
+            if phase in current["phases"] and phase in base["phases"]:
+                now, before = current["phases"][phase], base["phases"][phase]
+                ratio = now / before if before > 0 else None
+                flag = "slower" if ratio is not None and ratio > slowdown else "ok"
+                rows.append((case, phase, before, now, ratio, flag))
+        for key, now in current["objectives"].items():
+            before = base["objectives"].get(key)
+            if before is None:
+                rows.append((case, key, None, now, None, "new"))
+                continue
+            diff = abs(now - before) / max(abs(before), 1.0)
+            rows.append((case, key, before, now, diff, "regressed" if diff > rel_tol else "ok"))
+    return pd.DataFrame(rows, columns=["case", "metric", "baseline", "current", "ratio", "flag"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scaling benchmark on synthetic inputs")
+    parser.add_argument("--months", type=int, nargs="+", default=[1, 3, 12], help="horizon lengths in months")
+    parser.add_argument("--ppas", type=int, nargs="+", default=[1, 3], help="PPA counts (plus the Base unit)")
+    parser.add_argument("--years", type=int, default=1)
+    parser.add_argument("--engine", default="pyomo", help="model engine of DispatchModel")
+    parser.add_argument("--formulation", default="weak", choices=["weak", "tight"],
+                        help="commitment formulation of the models")
+    parser.add_argument("--solver", default="highs")
+    parser.add_argument("--gap", type=float, default=1e-4)
+    parser.add_argument("--excel", action="store_true", help="write and read a real workbook")
+    parser.add_argument("--workdir", default="benchmarks")
+    parser.add_argument("--save", help="write the results as a baseline JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--fleet", action="store_true",
+                        help="compare sequential and joint (FleetDispatch) solves of the mover groups instead")
+    parser.add_argument("--prescreen", action="store_true",
+                        help="compare solves with and without prescreening (objective, fixed hours, solver time) instead")
+    parser.add_argument("--formulations", action="store_true",
+                        help="compare the weak and the tight formulation (nodes, solver time, objective) instead")
+    args = parser.parse_args(argv)
+
+    solve_kwargs = {"solver_name": args.solver, "gap": args.gap}
+    if args.prescreen:
+        for m in args.months:
+            for p in args.ppas:
+                print(f"Prescreen benchmark {case_label(m, p, args.years)}...")
+                print(prescreen_case(m, p, args.years, args.engine, solve_kwargs,
+                                     formulation=args.formulation).to_string(index=False))
+        return
+    if args.formulations:
+        for m in args.months:
+            for p in args.ppas:
+                print(f"Formulation benchmark {case_label(m, p, args.years)}...")
+                table = formulation_case(m, p, args.years, args.engine, solve_kwargs)
+                print(table.to_string(index=False))
+                print(table[["nodes_weak", "nodes_tight", "wall_weak", "wall_tight"]].sum().to_string())
+        return
+    if args.fleet:
+        for m in args.months:
+            for p in args.ppas:
+                print(f"Fleet benchmark {case_label(m, p, args.years)}...")
+                table = fleet_case(m, p, args.years, solve_kwargs)
+                table["gain"] = table["fleet"] - table["sequential"]
+                print(table.to_string(index=False))
+        return
+    suite = run_suite(args.months, args.ppas, args.years, args.engine, solve_kwargs, args.excel, args.workdir,
+                      args.formulation)
+    for case, values in suite.items():
+        print(case, {phase: round(wall, 3) for phase, wall in values["phases"].items()})
+    if args.save:
+        print(f"Baseline written to {save_baseline(suite, args.save)}")
+    if args.compare:
+        table = compare(suite, load_baseline(args.compare), rel_tol=2 * args.gap + 1e-6)
+        print(table.to_string(index=False))
+        if (table["flag"] == "regressed").any():
+            raise SystemExit("Objective regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
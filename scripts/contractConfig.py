@@ -0,0 +1,253 @@
+import pandas as pd
+from types import MappingProxyType
+
+
+class ContractConfigError(ValueError):
+    """ Raised at load time when the PPA or Plant_Param sheet cannot be parsed """
+
+
+# Row labels of the PPA sheet
+PPA_ROWS = {
+    "gas_hub": "Gas_Hub",
+    "lmp_hub": "LMP_Hub",
+    "nox": "NOx",
+    "sox": "SOx",
+    "co2": "CO2",
+    "hot_start_duration": "Hot Start Duration (hour)",
+    "cold_start_duration": "Cold Start Duration (hour)",
+    "start_cost_hot": "Hot Start Cost ($/start)",
+    "start_cost_warm": "Warm start Cost ($/start)",
+    "start_cost_cold": "Cold start Cost ($/start)",
+    "ramp_rate": "Ramp up rate (MW/min)",
+    "heat_rate": "Heat_Rate",
+    "ppa_start": "PPA_Start",
+    "ppa_end": "PPA_End",
+    "mincap": "Contracted_Min",
+    "maxcap": "Contracted_Cap",
+    "vom": "VOM",
+    "dispatch_run": "Dispatch_Run",
+    "mover_dependency": "Mover_Dependency",
+    "eoh": "EOH ($/h)",
+    "ltsa": "LTSA ($/start)",
+}
+
+
+class ContractConfig:
+    """ Immutable, validated parameters of one contract column of the PPA sheet """
+    __slots__ = ("name",) + tuple(PPA_ROWS)
+
+    def __init__(self, name, **values):
+        object.__setattr__(self, "name", name)
+        for field in PPA_ROWS:
+            object.__setattr__(self, field, values[field])
+
+    def __setattr__(self, key, value):
+        raise AttributeError("ContractConfig is immutable")
+
+    def __reduce__(self):
+        # Pickled for worker processes; the default slot restore would go through __setattr__
+        return (_restore_contract, (self.name, {field: getattr(self, field) for field in PPA_ROWS}))
+
+    def __repr__(self):
+        return f"ContractConfig({self.name!r})"
+
+    @property
+    def nox_zone(self):
+        return "NOx_" + self.nox
+
+    @property
+    def sox_zone(self):
+        return "SOx_" + self.sox
+
+    @property
+    def co2_zone(self):
+        return "CO2_" + self.co2
+
+    @property
+    def vom_type(self):
+        return self.name + "_" + self.vom
+
+    @property
+    def years(self):
+        return self.ppa_start.year, self.ppa_end.year
+
+    def dispatch_args(self, plant, data, T, maint_per, MinUpTime, MinDownTime):
+        """ Positional arguments of DispatchModel for this contract """
+        return (data, self.gas_hub, self.lmp_hub, self.nox_zone, self.co2_zone, self.sox_zone,
+                self.hot_start_duration, self.cold_start_duration, self.heat_rate, MinUpTime, MinDownTime,
+                self.start_cost_hot, self.start_cost_warm, self.start_cost_cold,
+                plant.sox_rate, plant.nox_rate, plant.co2_rate, self.mincap, self.maxcap,
+                self.vom_type, maint_per, T, self.ltsa, self.eoh, self.name)
+
+    def ppa_args(self, plant, data, T):
+        """ Positional arguments of DispatchModelPPA for this contract """
+        return (data, self.gas_hub, self.lmp_hub, self.nox_zone, self.co2_zone, self.sox_zone,
+                self.hot_start_duration, self.cold_start_duration, self.heat_rate,
+                self.start_cost_hot, self.start_cost_warm, self.start_cost_cold,
+                plant.sox_rate, plant.nox_rate, plant.co2_rate, self.mincap, self.maxcap,
+                self.vom_type, self.mover_dependency, self.name, T, self.ltsa, self.eoh)
+
+
+class PlantParams:
+    """ Immutable values of the Plant_Param sheet """
+    __slots__ = ("values", "sox_rate", "nox_rate", "co2_rate")
+
+    def __init__(self, values):
+        object.__setattr__(self, "values", MappingProxyType(dict(values)))
+        object.__setattr__(self, "sox_rate", self.values["SOx_Rate"])
+        object.__setattr__(self, "nox_rate", self.values["NOx_Rate"])
+        object.__setattr__(self, "co2_rate", self.values["CO2_Rate"])
+
+    def __setattr__(self, key, value):
+        raise AttributeError("PlantParams is immutable")
+
+    def __reduce__(self):
+        return (PlantParams, (dict(self.values),))
+
+
+def _restore_contract(name, values):
+    return ContractConfig(name, **values)
+
+
+def _number(val, default=0.0):
+    """ Float value of a cell, `default` for blanks """
+    if pd.isna(val):
+        return default
+    return float(val)
+
+
+def _required_number(val):
+    if pd.isna(val):
+        raise ValueError("value is missing")
+    return float(val)
+
+
+def _duration(val):
+    """ Start durations are written as "H8"; anything shorter than that means 0 """
+    if isinstance(val, str) and len(val) > 1:
+        return int(val[1:])
+    return 0
+
+
+def _flag(val):
+    if pd.isna(val):
+        return False
+    if isinstance(val, str):
+        if val.strip().lower() in ("true", "yes", "y", "1"):
+            return True
+        if val.strip().lower() in ("false", "no", "n", "0", ""):
+            return False
+        raise ValueError(f"not a yes/no value: {val!r}")
+    return bool(val)
+
+
+def _text(val):
+    if pd.isna(val):
+        return None
+    return str(val)
+
+
+def _required_text(val):
+    if pd.isna(val) or str(val).strip() == "":
+        raise ValueError("value is missing")
+    return str(val)
+
+
+def _date(val):
+    if pd.isna(val):
+        raise ValueError("date is missing")
+    return pd.Timestamp(val)
+
+
+PARSERS = {
+    "gas_hub": _required_text,
+    "lmp_hub": _required_text,
+    "nox": _required_text,
+    "sox": _required_text,
+    "co2": _required_text,
+    "hot_start_duration": _duration,
+    "cold_start_duration": _duration,
+    "start_cost_hot": _number,
+    "start_cost_warm": _number,
+    "start_cost_cold": _number,
+    "ramp_rate": _number,
+    "heat_rate": _number,
+    "ppa_start": _date,
+    "ppa_end": _date,
+    "mincap": _required_number,
+    "maxcap": _required_number,
+    "vom": _required_text,
+    "dispatch_run": _flag,
+    "mover_dependency": _text,
+    "eoh": _number,
+    "ltsa": _number,
+}
+
+
+def compile_contracts(df_ppa):
+    """ Parses every contract column of the PPA sheet once.
+    Problems in contracts with Dispatch_Run set are collected and raised together; disabled
+    contracts keep None for the values that do not parse """
+    data = df_ppa.set_index("Param")
+    missing = [label for label in PPA_ROWS.values() if label not in data.index]
+    if missing:
+        raise ContractConfigError(f"PPA sheet is missing rows: {', '.join(missing)}")
+
+    contracts, errors = {}, []
+    for name in data.columns:
+        column = data[name]
+        try:
+            enabled = _flag(column.loc[PPA_ROWS["dispatch_run"]])
+        except ValueError as e:
+            errors.append(f"{name} / Dispatch_Run: {e}")
+            continue
+
+        values = {}
+        for field, label in PPA_ROWS.items():
+            try:
+                values[field] = PARSERS[field](column.loc[label])
+            except (ValueError, TypeError) as e:
+                if enabled:
+                    errors.append(f"{name} / {label}: {e}")
+                values[field] = None
+        if enabled and values["ppa_start"] is not None and values["ppa_end"] is not None \
+                and values["ppa_start"] > values["ppa_end"]:
+            errors.append(f"{name}: PPA_Start is after PPA_End")
+        contracts[name] = ContractConfig(name, **values)
+
+    if errors:
+        raise ContractConfigError("Invalid PPA sheet:\n  " + "\n  ".join(errors))
+    return MappingProxyType(contracts)
+
+
+def mover_closure(contracts, names, available):
+    """ `names` with every mover they depend on through Mover_Dependency, in the order of
+    `available` (the contracts that can run). Raises ContractConfigError for a name that is
+    not available or a mover chain that leaves it """
+    needed = []
+    for name in names:
+        chain = name
+        while chain is not None and chain not in needed:
+            if chain not in available:
+                if chain == name:
+                    raise ContractConfigError(f"{name} is not a dispatched contract, expected one of {list(available)}")
+                raise ContractConfigError(f"{name} needs the results of {chain}, which is not dispatched")
+            needed.append(chain)
+            chain = contracts[chain].mover_dependency if chain != "Base" else None
+    return [name for name in available if name in needed]
+
+
+def compile_plant_params(df_param):
+    """ Parses the Plant_Param sheet (Param/Value) once """
+    data = df_param.set_index("Param")["Value"]
+    values = {}
+    for param, val in data.items():
+        try:
+            values[param] = float(val)
+        except (ValueError, TypeError):
+            values[param] = val
+    missing = [p for p in ("SOx_Rate", "NOx_Rate", "CO2_Rate")
+               if not isinstance(values.get(p), float) or pd.isna(values[p])]
+    if missing:
+        raise ContractConfigError(f"Plant_Param sheet has no numeric value for: {', '.join(missing)}")
+    return PlantParams(values)
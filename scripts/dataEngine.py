@@ -1,10 +1,81 @@
 import pandas as pd
-from datetime import datetime
+import numpy as np
+from scripts.snapshotCache import SnapshotCache
+from scripts.contractConfig import compile_contracts, compile_plant_params
+
+# Attribute name -> sheet of the input workbook
+SHEETS = {
+    "df_lmp": "LMP",
+    "df_param": "Plant_Param",
+    "df_gas": "Gas",
+    "df_nox": "NOx",
+    "df_sox": "SOx",
+    "df_co2": "CO2",
+    "df_vom": "VOM",
+    "df_maint": "Maint",
+    "df_ppa": "PPA",
+    "df_adder_st": "Adder ($ per start)",
+    "df_adder_bid": "Adder(% Bid)",
+}
+
+# Hub rows of the PPA sheet -> ContractConfig fields
+HUB_FIELDS = {"Gas_Hub": "gas_hub", "LMP_Hub": "lmp_hub"}
+
+# Time keys and the smallest integer type that holds them
+TIME_KEYS = {"Year": np.int16, "Month": np.int8, "Day": np.int8, "Hour": np.int8}
+
+
+def compact_frame(df, rtol=1e-6):
+    """ The hourly frame in a compact layout: int8/int16 time keys, float32 for every float
+    column whose values survive the round trip within `rtol`, and categorical text columns.
+    About half the memory of the all-64-bit frame; the models widen their own columns back
+    to float64 (see economics.column_values) """
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if col in TIME_KEYS and pd.api.types.is_numeric_dtype(values) and values.notna().all() \
+                and values.between(*_int_range(TIME_KEYS[col])).all():
+            columns[col] = values.astype(TIME_KEYS[col])
+        elif pd.api.types.is_float_dtype(values) and values.dtype != np.float32:
+            wide = values.to_numpy(dtype=np.float64)
+            narrow = wide.astype(np.float32)
+            with np.errstate(over="ignore", invalid="ignore"):
+                exact = np.allclose(narrow, wide, rtol=rtol, atol=0.0, equal_nan=True)
+            columns[col] = pd.Series(narrow, index=df.index) if exact else values
+        elif values.dtype == object and values.nunique() <= len(values) // 2:
+            columns[col] = values.astype("category")
+        else:
+            columns[col] = values
+    return pd.DataFrame(columns, index=df.index)
+
+
+def _int_range(dtype):
+    info = np.iinfo(dtype)
+    return info.min, info.max
+
 
 class ThermalDispatchInput:
-    def __init__(self, file_path):
+    def __init__(self, file_path, cache_dir=None):
         self.file_path = file_path
+        self.cache = SnapshotCache(cache_dir, file_path) if cache_dir else None
         self._read_inputs()
+        self._compile()
+
+    @classmethod
+    def from_frames(cls, sheets):
+        """ Input built from already loaded sheets ({sheet name: DataFrame}, as in SHEETS) """
+        self = cls.__new__(cls)
+        self.file_path = None
+        self.cache = None
+        for attr, sheet in SHEETS.items():
+            setattr(self, attr, sheets[sheet].copy())
+        self._compile()
+        return self
+
+    def _compile(self):
+        # Parse and validate the PPA and Plant_Param sheets once, so bad inputs fail at load time
+        self.contracts = compile_contracts(self.df_ppa)
+        self.plant = compile_plant_params(self.df_param)
         self.month_mapping = {
             1: 'Jan', 2: 'Feb', 3: 'Mar', 4: 'Apr', 5: 'May', 6: 'Jun', 
             7: 'Jul', 8: 'Aug', 9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Dec'
@@ -12,27 +83,110 @@ class ThermalDispatchInput:
         
 
     def _read_inputs(self):
-        """ Reads all the input data from the excel file """
+        """ Reads all the input data from the excel file, or from the snapshot cache when it is current """
+        if self.cache is not None and all(self.cache.has(attr) for attr in SHEETS):
+            for attr in SHEETS:
+                setattr(self, attr, self.cache.load(attr))
+            return
+
         with pd.ExcelFile(self.file_path) as xlsModel:
             # Read tabs of the input sheet
-            self.df_lmp = pd.read_excel(xlsModel, 'LMP')
-            self.df_param = pd.read_excel(xlsModel, 'Plant_Param')
-            self.df_gas = pd.read_excel(xlsModel, 'Gas')
-            self.df_nox = pd.read_excel(xlsModel, 'NOx')
-            self.df_sox = pd.read_excel(xlsModel, 'SOx')
-            self.df_co2 = pd.read_excel(xlsModel, 'CO2')
-            self.df_vom = pd.read_excel(xlsModel, 'VOM')
-            self.df_maint = pd.read_excel(xlsModel, 'Maint')
-            self.df_ppa = pd.read_excel(xlsModel, 'PPA')
-            self.df_adder_st = pd.read_excel(xlsModel, 'Adder ($ per start)')
-            self.df_adder_bid = pd.read_excel(xlsModel, 'Adder(% Bid)')
+            for attr, sheet in SHEETS.items():
+                setattr(self, attr, pd.read_excel(xlsModel, sheet))
+
+        if self.cache is not None:
+            for attr in SHEETS:
+                self.cache.save(attr, getattr(self, attr))
+
+    def build_features(self):
+        """ Builds the hourly feature frame (LMP, gas, VOM, emissions and adders) used by every run.
+        All monthly inputs are joined once on a (Year, Month) code and gathered onto the hours in one pass """
+        monthly = self.get_monthly_features()
+        df_new = self.df_lmp.drop(columns=["Weekday", "Type", "Leap"])
+
+        table_codes = monthly.index.to_numpy()
+        hour_codes = self._month_code(df_new["Year"], df_new["Month"])
+        values = np.full((len(df_new), monthly.shape[1]), np.nan)
+        if len(table_codes) > 0:
+            pos = np.searchsorted(table_codes, hour_codes).clip(0, len(table_codes) - 1)
+            found = table_codes[pos] == hour_codes
+            values[found] = monthly.to_numpy(dtype=float)[pos[found]]
+        features = pd.DataFrame(values, columns=monthly.columns, index=df_new.index)
+
+        # Gas is left as is (NaN where missing), every other monthly input defaults to 0
+        fill_cols = [c for c in monthly.columns if c not in self._gas_columns()]
+        features[fill_cols] = features[fill_cols].fillna(0)
+        return compact_frame(pd.concat([df_new, features], axis=1))
+
+    def get_monthly_features(self):
+        """ One table keyed by the (Year, Month) code with every monthly input as a column """
+        frames = [self._monthly_frame(self.df_gas, self._gas_columns())]
+
+        vom = self._monthly_frame(self.df_vom, self.df_vom.columns[2:])
+        frames.append(pd.DataFrame({config.vom_type: vom[config.vom]
+                                    for config in self.contracts.values() if config.vom is not None},
+                                   index=vom.index))
+
+        for name, df in (("NOx", self.df_nox), ("SOx", self.df_sox), ("CO2", self.df_co2)):
+            frames.append(self._monthly_frame(df, df.columns[2:]).add_prefix(name + "_"))
+
+        frames.append(self._adder_frame(self.df_adder_st).rename("Adder_st").to_frame())
+        frames.append(self._adder_frame(self.df_adder_bid).rename("Adder_bid").to_frame())
+
+        return pd.concat(frames, axis=1).sort_index()
+
+    def _gas_columns(self):
+        return list(self.df_gas.columns[2:])
+
+    @staticmethod
+    def _month_code(year, month):
+        """ Year * 12 + (Month - 1), with -1 for hours without a valid year or month """
+        year = pd.to_numeric(year, errors="coerce").to_numpy(dtype=float)
+        month = pd.to_numeric(month, errors="coerce").to_numpy(dtype=float)
+        code = year * 12 + month - 1
+        return np.where(np.isnan(code), -1, code).astype(np.int64)
+
+    def _monthly_frame(self, df, columns):
+        """ Selected columns of a Year/Month sheet, indexed by the month code """
+        frame = df[list(columns)].copy()
+        frame.index = self._month_code(df["Year"], df["Month"])
+        return frame[~frame.index.duplicated()]
+
+    def _adder_table(self, df):
+        """ Adder sheet indexed by year, with one column per month name """
+        return df.set_index("Year") if "Year" in df.columns else df
+
+    def _adder_frame(self, df):
+        """ Adder sheet (one row per year, one column per month) melted onto the month code """
+        table = self._adder_table(df)
+        codes, values = [], []
+        for month, month_name in self.month_mapping.items():
+            if month_name in table.columns:
+                years = pd.to_numeric(pd.Series(table.index), errors="coerce").to_numpy(dtype=float)
+                codes.append(years * 12 + month - 1)
+                values.append(table[month_name].to_numpy())
+        if not codes:
+            return pd.Series(dtype=float)
+        codes, values = np.concatenate(codes), np.concatenate(values)
+        keep = ~np.isnan(codes)
+        series = pd.Series(values[keep], index=codes[keep].astype(np.int64))
+        return series[~series.index.duplicated()]
+
+    def get_features(self):
+        """ Hourly feature frame, loaded from the snapshot cache when the workbook is unchanged """
+        if self.cache is not None and self.cache.has("features"):
+            return self.cache.load("features")
+        df_new = self.build_features()
+        if self.cache is not None:
+            self.cache.save("features", df_new)
+        return df_new
     
     def add_gox(self, data, name):
         if name == "NOx":
             for i in range(2, self.df_nox.shape[1]):  # Start from 2nd column
                 zone_name = self.df_nox.columns[i]  # Get column name
                 new_name = f"{name}_{zone_name}"  # Construct new column name
-                data = data.merge(self.df_sox[["Year", "Month", zone_name]], on=["Year", "Month"], how="left")
+                data = data.merge(self.df_nox[["Year", "Month", zone_name]], on=["Year", "Month"], how="left")
                 data.rename(columns={zone_name: new_name}, inplace=True)
                 data[new_name] = data[new_name].fillna(0)
 
@@ -87,58 +241,26 @@ class ThermalDispatchInput:
 
     def get_start_time(self, col_name):
         """ Get the hot start and cold start duration based on the selected column name """
-        data_ppa = self.df_ppa.set_index("Param")
-        # hot_st = int(data_ppa.loc["Hot Start Duration (hour)", col_name][1:] or 0)
-        val_hot = data_ppa.loc["Hot Start Duration (hour)", col_name]
-        if isinstance(val_hot, str) and len(val_hot) > 1:
-            hot_st = int(val_hot[1:])
-        else:
-            hot_st = 0
-
-        # cold_st = int(data_ppa.loc["Cold Start Duration (hour)", col_name][1:] or 0)
-        val_cold = data_ppa.loc["Cold Start Duration (hour)", col_name]
-        if isinstance(val_cold, str) and len(val_cold) > 1:
-            cold_st = int(val_cold[1:])
-        else:
-            cold_st = 0
-        return hot_st, cold_st
+        config = self.contracts[col_name]
+        return config.hot_start_duration, config.cold_start_duration
 
     def get_start_cost(self, col_name):
         """ Get the start costs (Hot, Warm, Cold) based on the selected column name """
-        data_ppa = self.df_ppa.set_index("Param")
-    
-        def get_cost(row_label):
-            val = data_ppa.loc[row_label, col_name]
-            return float(val) if pd.notna(val) else 0
-
-        hot_st_cost = get_cost("Hot Start Cost ($/start)")
-        warm_st_cost = get_cost("Warm start Cost ($/start)")
-        cold_st_cost = get_cost("Cold start Cost ($/start)")
-    
-        return hot_st_cost, warm_st_cost, cold_st_cost
-
+        config = self.contracts[col_name]
+        return config.start_cost_hot, config.start_cost_warm, config.start_cost_cold
 
     def get_ramp_rate(self, col_name):
         """ Get the ramp up rate based on the selected column name """
-        data_ppa = self.df_ppa.set_index("Param")
-        ramp = float(data_ppa.loc["Ramp up rate (MW/min)", col_name] or 0)
-
-        return ramp
+        return self.contracts[col_name].ramp_rate
 
     def get_heat_rate(self, col_name):
         """ Get the heat rate based on the selected column name """
-        data_ppa = self.df_ppa.set_index("Param")
-        h_rate = float(data_ppa.loc["Heat_Rate", col_name] or 0)
-
-        return h_rate
+        return self.contracts[col_name].heat_rate
 
     def get_data_file(self, col_name, data_inp):
         """ Filter the LMP data based on the PPA start and end date """
-        data = self.df_ppa.set_index("Param")
-        start_date = data.loc["PPA_Start", col_name]
-        end_date = data.loc["PPA_End", col_name]
-
-        filtered_df = data_inp[(data_inp["Date"] >= start_date) & (data_inp["Date"] <= end_date)]
+        config = self.contracts[col_name]
+        filtered_df = data_inp[(data_inp["Date"] >= config.ppa_start) & (data_inp["Date"] <= config.ppa_end)]
 
         return filtered_df
     
@@ -163,46 +285,40 @@ class ThermalDispatchInput:
         return (data["Month"]== value).sum()
     
     def get_gox_rate(self, name1, name2, name3):
-        data = self.df_param.set_index("Param")
-        return float(data.loc[name1, "Value"]), float(data.loc[name2, "Value"]), float(data.loc[name3, "Value"]) 
+        values = self.plant.values
+        return float(values[name1]), float(values[name2]), float(values[name3])
 
     def get_hub(self, name_hub, name_ppa):
-        data = self.df_ppa.set_index("Param")
-        return data.loc[name_hub, name_ppa]
+        return getattr(self.contracts[name_ppa], HUB_FIELDS[name_hub])
 
     def get_gox_zone(self, name_gas, name_ppa):
-        data = self.df_ppa.set_index("Param")
-        return name_gas + "_" + data.loc[name_gas, name_ppa]
+        return name_gas + "_" + getattr(self.contracts[name_ppa], name_gas.lower())
     
     def get_cap(self, name_ppa):
-        data = self.df_ppa.set_index("Param")
-        return float(data.loc["Contracted_Min", name_ppa]),float(data.loc["Contracted_Cap", name_ppa]) 
+        config = self.contracts[name_ppa]
+        return config.mincap, config.maxcap
     
     def get_vom_type(self, name_ppa):
-        data = self.df_ppa.set_index("Param")
-        return name_ppa + "_" + data.loc["VOM", name_ppa]
+        return self.contracts[name_ppa].vom_type
     
     def check_ppa_status(self, name_ppa):
-        data = self.df_ppa.set_index("Param")
-        return data.loc["Dispatch_Run", name_ppa]
+        return self.contracts[name_ppa].dispatch_run
+
+    def enabled_ppas(self):
+        """ PPA columns (after Base) with Dispatch_Run set, in sheet order """
+        return [name for name in self.df_ppa.columns[2:] if self.check_ppa_status(name) == True]
 
     def get_time(self, col_name):
-        data = self.df_ppa.set_index("Param")
-        start_date = data.loc["PPA_Start", col_name]
-        end_date = data.loc["PPA_End", col_name]
-        st_date_obj = datetime.strptime(str(start_date), "%Y-%m-%d %H:%M:%S")
-        end_date_obj = datetime.strptime(str(end_date), "%Y-%m-%d %H:%M:%S")
-        st_year = st_date_obj.year
-        end_year = end_date_obj.year
-        return st_year, end_year
+        return self.contracts[col_name].years
     
     def get_adder(self, row):
         year = row['Year']
         month = row['Month']
         month_name = self.month_mapping.get(month, None)
     
-        if month_name and year in self.df_adder_st.index:
-            return self.df_adder_st.at[year, month_name]
+        adder = self._adder_table(self.df_adder_st)
+        if month_name and year in adder.index:
+            return adder.at[year, month_name]
         return 0  # Default to zero if no match found
 
     def get_adder_bid(self, row):
@@ -210,14 +326,14 @@ class ThermalDispatchInput:
         month = row['Month']
         month_name = self.month_mapping.get(month, None)
     
-        if month_name and year in self.df_adder_bid.index:
-            return self.df_adder_bid.at[year, month_name]
+        adder = self._adder_table(self.df_adder_bid)
+        if month_name and year in adder.index:
+            return adder.at[year, month_name]
         return 0  # Default to zero if no match found
         
     
     def get_mover_dependency(self, name):
-        data = self.df_ppa.set_index("Param")
-        return data.loc["Mover_Dependency", name]
+        return self.contracts[name].mover_dependency
 
     def get_maint_per(self, year):
         data = self.df_maint.set_index("Year")
@@ -237,29 +353,7 @@ class ThermalDispatchInput:
         return maint
     
     def get_eoh(self, col_name):
-        data = self.df_ppa.set_index("Param")
-        eoh = data.loc["EOH ($/h)", col_name]
-
-        if pd.notna(eoh):
-            return eoh
-        else:
-            return 0
+        return self.contracts[col_name].eoh
         
     def get_ltsa(self, col_name):
-        data = self.df_ppa.set_index("Param")
-        ltsa = data.loc["LTSA ($/start)", col_name]
-
-        if pd.notna(ltsa):
-            return ltsa
-        else:
-            return 0
-
-
-
-
-
-
-
-
-
-
+        return self.contracts[col_name].ltsa
@@ -0,0 +1,132 @@
+import inspect
+import time
+import numpy as np
+from scripts.dispatchBase import DispatchModel, MONTH_DAYS, START_INDEX
+from scripts.runner import YearJob, run_jobs
+from scripts.solvers import SolverError
+
+# Solve outcomes of the restricted seam problem that a wider free band can resolve
+REPAIRABLE = ("infeasible", "no_solution")
+
+
+class WindowedDispatch:
+    """ Drop-in replacement for one yearly DispatchModel that decomposes the year into windows.
+
+    The year is split into windows of `months_per_window` months (using the month offsets of
+    DispatchModel), each extended by `overlap` hours on both sides. The windows are solved in
+    parallel with the same constraints, restricted to their own maintenance months, and only
+    their core hours are kept. The seams are then repaired with one full-year solve in which ON
+    is fixed to the stitched schedule except within `seam_radius` hours of each seam, so the
+    min up/down, start-type and maintenance constraints hold across the whole year.
+    With compare=True the monolithic model is solved as well and the objective gap is reported.
+    """
+    def __init__(self, *args, months_per_window=1, overlap=48, seam_radius=None, workers=None,
+                 compare=False, **kwargs):
+        params = inspect.signature(DispatchModel).bind(*args, **kwargs).arguments
+        self.params = dict(params)
+        self.data = self.params.pop("data")
+        self.maint_per = self.params.pop("maint_per")
+        self.T = self.params.pop("T")
+        self.name = self.params.get("name", "Base")
+        self.months_per_window = months_per_window
+        self.overlap = overlap
+        if seam_radius is None:
+            seam_radius = 2 * max(self.params["MinUpTime"], self.params["MinDownTime"],
+                                  self.params["t_uppers"], 1)
+        self.seam_radius = seam_radius
+        self.workers = workers
+        self.compare = compare
+        self.stats = {}
+
+    def _windows(self):
+        """ (months, core_start, core_end, lo, hi) for every window that has hours in this year """
+        windows = []
+        firsts = list(range(0, 12, self.months_per_window))
+        for i, m0 in enumerate(firsts):
+            months = list(range(m0, min(m0 + self.months_per_window, 12)))
+            core_start = START_INDEX[m0]
+            core_end = START_INDEX[firsts[i + 1]] if i + 1 < len(firsts) else self.T
+            core_end = min(core_end, self.T)
+            if core_start >= core_end:
+                continue
+            lo, hi = max(0, core_start - self.overlap), min(self.T, core_end + self.overlap)
+            windows.append((months, core_start, core_end, lo, hi))
+        return windows
+
+    def _window_job(self, index, window, solve_kwargs):
+        months, _, _, lo, hi = window
+        # Only maintenance months that lie entirely inside the window are constrained there
+        months = [m for m in months if START_INDEX[m] + MONTH_DAYS[m] <= hi]
+        kwargs = dict(self.params, data=self.data.iloc[lo:hi], T=hi - lo,
+                      maint_per=[self.maint_per[m] for m in months],
+                      start_index=[START_INDEX[m] - lo for m in months],
+                      month_days=[MONTH_DAYS[m] for m in months])
+        return YearJob(self.name, index, DispatchModel, (), kwargs, solve_kwargs)
+
+    def _full_model(self, **overrides):
+        # Screening holds for the whole year's optimum, not for the seam repair around fixed windows
+        return DispatchModel(**dict(self.params, data=self.data, T=self.T, maint_per=self.maint_per,
+                                    prescreen=False, **overrides))
+
+    def solve(self, **solve_kwargs):
+        time_start = time.time()
+        windows = self._windows()
+        jobs = [self._window_job(i, w, solve_kwargs) for i, w in enumerate(windows)]
+        window_results = run_jobs(jobs, workers=self.workers)
+
+        on = np.zeros(self.T)
+        for (_, core_start, core_end, lo, _), result in zip(windows, window_results):
+            values = result["ON_" + self.name].to_numpy(dtype=float)
+            on[core_start:core_end] = np.round(values[core_start - lo:core_end - lo])
+        time_windows = time.time()
+
+        # Repair the seams; widen the free band if the restricted problem has no solution
+        seams = [w[1] for w in windows[1:]]
+        radius = self.seam_radius
+        while True:
+            free = np.zeros(self.T, dtype=bool)
+            for seam in seams:
+                free[max(0, seam - radius):min(self.T, seam + radius)] = True
+            # The stitched windows, repaired where needed, are the incumbent for the seam solve
+            self.model = self._full_model(warm_start=on if self.params.get("warm_start") else None)
+            self.model.fix_commitment(on, free)
+            try:
+                self.model.solve(**solve_kwargs)
+                results = self.model.get_results()
+                if not results["ON_" + self.name].isna().any():
+                    break
+            except SolverError as e:
+                if free.all() or e.result is None or e.result.status not in REPAIRABLE:
+                    raise
+            if free.all():
+                raise RuntimeError(f"Seam repair found no feasible schedule for {self.name}")
+            radius *= 2
+        time_repair = time.time()
+
+        self.stats = {
+            "windows": len(windows),
+            "seam_radius": radius,
+            "free_hours": int(free.sum()),
+            "window_time": time_windows - time_start,
+            "repair_time": time_repair - time_windows,
+            "objective": self.model.get_objective(),
+        }
+        if self.compare:
+            # A persistent model would load into the template holding the repaired schedule
+            engine = "pyomo" if self.params.get("engine") == "persistent" else self.params.get("engine", "pyomo")
+            monolithic = self._full_model(engine=engine)
+            monolithic.solve(**solve_kwargs)
+            mono_obj = monolithic.get_objective()
+            self.stats["monolithic_objective"] = mono_obj
+            self.stats["monolithic_time"] = time.time() - time_repair
+            self.stats["gap"] = (mono_obj - self.stats["objective"]) / abs(mono_obj) if mono_obj else 0.0
+            print(f"{self.name}: decomposed objective {self.stats['objective']:.2f} vs monolithic "
+                  f"{mono_obj:.2f} (gap {100 * self.stats['gap']:.3f}%), "
+                  f"{self.stats['window_time'] + self.stats['repair_time']:.1f}s vs "
+                  f"{self.stats['monolithic_time']:.1f}s")
+
+    def get_objective(self):
+        return self.model.get_objective()
+
+    def get_results(self):
+        return self.model.get_results()
@@ -2,14 +2,34 @@ from pyomo.environ import *
 import pandas as pd
 import numpy as np
 import math
+from scripts.matrixBuilder import MatrixModel
+from scripts.solvers import SolverOptions, SolveResult, solve_matrix, solve_pyomo, takes_start
+from scripts.warmStart import heuristic_schedule, warm_start_values, load_warm_start
+from scripts.dynamicDispatch import solve_dispatch_dp
+from scripts.parametricModel import get_template
+from scripts.resultStore import pyomo_values
+from scripts.economics import hourly_output, hourly_margin, column_values
+from scripts.prescreen import prescreen as prescreen_model
+
+# Hours per month and first hour of each month in a (non-leap) year
+MONTH_DAYS = [744, 672, 744, 720, 744, 720, 744, 744, 720, 744, 720, 744]
+START_INDEX = [0, 744, 1416, 2160, 2880, 3624, 4344, 5088, 5832, 6552, 7296, 8016]
+# Commitment formulations: "weak" is the original one, "tight" has the same integer optimum with a
+# stronger LP relaxation (facet-defining up/down rows, one state equation, start types that partition
+# each start) and without the unused variables
+FORMULATIONS = ("weak", "tight")
 
 class DispatchModel:
     def __init__(self, data, gas_price_col, power_price_col, nox_zone, co2_zone, sox_zone, 
                  t_lowers, t_uppers, heat_rate, MinUpTime, MinDownTime, Startcost_hot, 
                  Startcost_warm, Startcost_cold, sox_rate, nox_rate, co2_rate, 
-                 mincap, maxcap, vom_type, maint_per, T, ltsa, eoh, name = "Base", check_maint_con=False):
+                 mincap, maxcap, vom_type, maint_per, T, ltsa, eoh, name = "Base", check_maint_con=False,
+                 engine="pyomo", start_index=None, month_days=None, warm_start=None, formulation="weak",
+                 prescreen=False):
         
-        self.data = data.copy()
+        if formulation not in FORMULATIONS:
+            raise ValueError(f"Unknown formulation {formulation}, expected one of {FORMULATIONS}")
+        self.data = data
         self.T = T
         self.MinUpTime = MinUpTime
         self.MinDownTime = MinDownTime
@@ -23,21 +43,51 @@ class DispatchModel:
         self.ltsa = ltsa
         self.eoh = eoh
         self.check_maint_con = check_maint_con
-        self.month_days = [744, 672, 744, 720, 744, 720, 744, 744, 720, 744, 720, 744]
-        self.start_index = [0, 744, 1416, 2160, 2880, 3624, 4344, 5088, 5832, 6552, 7296, 8016]
+        self.engine = engine
+        self.formulation = formulation
+        # Hour offset and length of each maintenance month, overridable for partial-year windows
+        self.month_days = month_days or MONTH_DAYS
+        self.start_index = start_index or START_INDEX
         
-        self.cost = self.heat_rate * (self.data[gas_price_col] / 1000).reset_index(drop=True)
-        self.price = self.data[power_price_col].reset_index(drop=True)
-        self.gas_price = self.data[gas_price_col].reset_index(drop=True)
-        self.co2_cost = (self.data[co2_zone] * co2_rate).fillna(0).reset_index(drop=True)
-        self.sox_cost = (self.data[sox_zone] * sox_rate).fillna(0).reset_index(drop=True)
-        self.nox_cost = (self.data[nox_zone] * nox_rate).fillna(0).reset_index(drop=True)
-        self.varCost = self.data[vom_type].reset_index(drop=True)
-        self.bidAdder = self.data["Adder_bid"].reset_index(drop=True)
-        self.st_adder = self.data["Adder_st"].reset_index(drop=True)
-
-        self.model = ConcreteModel()
-        self._build_model()
+        # Hourly inputs as contiguous float64 arrays; the frame itself is not copied
+        self.gas_price = column_values(self.data, gas_price_col)
+        self.cost = self.heat_rate * (self.gas_price / 1000)
+        self.price = column_values(self.data, power_price_col)
+        self.co2_cost = column_values(self.data, co2_zone, co2_rate)
+        self.sox_cost = column_values(self.data, sox_zone, sox_rate)
+        self.nox_cost = column_values(self.data, nox_zone, nox_rate)
+        self.varCost = column_values(self.data, vom_type)
+        self.bidAdder = column_values(self.data, "Adder_bid")
+        self.st_adder = column_values(self.data, "Adder_st")
+
+        if self.engine == "dp" and self.check_maint_con == True:
+            # The maintenance-window formulation has no DP form, so these years stay on the MILP
+            self.engine = "matrix"
+        if self.engine == "persistent" and self.check_maint_con == True:
+            # Nor is it part of the parametric template
+            self.engine = "pyomo"
+        self.fixed = {}
+        if self.engine == "dp":
+            # Solved by dynamic programming in solve(), nothing to build
+            self.model = None
+        elif self.engine == "matrix":
+            self.model = None
+            self._build_matrix()
+        elif self.engine == "persistent":
+            # Shared template for this structure, with this year's coefficients written into its Params
+            self.template = get_template(self)
+            self.model = self.template.load(self)
+        else:
+            self.model = ConcreteModel()
+            self._build_model()
+
+        # prescreen: fix the hours whose commitment the coefficients already decide (see scripts.prescreen)
+        self.prescreen_stats = prescreen_model(self) if prescreen else None
+        # warm_start: True for the price-spread heuristic, or a previous ON schedule to repair. Loaded by
+        # solve() once the backend is known, and only when it reads a start on this engine
+        self.warm_start = warm_start
+        self.warm_started = False
+        self.initial_solution = None
 
     def init_a_ij_rule(model, i, j):
             """Initializes delta_type variables to 0."""
@@ -54,7 +104,8 @@ class DispatchModel:
         m.switch_on = Var(range(self.T), domain=Binary)
         m.switch_off = Var(range(self.T), domain = Binary)
         m.delta_type = Var(m.I, m.J, domain= Binary, initialize=init_a_ij_rule)
-        m.start_cost = Var(range(self.T), domain=NonNegativeReals)
+        if self.formulation == "weak":
+            m.start_cost = Var(range(self.T), domain=NonNegativeReals)
         m.elect = Var(range(self.T), domain=NonNegativeReals)
         if self.check_maint_con == True:
             artvar_index = []
@@ -81,6 +132,48 @@ class DispatchModel:
 
     def _define_constraints(self):
         m = self.model
+        if self.formulation == "tight":
+            self._define_tight_commitment()
+        else:
+            self._define_weak_commitment()
+
+        #Maintenance Constraint
+        if self.check_maint_con == True:
+            m.maint_cons = ConstraintList()
+            m.maint = ConstraintList()
+            for i in range(len(self.maint_per)):
+                if self.maint_per[i]==0.0:
+                    continue
+                else:
+                    st = self.start_index[i]
+                    k = math.ceil(self.month_days[i]*self.maint_per[i])
+                    for t in range(self.month_days[i]-k):
+                        m.maint.add(m.switch_off[st+t] + m.switch_on[st+k+t] >= 2*m.artvar[i,t])
+                        m.maint.add(sum(m.switch_off[st+i+t] for i in range(k+1)) <= (k+1)*(1-m.artvar[i,t])+1)
+                        m.maint.add(sum(m.switch_on[st+i+t] for i in range(k+1)) <= (k+1)*(1-m.artvar[i,t])+1)
+        
+                    m.maint_cons.add(sum(m.artvar[i,t] for t in range(self.month_days[i]-k))>=1)
+
+        else:
+            m.maint_cons = ConstraintList()
+            for i in range(len(self.maint_per)):
+                if self.maint_per[i]==0.0:
+                    continue
+                else:
+                    st = self.start_index[i]
+                    k = math.ceil(self.month_days[i]*self.maint_per[i])
+                    m.maint_cons.add(sum(m.ON[j] for j in range(st, min(st + self.month_days[i]+1, self.T)))<= self.month_days[i]-k)
+
+
+        # Capacity Constraints
+        m.cap = ConstraintList()
+        for t in range(self.T):    
+            m.cap.add(m.elect[t] <= self.maxcap * m.ON[t])
+            m.cap.add(m.elect[t] >= self.mincap * m.ON[t])
+
+    def _define_weak_commitment(self):
+        """ The original up/down time, start type and switch rows """
+        m = self.model
 
         # Up-time
         m.up_time = ConstraintList()
@@ -119,59 +212,203 @@ class DispatchModel:
         for t in range(self.T):
             m.delta_sum.add(sum(m.delta_type[t,i] for i in range(3)) >= m.switch_on[t])
 
-        #Maintenance Constraint
-        if self.check_maint_con == True:
-            m.maint_cons = ConstraintList()
-            m.maint = ConstraintList()
-            for i in range(len(self.maint_per)):
-                if self.maint_per[i]==0.0:
-                    continue
-                else:
-                    st = self.start_index[i]
-                    k = math.ceil(self.month_days[i]*self.maint_per[i])
-                    for t in range(self.month_days[i]-k):
-                        m.maint.add(m.switch_off[st+t] + m.switch_on[st+k+t] >= 2*m.artvar[i,t])
-                        m.maint.add(sum(m.switch_off[st+i+t] for i in range(k+1)) <= (k+1)*(1-m.artvar[i,t])+1)
-                        m.maint.add(sum(m.switch_on[st+i+t] for i in range(k+1)) <= (k+1)*(1-m.artvar[i,t])+1)
-        
-                    m.maint_cons.add(sum(m.artvar[i,t] for t in range(self.month_days[i]-k))>=1)
+    def _define_tight_commitment(self):
+        """ Up/down time, switch logic and start types with the integer solutions of the weak rows.
+        The up/down windows include hour t, which makes them facets of the min up/down polytope;
+        one state equation per hour replaces the three switch rows; the start types add up to
+        switch_on. Start-type windows begin where the weak ones do: before them any start type is
+        allowed, as the unit's history before the horizon is unknown (see allowed_start_types) """
+        m = self.model
+        m.up_time = ConstraintList()
+        for t in range(self.MinUpTime-1, self.T):
+            m.up_time.add(sum(m.switch_on[i] for i in range(t-self.MinUpTime+1, t+1)) <= m.ON[t])
+
+        m.down_time = ConstraintList()
+        for t in range(self.MinDownTime-1, self.T):
+            m.down_time.add(sum(m.switch_off[i] for i in range(t-self.MinDownTime+1, t+1)) <= 1-m.ON[t])
+
+        m.switch_constraint = ConstraintList()
+        for t in range(1, self.T):
+            m.switch_constraint.add(m.ON[t] - m.ON[t-1] == m.switch_on[t] - m.switch_off[t])
+
+        m.delta_start = ConstraintList()
+        for i, (p, q, t0) in enumerate([(1, self.t_lowers, self.t_lowers),
+                                        (self.t_lowers, self.t_uppers, self.t_uppers)]):
+            for j in range(t0, self.T):
+                m.delta_start.add(m.delta_type[j, i] <= sum(m.switch_off[j-z] for z in range(p, q)))
+
+        m.delta_sum = ConstraintList()
+        for t in range(self.T):
+            m.delta_sum.add(sum(m.delta_type[t, i] for i in range(3)) == m.switch_on[t])
+
+    def _build_matrix(self):
+        """ Builds the same MILP as _build_model/_define_constraints directly as a sparse matrix """
+        T = self.T
+        hours = np.arange(T)
+        mm = MatrixModel()
+        tight = self.formulation == "tight"
+        # The tight up/down windows include hour t itself
+        last = 1 if tight else 0
+
+        margin = hourly_margin(self)
+        start_costs = np.array([self.Startcost_hot, self.Startcost_warm, self.Startcost_cold], dtype=float)
+
+        on = mm.add_var("ON", T, ub=1, integer=True, cost=np.full(T, -float(self.eoh)))
+        s_on = mm.add_var("switch_on", T, ub=1, integer=True,
+                          cost=-(self.st_adder + self.ltsa))
+        s_off = mm.add_var("switch_off", T, ub=1, integer=True)
+        delta = mm.add_var("delta_type", 3 * T, ub=1, integer=True, cost=-np.tile(start_costs, T))
+        elect = mm.add_var("elect", T, cost=margin)
+
+        # Up-time: sum(switch_on[t-MinUpTime+1 .. t-1], .. t when tight) - ON[t] <= 0
+        t_up = hours[self.MinUpTime - 1:]
+        window = np.arange(-self.MinUpTime + 1, last)
+        cols = np.hstack([s_on + t_up[:, None] + window, (on + t_up)[:, None]])
+        vals = np.hstack([np.ones((len(t_up), len(window))), -np.ones((len(t_up), 1))])
+        mm.add_rows(cols, vals, -np.inf, 0)
+
+        # Down-time: sum(switch_off[t-MinDownTime+1 .. t-1], .. t when tight) + ON[t] <= 1
+        t_down = hours[self.MinDownTime - 1:]
+        window = np.arange(-self.MinDownTime + 1, last)
+        cols = np.hstack([s_off + t_down[:, None] + window, (on + t_down)[:, None]])
+        mm.add_rows(cols, 1, -np.inf, 1)
 
+        # Start type: delta_type[j,i] - sum(switch_off[j-z] for z in [p, q)) <= 0
+        for i, (p, q, t0) in enumerate([(1, self.t_lowers, self.t_lowers),
+                                        (self.t_lowers, self.t_uppers, self.t_uppers)]):
+            t_st = hours[t0:]
+            lags = np.arange(p, q)
+            cols = np.hstack([(delta + 3 * t_st + i)[:, None], s_off + t_st[:, None] - lags])
+            vals = np.hstack([np.ones((len(t_st), 1)), -np.ones((len(t_st), len(lags)))])
+            mm.add_rows(cols, vals, -np.inf, 0)
+
+        # Switch constraints; the state equation alone when tight
+        t_sw = hours[1:]
+        if not tight:
+            mm.add_rows(np.column_stack([s_on + t_sw, on + t_sw, on + t_sw - 1]), [1, -1, 1], 0, np.inf)
+            mm.add_rows(np.column_stack([s_off + t_sw, on + t_sw - 1, on + t_sw]), [1, -1, 1], 0, np.inf)
+        mm.add_rows(np.column_stack([s_off + t_sw, on + t_sw, on + t_sw - 1, s_on + t_sw]),
+                    [1, 1, -1, -1], 0, 0)
+
+        # Start type selection at switch on (exactly one type when tight)
+        mm.add_rows(np.column_stack([delta + 3 * hours + j for j in range(3)] + [s_on + hours]),
+                    [1, 1, 1, -1], 0, 0 if tight else np.inf)
+
+        # Maintenance constraints
+        for i in range(len(self.maint_per)):
+            if self.maint_per[i] == 0.0:
+                continue
+            st = self.start_index[i]
+            k = math.ceil(self.month_days[i] * self.maint_per[i])
+            if self.check_maint_con == True:
+                n = self.month_days[i] - k
+                art = mm.add_var(f"artvar_{i}", n, ub=1, integer=True)
+                t_m = np.arange(n)
+                mm.add_rows(np.column_stack([s_off + st + t_m, s_on + st + k + t_m, art + t_m]),
+                            [1, 1, -2], 0, np.inf)
+                span = np.arange(k + 1)
+                for block in (s_off, s_on):
+                    cols = np.hstack([block + st + t_m[:, None] + span, (art + t_m)[:, None]])
+                    vals = np.hstack([np.ones((n, k + 1)), np.full((n, 1), k + 1.0)])
+                    mm.add_rows(cols, vals, -np.inf, k + 2)
+                mm.add_rows((art + t_m)[None, :], 1, 1, np.inf)
+            else:
+                span = np.arange(st, min(st + self.month_days[i] + 1, T))
+                mm.add_rows((on + span)[None, :], 1, -np.inf, self.month_days[i] - k)
+
+        # Capacity constraints
+        mm.add_rows(np.column_stack([elect + hours, on + hours]), [1, -self.maxcap], -np.inf, 0)
+        mm.add_rows(np.column_stack([elect + hours, on + hours]), [1, -self.mincap], 0, np.inf)
+
+        self.matrix = mm
+
+    def fix_commitment(self, on, free=None):
+        """ Fixes ON to the given 0/1 schedule, except for the hours where `free` is True """
+        on = np.asarray(on, dtype=float)
+        hours = np.arange(self.T) if free is None else np.flatnonzero(~np.asarray(free, dtype=bool))
+        self.fixed.update((int(t), int(round(on[t]))) for t in hours)
+        if self.engine == "dp":
+            return
+        if self.engine == "matrix":
+            self._fix_matrix()
         else:
-            m.maint_cons = ConstraintList()
-            for i in range(len(self.maint_per)):
-                if self.maint_per[i]==0.0:
-                    continue
-                else:
-                    st = self.start_index[i]
-                    k = math.ceil(self.month_days[i]*self.maint_per[i])
-                    m.maint_cons.add(sum(m.ON[j] for j in range(st, st + self.month_days[i]+1))<= self.month_days[i]-k)
+            for t in hours:
+                self.model.ON[int(t)].fix(int(round(on[t])))
 
+    def _fix_matrix(self):
+        if self.fixed:
+            hours = np.array(sorted(self.fixed))
+            self.matrix.fix("ON", hours, np.array([self.fixed[t] for t in hours], dtype=float))
 
-        # Capacity Constraints
-        m.cap = ConstraintList()
-        for t in range(self.T):    
-            m.cap.add(m.elect[t] <= self.maxcap * m.ON[t])
-            m.cap.add(m.elect[t] >= self.mincap * m.ON[t])
+    def set_warm_start(self, schedule=None):
+        """ Loads a feasible commitment (heuristic, or repaired from `schedule`) as the incumbent """
+        if self.engine == "dp":
+            return False
+        on = heuristic_schedule(self, schedule)
+        if on is None:
+            return False
+        self.initial_solution = load_warm_start(self, warm_start_values(self, on))
+        self.warm_started = True
+        return True
+
+    def get_objective(self):
+        """ Objective value of the solved model """
+        if self.engine == "dp":
+            return self.dp_objective
+        if self.engine == "matrix":
+            return self.matrix.objective_value(self.solution)
+        return value(self.model.obj)
 
-    def solve(self, solver_name='scip', solver_path='scip.exe'):
-        solver = SolverFactory(solver_name, executable=solver_path)
-        solver.options['limits/gap'] = 0.003
-        solver.solve(self.model) #timelimit=300,
+    def solve(self, solver_name='scip', solver_path=None, gap=0.003, time_limit=None, threads=None, presolve=None):
+        """ Solves with the named backend (see scripts.solvers) and returns its SolveResult.
+        Raises SolverError when the solve ends without a usable solution """
+        if self.engine == "dp":
+            result = solve_dispatch_dp(self, self.fixed, gap=gap)
+            if result is not None:
+                self.dp_on, self.dp_objective = result
+                self.solve_result = SolveResult("dp", "optimal", "certified", self.dp_objective)
+                return self.solve_result
+            # No optimality certificate for the maintenance limits: solve the MILP, seeded with a schedule
+            print(f"DP engine could not certify {self.name}, solving the MILP instead")
+            self.engine = "matrix"
+            self._build_matrix()
+            self._fix_matrix()
+            if takes_start(solver_name, self.engine):
+                self.set_warm_start()
+        elif self.warm_start is not None and self.warm_start is not False and not self.warm_started \
+                and takes_start(solver_name, self.engine):
+            self.set_warm_start(None if self.warm_start is True else self.warm_start)
+        options = SolverOptions(gap, time_limit, threads, presolve)
+        if self.engine == "matrix":
+            self.solution, self.solve_result = solve_matrix(self.matrix, solver_name, solver_path, options,
+                                                            initial=self.initial_solution)
+        elif self.engine == "persistent":
+            self.solve_result = self.template.solve(solver_name, solver_path, options, warmstart=self.warm_started)
+        else:
+            self.solve_result = solve_pyomo(self.model, solver_name, solver_path, options,
+                                            warmstart=self.warm_started)
+        return self.solve_result.check(self.name)
 
     def get_results(self):
         # Collect the results
-        results = {
-            "ON": [self.model.ON[t].value for t in range(self.T)],
-            "Power": [self.model.elect[t].value for t in range(self.T)]
-        }
-
-        # Add the results to the existing DataFrame
-        # self.data["ON_"+ self.name] = results["ON"]
-        # self.data["Power_"+ self.name] = results["Electricity Production"]
-        self.data.loc[:, "ON_" + self.name] = results["ON"]
-        self.data.loc[:, "Power_" + self.name] = results["Power"]
-
-        # Save the updated DataFrame to a new Excel file
-        return self.data
+        if self.engine == "dp":
+            results = {
+                "ON": self.dp_on,
+                "Power": self.dp_on * hourly_output(self)
+            }
+        elif self.engine == "matrix":
+            results = {
+                "ON": np.round(self.matrix.var_values(self.solution, "ON")),
+                "Power": self.matrix.var_values(self.solution, "elect")
+            }
+        else:
+            results = {
+                "ON": pyomo_values(self.model.ON, self.T),
+                "Power": pyomo_values(self.model.elect, self.T)
+            }
+
+        # The input frame with the results added, as a new frame (the input is shared, not copied)
+        return self.data.assign(**{"ON_" + self.name: np.asarray(results["ON"], dtype=float),
+                                   "Power_" + self.name: np.asarray(results["Power"], dtype=float)})
 
 
@@ -1,13 +1,25 @@
 from pyomo.environ import *
 import pandas as pd
 import numpy as np
+from scripts.matrixBuilder import MatrixModel
+from scripts.solvers import SolverOptions, SolveResult, solve_matrix, solve_pyomo, takes_start
+from scripts.warmStart import heuristic_schedule, warm_start_values, load_warm_start
+from scripts.dynamicDispatch import solve_dispatch_dp
+from scripts.parametricModel import get_template
+from scripts.resultStore import pyomo_values
+from scripts.economics import hourly_output, hourly_margin, column_values
+from scripts.dispatchBase import FORMULATIONS
+from scripts.prescreen import prescreen as prescreen_model
 
 class DispatchModelPPA:
     def __init__(self, data, gas_price_col, power_price_col, nox_zone, co2_zone, sox_zone, 
                  t_lowers, t_uppers, heat_rate, Startcost_hot, Startcost_warm, Startcost_cold, 
-                 sox_rate, nox_rate, co2_rate, mincap, maxcap, vom_type, mover_dep, name, T, ltsa, eoh):
+                 sox_rate, nox_rate, co2_rate, mincap, maxcap, vom_type, mover_dep, name, T, ltsa, eoh,
+                 engine="pyomo", warm_start=None, formulation="weak", prescreen=False):
         
-        self.data = data.copy()
+        if formulation not in FORMULATIONS:
+            raise ValueError(f"Unknown formulation {formulation}, expected one of {FORMULATIONS}")
+        self.data = data
         self.T = T
         self.Startcost_hot, self.Startcost_warm, self.Startcost_cold = Startcost_hot, Startcost_warm, Startcost_cold
         self.mincap, self.maxcap = mincap, maxcap
@@ -18,21 +30,43 @@ class DispatchModelPPA:
         self.sox_rate, self.nox_rate, self.co2_rate = sox_rate, nox_rate, co2_rate
         self.mover_dep = mover_dep
         self.name = name
+        self.engine = engine
+        self.formulation = formulation
         
-        # Vectorized Cost Calculation
-        self.cost = self.heat_rate * (self.data[gas_price_col] / 1000).reset_index(drop=True)
-        self.price = self.data[power_price_col].reset_index(drop=True)
-        self.gas_price = self.data[gas_price_col].reset_index(drop=True)
-        self.co2_cost = (self.data[co2_zone] * co2_rate).fillna(0).reset_index(drop=True)
-        self.sox_cost = (self.data[sox_zone] * sox_rate).fillna(0).reset_index(drop=True)
-        self.nox_cost = (self.data[nox_zone] * nox_rate).fillna(0).reset_index(drop=True)
-        self.varCost = self.data[vom_type].reset_index(drop=True)
-        self.st_adder = self.data["Adder_st"].reset_index(drop=True)
-        self.bidAdder = self.data["Adder_bid"].reset_index(drop=True)
-        self.mover_on = self.data["ON_"+ mover_dep].reset_index(drop=True)
-
-        self.model = ConcreteModel()
-        self._build_model()
+        # Hourly inputs as contiguous float64 arrays; the frame itself is not copied
+        self.gas_price = column_values(self.data, gas_price_col)
+        self.cost = self.heat_rate * (self.gas_price / 1000)
+        self.price = column_values(self.data, power_price_col)
+        self.co2_cost = column_values(self.data, co2_zone, co2_rate)
+        self.sox_cost = column_values(self.data, sox_zone, sox_rate)
+        self.nox_cost = column_values(self.data, nox_zone, nox_rate)
+        self.varCost = column_values(self.data, vom_type)
+        self.st_adder = column_values(self.data, "Adder_st")
+        self.bidAdder = column_values(self.data, "Adder_bid")
+        self.mover_on = column_values(self.data, "ON_" + mover_dep)
+
+        if self.engine == "dp":
+            # Solved by dynamic programming in solve(), nothing to build
+            self.model = None
+        elif self.engine == "matrix":
+            self.model = None
+            self._build_matrix()
+        elif self.engine == "persistent":
+            # Shared template for this structure, with this year's coefficients written into its Params
+            self.template = get_template(self)
+            self.model = self.template.load(self)
+        else:
+            self.model = ConcreteModel()
+            self._build_model()
+
+        self.fixed = {}
+        # prescreen: fix the hours whose commitment the coefficients already decide (see scripts.prescreen)
+        self.prescreen_stats = prescreen_model(self) if prescreen else None
+        # warm_start: True for the price-spread heuristic, or a previous ON schedule to repair. Loaded by
+        # solve() once the backend is known, and only when it reads a start on this engine
+        self.warm_start = warm_start
+        self.warm_started = False
+        self.initial_solution = None
 
     def init_a_ij_rule(model, i, j):
             """Initializes delta_type variables to 0."""
@@ -48,8 +82,11 @@ class DispatchModelPPA:
         m.ON = Var(range(self.T), domain=Binary)
         m.switch_on = Var(range(self.T), domain=Binary)
         m.switch_off = Var(range(self.T), domain = Binary)
-        m.delta_type = Var(m.I, m.J, domain= Binary, initialize=init_a_ij_rule)
-        m.start_cost = Var(range(self.T), domain=NonNegativeReals)
+        if self.formulation == "weak":
+            # Start types are not priced here (every start costs a hot start), so the tight
+            # formulation leaves them out
+            m.delta_type = Var(m.I, m.J, domain= Binary, initialize=init_a_ij_rule)
+            m.start_cost = Var(range(self.T), domain=NonNegativeReals)
         m.elect = Var(range(self.T), domain=NonNegativeReals)
         
         total_emission_cost = self.co2_cost + self.sox_cost + self.nox_cost
@@ -66,11 +103,12 @@ class DispatchModelPPA:
     def _define_constraints(self):
         m = self.model
         
-        # Switch Constraints
+        # Switch Constraints; the state equation alone when tight
         m.switch_constraint = ConstraintList()
         for t in range(1, self.T): 
-            m.switch_constraint.add(m.switch_on[t] >= m.ON[t] - m.ON[t - 1])
-            m.switch_constraint.add(m.switch_off[t] >= m.ON[t-1] - m.ON[t])
+            if self.formulation == "weak":
+                m.switch_constraint.add(m.switch_on[t] >= m.ON[t] - m.ON[t - 1])
+                m.switch_constraint.add(m.switch_off[t] >= m.ON[t-1] - m.ON[t])
             m.switch_constraint.add(m.switch_off[t] +  m.ON[t] == m.ON[t - 1] + m.switch_on[t])
         
         #mover dependecy constraint
@@ -80,7 +118,7 @@ class DispatchModelPPA:
 
 
         #Start type constraint
-        if self.t_lowers != 0 and self.t_uppers !=0:
+        if self.formulation == "weak" and self.t_lowers != 0 and self.t_uppers !=0:
             m.delta_start = ConstraintList()
             for i in range(2):
                 if i==0:
@@ -100,22 +138,124 @@ class DispatchModelPPA:
             m.cap.add(m.elect[t] <= self.maxcap * m.ON[t])
             m.cap.add(m.elect[t] >= self.mincap * m.ON[t])
 
-    def solve(self, solver_name='scip', solver_path='scip.exe'):
-        solver = SolverFactory(solver_name, executable=solver_path)
-        solver.solve(self.model)
+    def _build_matrix(self):
+        """ Builds the same MILP as _build_model/_define_constraints directly as a sparse matrix.
+        delta_type carries no cost in this model and does not bind anything else, so it is left out """
+        T = self.T
+        hours = np.arange(T)
+        mm = MatrixModel()
+
+        margin = hourly_margin(self)
+
+        # Mover dependency enters as the upper bound of ON
+        on = mm.add_var("ON", T, ub=np.minimum(self.mover_on, 1), integer=True,
+                        cost=np.full(T, -float(self.eoh)))
+        s_on = mm.add_var("switch_on", T, ub=1, integer=True,
+                          cost=-(self.Startcost_hot + self.st_adder + self.ltsa))
+        s_off = mm.add_var("switch_off", T, ub=1, integer=True)
+        elect = mm.add_var("elect", T, cost=margin)
+
+        # Switch constraints; the state equation alone when tight
+        t_sw = hours[1:]
+        if self.formulation == "weak":
+            mm.add_rows(np.column_stack([s_on + t_sw, on + t_sw, on + t_sw - 1]), [1, -1, 1], 0, np.inf)
+            mm.add_rows(np.column_stack([s_off + t_sw, on + t_sw - 1, on + t_sw]), [1, -1, 1], 0, np.inf)
+        mm.add_rows(np.column_stack([s_off + t_sw, on + t_sw, on + t_sw - 1, s_on + t_sw]),
+                    [1, 1, -1, -1], 0, 0)
+
+        # Capacity constraints
+        mm.add_rows(np.column_stack([elect + hours, on + hours]), [1, -self.maxcap], -np.inf, 0)
+        mm.add_rows(np.column_stack([elect + hours, on + hours]), [1, -self.mincap], 0, np.inf)
+
+        self.matrix = mm
+
+    def fix_commitment(self, on, free=None):
+        """ Fixes ON to the given 0/1 schedule, except for the hours where `free` is True """
+        on = np.asarray(on, dtype=float)
+        hours = np.arange(self.T) if free is None else np.flatnonzero(~np.asarray(free, dtype=bool))
+        self.fixed.update((int(t), int(round(on[t]))) for t in hours)
+        if self.engine == "dp":
+            return
+        if self.engine == "matrix":
+            self._fix_matrix()
+        else:
+            for t in hours:
+                self.model.ON[int(t)].fix(int(round(on[t])))
+
+    def _fix_matrix(self):
+        if self.fixed:
+            hours = np.array(sorted(self.fixed))
+            self.matrix.fix("ON", hours, np.array([self.fixed[t] for t in hours], dtype=float))
+
+    def set_warm_start(self, schedule=None):
+        """ Loads a feasible commitment (heuristic, or repaired from `schedule`) as the incumbent """
+        if self.engine == "dp":
+            return False
+        on = heuristic_schedule(self, schedule)
+        if on is None:
+            return False
+        self.initial_solution = load_warm_start(self, warm_start_values(self, on))
+        self.warm_started = True
+        return True
+
+    def get_objective(self):
+        """ Objective value of the solved model """
+        if self.engine == "dp":
+            return self.dp_objective
+        if self.engine == "matrix":
+            return self.matrix.objective_value(self.solution)
+        return value(self.model.obj)
+
+    def solve(self, solver_name='scip', solver_path=None, gap=0.0, time_limit=None, threads=None, presolve=None):
+        """ Solves with the named backend (see scripts.solvers) and returns its SolveResult.
+        Raises SolverError when the solve ends without a usable solution """
+        if self.engine == "dp":
+            result = solve_dispatch_dp(self, self.fixed, gap=gap)
+            if result is not None:
+                self.dp_on, self.dp_objective = result
+                self.solve_result = SolveResult("dp", "optimal", "certified", self.dp_objective)
+                return self.solve_result
+            # No optimality certificate for the maintenance limits: solve the MILP, seeded with a schedule
+            print(f"DP engine could not certify {self.name}, solving the MILP instead")
+            self.engine = "matrix"
+            self._build_matrix()
+            self._fix_matrix()
+            if takes_start(solver_name, self.engine):
+                self.set_warm_start()
+        elif self.warm_start is not None and self.warm_start is not False and not self.warm_started \
+                and takes_start(solver_name, self.engine):
+            self.set_warm_start(None if self.warm_start is True else self.warm_start)
+        options = SolverOptions(gap, time_limit, threads, presolve)
+        if self.engine == "matrix":
+            self.solution, self.solve_result = solve_matrix(self.matrix, solver_name, solver_path, options,
+                                                            initial=self.initial_solution)
+        elif self.engine == "persistent":
+            self.solve_result = self.template.solve(solver_name, solver_path, options, warmstart=self.warm_started)
+        else:
+            self.solve_result = solve_pyomo(self.model, solver_name, solver_path, options,
+                                            warmstart=self.warm_started)
+        return self.solve_result.check(self.name)
 
     def get_results(self):
         # Collect the results
-        results = {
-            "ON": [self.model.ON[t].value for t in range(self.T)],
-            "Power": [self.model.elect[t].value for t in range(self.T)]
-        }
-
-        # Add the results to the existing DataFrame
-        self.data.loc[:,"ON_" + self.name] = results["ON"]
-        self.data.loc[:,"Power_"+ self.name] = results["Power"]
+        if self.engine == "dp":
+            results = {
+                "ON": self.dp_on,
+                "Power": self.dp_on * hourly_output(self)
+            }
+        elif self.engine == "matrix":
+            results = {
+                "ON": np.round(self.matrix.var_values(self.solution, "ON")),
+                "Power": self.matrix.var_values(self.solution, "elect")
+            }
+        else:
+            results = {
+                "ON": pyomo_values(self.model.ON, self.T),
+                "Power": pyomo_values(self.model.elect, self.T)
+            }
 
-        # Save the updated DataFrame to a new Excel file
-        return self.data
+        # The input frame with the results added, as a new frame (the input is shared, not copied)
+        return self.data.assign(**{"ON_" + self.name: np.asarray(results["ON"], dtype=float),
+                                   "Power_" + self.name: np.asarray(results["Power"], dtype=float)})
 
 
@@ -0,0 +1,279 @@
+import math
+import numpy as np
+from scripts.economics import (hourly_margin, hourly_on_value, start_adders, start_type_costs,
+                               allowed_start_types)
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def solve_commitment(on_value, start_cost, type_costs, t_lowers, t_uppers, min_up=1, min_down=1,
+                     off_value=None):
+    """ Exact single-unit commitment by dynamic programming over (on/off, time-in-state) states.
+
+    on_value[t] is the value of being on in hour t (-inf where the unit may not run),
+    off_value[t] the value of being off (0, or -inf where it must run), start_cost[t] the
+    start-type independent cost of a start and type_costs the hot/warm/cold start costs.
+    The constraints are the ones of DispatchModel: at most one start (stop) in any min up
+    (down) time window, binding from hour MinUpTime-1 (MinDownTime-1) on, a free state before
+    hour 0, and hot/warm starts only when a switch-off lies in the hot/warm window. The start
+    type is taken from the last switch-off, which is exact as long as a hot start is not
+    dearer than a warm one.
+    Returns (ON schedule, objective).
+    """
+    on_value = np.asarray(on_value, dtype=float)
+    T = len(on_value)
+    off_value = np.zeros(T) if off_value is None else np.asarray(off_value, dtype=float)
+    start_cost = np.asarray(start_cost, dtype=float)
+    dims = _Dims(max(int(min_up), 1), max(int(min_down), 1), t_lowers, t_uppers, type_costs)
+
+    # States: (on, hours since the last and second-last start, since the last and second-last
+    # stop). The second-last events only matter in the first hours, where the up/down time
+    # constraints are not yet enforced and a unit can switch more than once per window
+    states = sorted([(1, dims.up, dims.up, dims.down, dims.down),
+                     (0, dims.up, dims.up, dims.cap, dims.down)])
+    V = np.array([on_value[0] if s[0] == 1 else off_value[0] for s in states])
+
+    phases = []
+    t = 1
+    while t < T:
+        phase, next_states = _phase_edges(states, t, dims)
+        t1 = t + 1
+        if next_states == states:
+            # Stationary: the same edges apply until one of the hour thresholds is crossed
+            while t1 < T and dims.flags(t1) == dims.flags(t):
+                t1 += 1
+        choice = np.zeros((t1 - t, len(next_states)), dtype=np.int32)
+        V = _forward(V, phase, on_value, off_value, start_cost, t, t1, choice)
+        phases.append((t, t1, phase["src"], np.array([s[0] for s in states]), choice))
+        states = next_states
+        t = t1
+
+    s = int(np.argmax(V))
+    objective = V[s]
+    on = np.zeros(T)
+    on[T - 1] = states[s][0]
+    for t0, t1, src, prev_on, choice in reversed(phases):
+        for t in range(t1 - 1, t0 - 1, -1):
+            s = src[choice[t - t0, s]]
+            on[t - 1] = prev_on[s]
+    return on, objective
+
+
+class _Dims:
+    """ Caps of the state counters and the hour thresholds where the constraints change """
+    def __init__(self, up, down, t_lowers, t_uppers, type_costs):
+        self.up, self.down = up, down
+        self.cap = max(down, t_uppers, t_lowers, 1)
+        self.t_lowers, self.t_uppers = t_lowers, t_uppers
+        self.type_costs = type_costs
+
+    def flags(self, t):
+        return (t >= self.up - 1, t >= self.down - 1, t < self.t_lowers, t < self.t_uppers)
+
+    def feasible(self, state, t):
+        o, a, a2, b, b2 = state
+        starts = (1 <= a <= self.up - 1) + (1 <= a2 <= self.up - 1)
+        stops = (1 <= b <= self.down - 1) + (1 <= b2 <= self.down - 1)
+        if t >= self.up - 1 and starts > o:
+            return False
+        if t >= self.down - 1 and stops > 1 - o:
+            return False
+        return True
+
+    def moves(self, state, t):
+        """ (next state, start-type cost, is a start) for staying or switching in hour t """
+        o, a, a2, b, b2 = state
+        up, down, cap = self.up, self.down, self.cap
+        a_next, a2_next = min(a + 1, up), min(a2 + 1, up)
+        b2_next = min(b2 + 1, down)
+        if o == 1:
+            return [((1, a_next, a2_next, min(b + 1, down), b2_next), 0.0, 0.0),
+                    ((0, a_next, a2_next, 0, min(b + 1, down)), 0.0, 0.0)]
+        d = min(b + 1, cap)
+        allowed = allowed_start_types(t, d, self.t_lowers, self.t_uppers)
+        type_cost = min(c for c, ok in zip(self.type_costs, allowed) if ok)
+        return [((0, a_next, a2_next, d, b2_next), 0.0, 0.0),
+                ((1, 0, a_next, min(d, down), b2_next), -type_cost, 1.0)]
+
+
+def _phase_edges(states, t, dims):
+    """ Transitions in hour t from `states` into every state allowed in hour t, as CSR edge lists
+    per target state. Returns the edges and the sorted target states """
+    incoming = {}
+    for i, s in enumerate(states):
+        for target, weight, starts in dims.moves(s, t):
+            if dims.feasible(target, t):
+                incoming.setdefault(target, []).append((i, weight, starts))
+
+    next_states = sorted(incoming)
+    ptr = np.zeros(len(next_states) + 1, dtype=np.int64)
+    src, weight, starts = [], [], []
+    for r, target in enumerate(next_states):
+        for e in incoming[target]:
+            src.append(e[0])
+            weight.append(e[1])
+            starts.append(e[2])
+        ptr[r + 1] = len(src)
+    is_on = np.array([s[0] == 1 for s in next_states])
+    return ({"ptr": ptr, "src": np.array(src, dtype=np.int64), "weight": np.array(weight),
+             "starts": np.array(starts), "is_on": is_on}, next_states)
+
+
+def _forward(V, phase, on_value, off_value, start_cost, t0, t1, choice):
+    """ Runs the DP recursion over hours t0..t1-1, recording the chosen edge per state and hour """
+    args = (V, phase["ptr"], phase["src"], phase["weight"], phase["starts"], phase["is_on"],
+            on_value, off_value, start_cost, t0, t1, choice)
+    if _forward_compiled is not None:
+        return _forward_compiled(*args)
+    return _forward_numpy(*args)
+
+
+def _forward_numpy(V, ptr, src, weight, starts, is_on, on_value, off_value, start_cost, t0, t1, choice):
+    # Pad the edge lists into a (states x max in-degree) matrix; -1 points at a -inf sentinel
+    n = len(ptr) - 1
+    degree = np.diff(ptr)
+    K = max(int(degree.max()), 1)
+    edge = np.full((n, K), -1, dtype=np.int64)
+    mask = np.arange(K) < degree[:, None]
+    edge[mask] = np.arange(len(src))
+    p_src = np.where(mask, src[edge], -1)
+    p_weight = np.where(mask, weight[edge], 0.0)
+    p_starts = np.where(mask, starts[edge], 0.0)
+    rows = np.arange(n)
+    on_rows, off_rows = np.flatnonzero(is_on), np.flatnonzero(~is_on)
+
+    for t in range(t0, t1):
+        V_ext = np.append(V, -np.inf)
+        cand = V_ext[p_src] + p_weight - p_starts * start_cost[t]
+        k = cand.argmax(axis=1)
+        V = cand[rows, k]
+        V[on_rows] += on_value[t]
+        V[off_rows] += off_value[t]
+        choice[t - t0] = edge[rows, k]
+    return V
+
+
+def _forward_loops(V, ptr, src, weight, starts, is_on, on_value, off_value, start_cost, t0, t1, choice):
+    n = ptr.shape[0] - 1
+    for t in range(t0, t1):
+        V_next = np.empty(n)
+        for r in range(n):
+            best, best_e = -np.inf, ptr[r]
+            for e in range(ptr[r], ptr[r + 1]):
+                cand = V[src[e]] + weight[e] - starts[e] * start_cost[t]
+                if cand > best:
+                    best, best_e = cand, e
+            V_next[r] = best + (on_value[t] if is_on[r] else off_value[t])
+            choice[t - t0, r] = best_e
+        V = V_next
+    return V
+
+
+# Numba is optional: without it the recursion runs as vectorized NumPy per hour
+_forward_compiled = njit(cache=True)(_forward_loops) if njit is not None else None
+
+
+def maintenance_windows(model):
+    """ (first hour, end hour, ON-hour limit) of each month with a maintenance requirement """
+    windows = []
+    for i in range(len(model.maint_per)):
+        if model.maint_per[i] == 0.0:
+            continue
+        st = model.start_index[i]
+        days = model.month_days[i]
+        windows.append((st, min(st + days + 1, model.T), days - math.ceil(days * model.maint_per[i])))
+    return windows
+
+
+def solve_dispatch_dp(model, fixed=None, gap=0.0, max_passes=4, iterations=40):
+    """ Solves a DispatchModel or DispatchModelPPA by dynamic programming.
+
+    The mover dependency and `fixed` ({hour: 0/1}) enter as forbidden states. Monthly
+    maintenance limits are priced into the hourly value with one Lagrange multiplier per
+    month, found by bisection. Every priced solve gives an upper bound on the optimum, so the
+    best schedule that keeps every limit is returned with a certificate when it is within
+    `gap` of that bound. Returns (ON, objective), or None when no certified schedule was found
+    and the MILP has to be solved instead.
+    """
+    if getattr(model, "check_maint_con", False):
+        return None
+    T = model.T
+    value = hourly_on_value(model, hourly_margin(model))
+    off_value = np.zeros(T)
+    mover_on = getattr(model, "mover_on", None)
+    if mover_on is not None:
+        value = np.where(mover_on > 0.5, value, -np.inf)
+    for t, v in (fixed or {}).items():
+        if v:
+            off_value[t] = -np.inf
+        else:
+            value[t] = -np.inf
+
+    start_cost = start_adders(model)
+    type_costs = start_type_costs(model)
+    if type_costs[0] > type_costs[1]:
+        # The start type follows the last switch-off only, see solve_commitment
+        return None
+    min_up = getattr(model, "MinUpTime", 1)
+    min_down = getattr(model, "MinDownTime", 1)
+    windows = maintenance_windows(model) if hasattr(model, "maint_per") else []
+    limits = np.array([w[2] for w in windows], dtype=float)
+    best = {"bound": np.inf, "objective": -np.inf, "on": None}
+
+    def run(lam):
+        penalty = np.zeros(T)
+        for (st, end, _), l in zip(windows, lam):
+            penalty[st:end] += l
+        on, relaxed = solve_commitment(value - penalty, start_cost, type_costs, model.t_lowers,
+                                       model.t_uppers, min_up, min_down, off_value)
+        usage = np.array([on[st:end].sum() for st, end, _ in windows])
+        objective = relaxed + penalty @ on
+        # Lagrangian bound: the priced optimum plus the value of the limits at these prices
+        best["bound"] = min(best["bound"], relaxed + lam @ limits)
+        if np.all(usage <= limits) and objective > best["objective"]:
+            best.update(objective=objective, on=on)
+        return usage
+
+    def certified():
+        return best["on"] is not None and best["bound"] - best["objective"] <= gap * abs(best["objective"]) + 1e-6
+
+    lam = np.zeros(len(windows))
+    usage = run(lam)
+    finite = np.abs(value[np.isfinite(value)])
+    scale = (finite.max() if len(finite) else 0.0) + start_cost.max() + type_costs.max() + 1.0
+
+    for _ in range(max_passes):
+        if certified() or np.all(usage <= limits):
+            break
+        for i in range(len(windows)):
+            if usage[i] <= limits[i]:
+                continue
+            # Smallest price on month i that brings it under its limit, by doubling then bisection
+            lo, hi = lam[i], lam[i] + scale
+            trial = lam.copy()
+            for _ in range(iterations):
+                trial[i] = hi
+                hi_usage = run(trial)
+                if hi_usage[i] <= limits[i]:
+                    break
+                lo, hi = hi, hi * 2
+            else:
+                return None
+            for _ in range(iterations):
+                if certified() or hi - lo <= 1e-9 * hi:
+                    break
+                trial[i] = (lo + hi) / 2
+                mid_usage = run(trial)
+                if mid_usage[i] <= limits[i]:
+                    hi, hi_usage = trial[i], mid_usage
+                else:
+                    lo = trial[i]
+            lam[i] = hi
+            usage = hi_usage
+
+    if not certified():
+        return None
+    return best["on"], best["objective"]
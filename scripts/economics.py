@@ -0,0 +1,57 @@
+import numpy as np
+
+
+def column_values(data, col, rate=None):
+    """ One hourly input column as a contiguous float64 array; with a rate (emissions) the
+    column is multiplied by it and missing hours cost 0. Float64 columns are not copied,
+    compact float32 columns are widened here, per model """
+    values = np.ascontiguousarray(data[col].to_numpy(dtype=np.float64))
+    if rate is not None:
+        values = np.nan_to_num(values * rate, nan=0.0, posinf=np.inf, neginf=-np.inf)
+    return values
+
+
+def hourly_margin(model):
+    """ $/MWh earned by each MWh produced: price - (fuel + VOM) * (1 + bid adder) - emissions """
+    return (model.price - (model.cost + model.varCost) * (1 + model.bidAdder)
+            - (model.co2_cost + model.sox_cost + model.nox_cost))
+
+
+def hourly_output(model, margin=None):
+    """ Best output in MW for each hour the unit is on: maxcap when the margin is positive, mincap otherwise """
+    margin = hourly_margin(model) if margin is None else margin
+    return np.where(margin > 0, model.maxcap, model.mincap)
+
+
+def hourly_on_value(model, margin=None):
+    """ Value of being on in each hour at the best output level, net of EOH """
+    margin = hourly_margin(model) if margin is None else margin
+    return margin * hourly_output(model, margin) - float(model.eoh)
+
+
+def start_adders(model):
+    """ Per-start cost that does not depend on the start type: start adder + LTSA """
+    return model.st_adder + float(model.ltsa)
+
+
+def start_type_costs(model):
+    """ Hot/warm/cold start costs; DispatchModelPPA charges the hot cost for every start """
+    if hasattr(model, "MinUpTime"):
+        return np.array([model.Startcost_hot, model.Startcost_warm, model.Startcost_cold], dtype=float)
+    return np.array([model.Startcost_hot] * 3, dtype=float)
+
+
+def allowed_start_types(j, downtime, t_lowers, t_uppers):
+    """ Start types the delta_start constraints allow for a start at hour j after `downtime`
+    hours off (None when the unit has been off since the start of the horizon) """
+    d = downtime if downtime is not None else -1
+    hot = j < t_lowers or 1 <= d <= t_lowers - 1
+    warm = j < t_uppers or t_lowers <= d <= t_uppers - 1
+    return hot, warm, True
+
+
+def runs(on):
+    """ (start, end) of each run of consecutive 1s in a 0/1 array, end exclusive """
+    padded = np.concatenate([[0], np.asarray(on, dtype=np.int8), [0]])
+    edges = np.flatnonzero(np.diff(padded))
+    return list(zip(edges[0::2], edges[1::2]))
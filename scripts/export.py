@@ -0,0 +1,148 @@
+import importlib.util
+import os
+import queue
+import re
+import threading
+import numpy as np
+import pandas as pd
+
+FORMATS = ("xlsx", "parquet", "csv")
+# Packages each format writes with beyond pandas, any one of them will do
+FORMAT_PACKAGES = {"xlsx": ("xlsxwriter",), "parquet": ("pyarrow", "fastparquet"), "csv": ()}
+
+
+def missing_package(fmt):
+    """ Name of the package `fmt` needs when none of its packages is installed, else None """
+    packages = FORMAT_PACKAGES[fmt]
+    if not packages or any(importlib.util.find_spec(name) is not None for name in packages):
+        return None
+    return " or ".join(packages)
+
+
+def read_export(path, name):
+    """ One frame of an earlier export: the sheet `name` of a workbook, the file of a dataset
+    directory, or `path` itself when it is a single .parquet/.csv(.gz) file """
+    if os.path.isdir(path):
+        stem = os.path.join(path, re.sub(r"[^\w\- ]", "_", str(name)))
+        if os.path.exists(stem + ".parquet"):
+            return pd.read_parquet(stem + ".parquet")
+        if os.path.exists(stem + ".csv.gz"):
+            return pd.read_csv(stem + ".csv.gz")
+        raise FileNotFoundError(f"No {name} frame in {path}")
+    if path.endswith(".xlsx"):
+        return pd.read_excel(path, sheet_name=name)
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+class ResultExporter:
+    """ Writes all report frames of one run into a single workbook or dataset directory.
+
+    Frames are handed to `submit` and written by a background thread, so the caller can keep
+    solving while earlier reports are written. Formats:
+      - "xlsx": one workbook, one sheet per frame, streamed row by row in xlsxwriter's
+        constant-memory mode
+      - "parquet": one Parquet file per frame in a directory
+      - "csv": one gzip-compressed CSV per frame in a directory
+    """
+    def __init__(self, output_dir, run_name, fmt="xlsx", background=True, max_pending=4):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format {fmt}, expected one of {FORMATS}")
+        self.fmt = fmt
+        os.makedirs(output_dir, exist_ok=True)
+        if fmt == "xlsx":
+            import xlsxwriter
+            self.path = os.path.join(output_dir, f"{run_name}.xlsx")
+            self.workbook = xlsxwriter.Workbook(self.path, {"constant_memory": True, "nan_inf_to_errors": True,
+                                                           "default_date_format": "yyyy-mm-dd hh:mm:ss"})
+        else:
+            self.path = os.path.join(output_dir, run_name)
+            os.makedirs(self.path, exist_ok=True)
+            self.workbook = None
+        self.sheet_names = set()
+        self.error = None
+
+        self.background = background
+        if background:
+            # Bounded so a slow disk cannot make finished frames pile up in memory
+            self.queue = queue.Queue(maxsize=max_pending)
+            self.thread = threading.Thread(target=self._worker, name="result-exporter", daemon=True)
+            self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def submit(self, name, df, index=False):
+        """ Queues one frame for writing under `name` (sheet or file name) """
+        if self.error is not None:
+            raise self.error
+        if self.background:
+            self.queue.put((name, df, index))
+        else:
+            self._write(name, df, index)
+
+    def close(self):
+        """ Waits for pending frames, closes the workbook and re-raises any writer error """
+        if self.background:
+            self.queue.put(None)
+            self.thread.join()
+        if self.workbook is not None:
+            self.workbook.close()
+            self.workbook = None
+        if self.error is not None:
+            raise self.error
+        return self.path
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error is None:
+                try:
+                    self._write(*item)
+                except Exception as e:
+                    self.error = e
+
+    def _write(self, name, df, index):
+        if index:
+            df = df.reset_index()
+        if self.fmt == "xlsx":
+            self._write_sheet(name, df)
+        elif self.fmt == "parquet":
+            df = df.rename(columns=str)
+            df.to_parquet(os.path.join(self.path, f"{self._file_name(name)}.parquet"), index=False)
+        else:
+            df.to_csv(os.path.join(self.path, f"{self._file_name(name)}.csv.gz"), index=False,
+                      compression="gzip")
+
+    def _file_name(self, name):
+        return re.sub(r"[^\w\- ]", "_", str(name))
+
+    def _sheet_name(self, name):
+        """ Excel sheet names are at most 31 characters, without []:*?/\\, and unique """
+        base = re.sub(r"[\[\]:*?/\\]", "_", str(name))[:31]
+        sheet, i = base, 1
+        while sheet.lower() in self.sheet_names:
+            suffix = f"_{i}"
+            sheet, i = base[:31 - len(suffix)] + suffix, i + 1
+        self.sheet_names.add(sheet.lower())
+        return sheet
+
+    def _write_sheet(self, name, df):
+        """ Streams one frame into a new worksheet, rows in order as constant-memory mode requires.
+        Columns are converted to Python values once (missing values to None, which leaves the
+        cell empty) and every row is written with one write_row call """
+        ws = self.workbook.add_worksheet(self._sheet_name(name))
+        ws.write_row(0, 0, [str(c) for c in df.columns])
+
+        columns = []
+        for i in range(df.shape[1]):
+            col = df.iloc[:, i]
+            columns.append(col.astype(object).where(col.notna(), None).tolist())
+        for r, row in enumerate(zip(*columns), start=1):
+            ws.write_row(r, 0, row)
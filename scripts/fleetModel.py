@@ -0,0 +1,125 @@
+import inspect
+import numpy as np
+from pyomo.environ import ConcreteModel, ConstraintList, Objective, maximize, value
+from scripts.dispatchBase import DispatchModel
+from scripts.dispatchPpa import DispatchModelPPA
+from scripts.solvers import SolverOptions, solve_pyomo, takes_start
+
+UNIT_CLASSES = {"base": DispatchModel, "ppa": DispatchModelPPA}
+
+
+class FleetDispatch:
+    """ One MILP for a mover and every unit that depends on it through Mover_Dependency.
+
+    `data` is the hourly frame of one year; `units` lists (name, kind, args, kwargs, (start, end))
+    in mover order, where kind is "base" (DispatchModel) or "ppa" (DispatchModelPPA), args are
+    the model's positional arguments with None for data and T, kwargs its keyword options and
+    start/end the contract dates. Each unit is built on its own contract hours as a Pyomo block
+    of the fleet model, and a dependent's fixed ON <= mover_on rows are replaced by
+    ON_dep[t] <= ON_mover[t] on the shared hours (ON_dep = 0 where the mover has no hours, or
+    on every hour when the mover is not part of the fleet this year). The objective is the sum of the unit objectives, so dependents can move
+    their mover's schedule when that pays for the fleet.
+    """
+    def __init__(self, data, units, name="Fleet", warm_start=None, **kwargs):
+        self.data = data
+        self.name = name
+        self.units = {}
+        self.movers = {}
+        self.model = ConcreteModel()
+        for unit_name, kind, args, unit_kwargs, (start, end) in units:
+            cls = UNIT_CLASSES[kind]
+            params = inspect.signature(cls).bind(*args, **unit_kwargs).arguments
+            unit_data = data[(data["Date"] >= start) & (data["Date"] <= end)]
+            mover = params.get("mover_dep")
+            if mover is not None:
+                # The coupling below replaces the fixed mover schedule
+                unit_data = unit_data.assign(**{"ON_" + mover: 1.0})
+            params.update(data=unit_data, T=unit_data.shape[0])
+            # The fleet is one Pyomo model; its warm start is set below, unit by unit. Units are
+            # not screened, their mover_on is only a placeholder
+            unit = cls(**dict(params, engine="pyomo", prescreen=False))
+            self.model.add_component("unit_" + unit_name, unit.model)
+            unit.model.obj.deactivate()
+            self.units[unit_name] = unit
+            self.movers[unit_name] = mover
+        self._couple()
+        self.model.obj = Objective(expr=sum(unit.model.obj.expr for unit in self.units.values()), sense=maximize)
+
+        # Loaded by solve() when the backend reads a start through Pyomo
+        self.warm_start = warm_start
+        self.warm_started = False
+
+    def _couple(self):
+        m = self.model
+        m.coupling = ConstraintList()
+        for name, mover in self.movers.items():
+            if mover is None:
+                continue
+            unit = self.units[name]
+            unit.model.mover_dependency.deactivate()
+            pos = self._mover_rows(name)
+            for t, p in enumerate(pos):
+                if p < 0:
+                    m.coupling.add(unit.model.ON[t] <= 0)
+                else:
+                    m.coupling.add(unit.model.ON[t] <= self.units[mover].model.ON[int(p)])
+
+    def _mover_rows(self, name):
+        """ Positions of a dependent's hours in its mover's model, -1 where the mover has none """
+        unit, mover = self.units[name], self.movers[name]
+        if mover not in self.units:
+            return np.full(unit.T, -1)
+        return self.units[mover].data.index.get_indexer(unit.data.index)
+
+    def _mover_schedule(self, name, schedules):
+        """ The mover's schedule on the hours of a dependent unit (0 where the mover has none) """
+        pos = self._mover_rows(name)
+        if (pos < 0).all():
+            return np.zeros(len(pos))
+        return np.where(pos >= 0, schedules[self.movers[name]][np.maximum(pos, 0)], 0.0)
+
+    def set_warm_start(self):
+        """ Heuristic schedules unit by unit in mover order, each dependent limited to the hours its
+        mover's heuristic runs, so the combined start satisfies the coupling rows """
+        schedules = {}
+        for name, unit in self.units.items():
+            if self.movers[name] is not None:
+                unit.mover_on = self._mover_schedule(name, schedules)
+            if not unit.set_warm_start():
+                return False
+            schedules[name] = np.array([unit.model.ON[t].value for t in range(unit.T)], dtype=float)
+        self.warm_started = True
+        return True
+
+    def solve(self, solver_name='scip', solver_path=None, gap=0.003, time_limit=None, threads=None, presolve=None):
+        if self.warm_start is not None and self.warm_start is not False and not self.warm_started \
+                and takes_start(solver_name, "pyomo"):
+            self.set_warm_start()
+        options = SolverOptions(gap, time_limit, threads, presolve)
+        self.solve_result = solve_pyomo(self.model, solver_name, solver_path, options, warmstart=self.warm_started)
+        return self.solve_result.check(self.name)
+
+    def get_objective(self):
+        return value(self.model.obj)
+
+    def get_unit_results(self):
+        """ {unit name: frame of its hours with ON_<name>/Power_<name>}, as the unit models return them """
+        results = {}
+        for name, unit in self.units.items():
+            result = unit.get_results()
+            mover = self.movers[name]
+            if mover is not None:
+                # The mover's solved schedule instead of the placeholder used to build the unit
+                solved = {m: results[m]["ON_" + m].to_numpy(dtype=float) for m in results}
+                result["ON_" + mover] = self._mover_schedule(name, solved)
+            results[name] = result
+        return results
+
+    def get_results(self):
+        """ The year's frame with the ON_/Power_ columns of every unit; NaN on the hours outside a
+        unit's contract term (see ResultStore.write) """
+        columns = {}
+        for name, result in self.get_unit_results().items():
+            for col in ("ON_" + name, "Power_" + name):
+                columns[col] = result[col].reindex(self.data.index)
+        return self.data.assign(**columns)
@@ -0,0 +1,122 @@
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+import pandas as pd
+
+# Phases recorded by the toolkit, in run order
+PHASES = ("excel read", "feature assembly", "model build", "solver call", "result extraction",
+          "merge", "report build", "report export")
+SOLVER_FIELDS = ("solver", "status", "objective", "bound", "gap", "nodes", "seconds")
+
+
+class Instrumentation:
+    """ Wall time, CPU time and peak Python memory of the run phases, tagged by contract and year.
+
+    Peak memory is only measured with memory=True (tracemalloc slows allocation-heavy code
+    down). With `profile` set to a phase name, every occurrence of that phase runs under
+    cProfile and its stats are dumped to profile_dir as <phase>_<contract>_<year>.prof.
+    Worker processes record into their own instance (built from `settings()`) and hand the
+    records back with the results, see attach/collect.
+    """
+    def __init__(self, memory=False, profile=None, profile_dir="profiles"):
+        if profile is not None and profile not in PHASES:
+            raise ValueError(f"Unknown phase {profile}, expected one of {PHASES}")
+        self.memory = memory
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self.records = []
+
+    def settings(self):
+        return {"memory": self.memory, "profile": self.profile, "profile_dir": self.profile_dir}
+
+    @contextmanager
+    def phase(self, name, contract=None, year=None, **tags):
+        """ Records one phase; extra keyword tags (e.g. solver stats) are stored with it """
+        record = {"phase": name, "contract": contract, "year": year}
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        profiler = cProfile.Profile() if name == self.profile else None
+        wall, cpu = time.perf_counter(), time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                os.makedirs(self.profile_dir, exist_ok=True)
+                label = "_".join(str(part) for part in (name, contract, year) if part is not None)
+                profiler.dump_stats(os.path.join(self.profile_dir, label.replace(" ", "-") + ".prof"))
+            record["wall"] = time.perf_counter() - wall
+            record["cpu"] = time.process_time() - cpu
+            record["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20 if self.memory else None
+            record.update(tags)
+            self.records.append(record)
+
+    def add(self, records):
+        self.records.extend(records)
+
+    def attach(self, result):
+        """ Hands this instance's records back with a worker's result frame """
+        result.attrs["timings"] = self.records
+        return result
+
+    def collect(self, result):
+        """ Moves the records a worker attached to `result` into this instance """
+        self.add(result.attrs.pop("timings", []))
+        return result
+
+    def to_frame(self):
+        cols = ["phase", "contract", "year", "wall", "cpu", "peak_mb"]
+        df = pd.DataFrame(self.records)
+        return df.reindex(columns=cols + [c for c in df.columns if c not in cols])
+
+    def summary(self):
+        """ Totals per phase, in run order """
+        df = self.to_frame()
+        summary = df.groupby("phase")[["wall", "cpu"]].sum()
+        summary["peak_mb"] = df.groupby("phase")["peak_mb"].max()
+        summary["count"] = df.groupby("phase").size()
+        return summary.reindex([p for p in PHASES if p in summary.index]
+                               + [p for p in summary.index if p not in PHASES])
+
+    def export(self, path):
+        """ Writes the records as JSON or CSV, by the extension of `path` """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if path.endswith(".json"):
+            with open(path, "w") as f:
+                json.dump(self.to_frame().astype(object).where(lambda df: df.notna(), None)
+                          .to_dict(orient="records"), f, indent=1, default=str)
+        else:
+            self.to_frame().to_csv(path, index=False)
+        return path
+
+
+def solver_stats(model):
+    """ Solver-side tags of a solved model: status, objective, bound, gap, nodes and solve seconds """
+    result = getattr(model, "solve_result", None)
+    if result is None:
+        return {}
+    stats = result.as_dict()
+    return {f"solver_{field}" if field not in ("solver", "status") else field: stats[field]
+            for field in SOLVER_FIELDS}
+
+
+# Instance used by the toolkit; a no-overhead default that only records wall and CPU time
+_ACTIVE = Instrumentation()
+
+
+def configure(memory=False, profile=None, profile_dir="profiles"):
+    """ Replaces the active instance; call before any job is created """
+    global _ACTIVE
+    _ACTIVE = Instrumentation(memory, profile, profile_dir)
+    return _ACTIVE
+
+
+def active():
+    return _ACTIVE
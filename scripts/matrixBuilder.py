@@ -0,0 +1,138 @@
+import numpy as np
+
+INF = float("inf")
+
+
+class MatrixModel:
+    """ Sparse MILP in matrix form: maximize c'x subject to row_lo <= Ax <= row_hi and column bounds """
+    def __init__(self):
+        self.n_cols = 0
+        self.n_rows = 0
+        self.var_offsets = {}
+        self._blocks = {}
+        self._cost, self._lb, self._ub, self._integer = [], [], [], []
+        self._rows, self._cols, self._vals = [], [], []
+        self._row_lo, self._row_hi = [], []
+
+    def add_var(self, name, size, lb=0.0, ub=INF, integer=False, cost=None):
+        """ Adds a block of `size` columns and returns the offset of its first column """
+        offset = self.n_cols
+        self.var_offsets[name] = (offset, size)
+        self._blocks[name] = len(self._lb)
+        self._cost.append(np.zeros(size) if cost is None else np.asarray(cost, dtype=float).reshape(size))
+        self._lb.append(np.broadcast_to(np.asarray(lb, dtype=float), (size,)).copy())
+        self._ub.append(np.broadcast_to(np.asarray(ub, dtype=float), (size,)).copy())
+        self._integer.append(np.full(size, integer, dtype=bool))
+        self.n_cols += size
+        return offset
+
+    def add_rows(self, cols, vals, lo, hi):
+        """ Adds k rows at once. `cols`/`vals` are (k, w) arrays, one row of coefficients each """
+        cols = np.atleast_2d(np.asarray(cols, dtype=np.int64))
+        k = cols.shape[0]
+        if k == 0:
+            return
+        vals = np.broadcast_to(np.asarray(vals, dtype=float), cols.shape)
+        rows = np.repeat(np.arange(self.n_rows, self.n_rows + k), cols.shape[1])
+        self._rows.append(rows)
+        self._cols.append(cols.ravel())
+        self._vals.append(vals.ravel())
+        self._row_lo.append(np.broadcast_to(np.asarray(lo, dtype=float), (k,)).copy())
+        self._row_hi.append(np.broadcast_to(np.asarray(hi, dtype=float), (k,)).copy())
+        self.n_rows += k
+
+    def finalize(self):
+        """ Concatenates the column and row blocks and returns (c, lb, ub, integer, csr, row_lo, row_hi) """
+        c = np.concatenate(self._cost) if self._cost else np.zeros(0)
+        lb = np.concatenate(self._lb) if self._lb else np.zeros(0)
+        ub = np.concatenate(self._ub) if self._ub else np.zeros(0)
+        integer = np.concatenate(self._integer) if self._integer else np.zeros(0, dtype=bool)
+        if self._rows:
+            rows = np.concatenate(self._rows)
+            cols = np.concatenate(self._cols)
+            vals = np.concatenate(self._vals)
+            row_lo = np.concatenate(self._row_lo)
+            row_hi = np.concatenate(self._row_hi)
+        else:
+            rows = cols = np.zeros(0, dtype=np.int64)
+            vals = row_lo = row_hi = np.zeros(0)
+
+        # Rows are appended in order, so a stable sort on the row id gives CSR directly
+        order = np.argsort(rows, kind="stable")
+        indices, data = cols[order], vals[order]
+        indptr = np.zeros(self.n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=self.n_rows), out=indptr[1:])
+        return c, lb, ub, integer, (indptr, indices, data), row_lo, row_hi
+
+    def to_scipy(self):
+        """ Returns the constraint matrix as a scipy.sparse CSR matrix (scipy is optional) """
+        from scipy.sparse import csr_matrix
+        _, _, _, _, (indptr, indices, data), _, _ = self.finalize()
+        return csr_matrix((data, indices, indptr), shape=(self.n_rows, self.n_cols))
+
+    def write_mps(self, path):
+        """ Writes the model as a free-format MPS file. The objective is negated since MPS minimizes """
+        c, lb, ub, integer, (indptr, indices, data), row_lo, row_hi = self.finalize()
+        lines = ["NAME DISPATCH", "ROWS", " N obj"]
+        sense = np.where(row_lo == row_hi, "E", np.where(np.isinf(row_lo), "L", "G"))
+        lines.extend(f" {s} r{i}" for i, s in enumerate(sense))
+
+        # Column-major view of the matrix for the COLUMNS section
+        rows = np.repeat(np.arange(self.n_rows), np.diff(indptr))
+        order = np.lexsort((rows, indices))
+        col_sorted, row_sorted, val_sorted = indices[order], rows[order], data[order]
+        col_start = np.searchsorted(col_sorted, np.arange(self.n_cols + 1))
+
+        lines.append("COLUMNS")
+        in_int = False
+        for j in range(self.n_cols):
+            if integer[j] != in_int:
+                lines.append(f" M{j} 'MARKER' '{'INTORG' if integer[j] else 'INTEND'}'")
+                in_int = bool(integer[j])
+            if c[j] != 0:
+                lines.append(f" x{j} obj {_num(-c[j])}")
+            for k in range(col_start[j], col_start[j + 1]):
+                lines.append(f" x{j} r{row_sorted[k]} {_num(val_sorted[k])}")
+            if c[j] == 0 and col_start[j] == col_start[j + 1]:
+                lines.append(f" x{j} obj 0")
+        if in_int:
+            lines.append(" MEND 'MARKER' 'INTEND'")
+
+        lines.append("RHS")
+        rhs = np.where(np.isinf(row_lo), row_hi, row_lo)
+        lines.extend(f" rhs r{i} {_num(v)}" for i, v in enumerate(rhs) if v != 0)
+
+        lines.append("BOUNDS")
+        for j in range(self.n_cols):
+            if integer[j] and lb[j] == 0 and ub[j] == 1:
+                lines.append(f" BV bnd x{j}")
+            elif lb[j] == ub[j]:
+                lines.append(f" FX bnd x{j} {_num(lb[j])}")
+            else:
+                if lb[j] != 0:
+                    lines.append(f" MI bnd x{j}" if np.isinf(lb[j]) else f" LO bnd x{j} {_num(lb[j])}")
+                if not np.isinf(ub[j]):
+                    lines.append(f" UP bnd x{j} {_num(ub[j])}")
+        lines.append("ENDATA")
+
+        with open(path, "w") as f:
+            f.write("\n".join(lines))
+            f.write("\n")
+
+    def fix(self, name, positions, values):
+        """ Fixes columns `positions` of variable block `name` to `values` """
+        block = self._blocks[name]
+        self._lb[block][positions] = values
+        self._ub[block][positions] = values
+
+    def objective_value(self, x):
+        return float(np.concatenate(self._cost) @ x)
+
+    def var_values(self, x, name):
+        """ Returns the slice of the solution vector belonging to variable block `name` """
+        offset, size = self.var_offsets[name]
+        return x[offset:offset + size]
+
+
+def _num(v):
+    return repr(float(v))
@@ -0,0 +1,184 @@
+import math
+import weakref
+from pyomo.environ import *
+from scripts.economics import hourly_margin, start_adders
+from scripts.solvers import HighsBackend, solve_pyomo
+
+# Templates built in this process, by structure (see template_key); a structure gets another one
+# only while every template of it is loaded by a model that is still alive
+_TEMPLATES = {}
+
+
+def template_key(model):
+    """ Everything that shapes the constraints of a DispatchModel or DispatchModelPPA.
+    Coefficients (prices, costs, capacities, maintenance limits, mover ON) are not part of it """
+    if hasattr(model, "MinUpTime"):
+        return ("base", model.T, model.formulation, model.MinUpTime, model.MinDownTime, model.t_lowers,
+                model.t_uppers, tuple(model.start_index), tuple(model.month_days))
+    return ("ppa", model.T, model.formulation)
+
+
+def get_template(model):
+    """ Template for the structure of `model` that no live model holds. A model keeps its
+    template until it is garbage collected, so two models held at once never share Params or a
+    solution; a year run after year reuses one template """
+    key = template_key(model)
+    pool = _TEMPLATES.setdefault(key, [])
+    for template in pool:
+        if template.owner is None or template.owner() is None:
+            return template
+    template = DispatchTemplate(*key)
+    pool.append(template)
+    return template
+
+
+class DispatchTemplate:
+    """ Pyomo dispatch model built once per horizon length and contract type.
+
+    Every coefficient that changes between years and scenarios is a mutable Param: the hourly
+    margin (price less fuel, VOM with bid adder, and emissions), the per-start adder, EOH, the
+    start-type costs, capacities, the monthly maintenance limits and the mover ON column.
+    `load` writes a model's coefficients into the Params; with HiGHS the same persistent solver
+    instance re-solves the updated model without rebuilding it.
+    """
+    def __init__(self, kind, T, formulation="weak", MinUpTime=1, MinDownTime=1, t_lowers=0, t_uppers=0,
+                 start_index=(), month_days=()):
+        self.kind = kind
+        self.T = T
+        self.formulation = formulation
+        self.MinUpTime, self.MinDownTime = MinUpTime, MinDownTime
+        self.t_lowers, self.t_uppers = t_lowers, t_uppers
+        self.start_index, self.month_days = start_index, month_days
+        self.model = ConcreteModel()
+        self.solver = None
+        self.loads = 0
+        # Weak reference to the model loaded last (see get_template)
+        self.owner = None
+        self._build()
+
+    def _build(self):
+        m = self.model
+        hours = range(self.T)
+        m.margin = Param(hours, mutable=True, initialize=0.0)
+        m.start_adder = Param(hours, mutable=True, initialize=0.0)
+        m.eoh = Param(mutable=True, initialize=0.0)
+        m.mincap = Param(mutable=True, initialize=0.0)
+        m.maxcap = Param(mutable=True, initialize=0.0)
+
+        m.ON = Var(hours, domain=Binary)
+        m.switch_on = Var(hours, domain=Binary)
+        m.switch_off = Var(hours, domain=Binary)
+        m.elect = Var(hours, domain=NonNegativeReals)
+
+        if self.kind == "base":
+            m.type_cost = Param(range(3), mutable=True, initialize=0.0)
+            m.delta_type = Var(hours, range(3), domain=Binary, initialize=0)
+            starts = lambda t: sum(m.type_cost[j] * m.delta_type[t, j] for j in range(3))
+        else:
+            # The PPA start cost (hot start) is folded into start_adder
+            m.mover_on = Param(hours, mutable=True, initialize=1.0)
+            starts = lambda t: 0
+
+        m.obj = Objective(
+            expr=sum(m.margin[t] * m.elect[t] - starts(t) - m.eoh * m.ON[t]
+                     - m.start_adder[t] * m.switch_on[t] for t in hours),
+            sense=maximize
+        )
+
+        # Switch Constraints; the state equation alone when tight
+        tight = self.formulation == "tight"
+        m.switch_constraint = ConstraintList()
+        for t in range(1, self.T):
+            if not tight:
+                m.switch_constraint.add(m.switch_on[t] >= m.ON[t] - m.ON[t - 1])
+                m.switch_constraint.add(m.switch_off[t] >= m.ON[t-1] - m.ON[t])
+            m.switch_constraint.add(m.switch_off[t] + m.ON[t] == m.ON[t - 1] + m.switch_on[t])
+
+        # Capacity Constraints
+        m.cap = ConstraintList()
+        for t in hours:
+            m.cap.add(m.elect[t] <= m.maxcap * m.ON[t])
+            m.cap.add(m.elect[t] >= m.mincap * m.ON[t])
+
+        if self.kind == "base":
+            self._build_base_constraints()
+        else:
+            m.mover_dependency = ConstraintList()
+            for t in hours:
+                m.mover_dependency.add(m.ON[t] <= m.mover_on[t])
+
+    def _build_base_constraints(self):
+        """ Same up/down time, start type and maintenance rows as DispatchModel._define_constraints """
+        m = self.model
+        # The tight up/down windows include hour t itself
+        last = 1 if self.formulation == "tight" else 0
+        m.up_time = ConstraintList()
+        for t in range(self.MinUpTime-1, self.T):
+            m.up_time.add(sum(m.switch_on[i] for i in range(t-self.MinUpTime+1, t+last)) <= m.ON[t])
+
+        m.down_time = ConstraintList()
+        for t in range(self.MinDownTime-1, self.T):
+            m.down_time.add(sum(m.switch_off[i] for i in range(t-self.MinDownTime+1, t+last)) <= 1-m.ON[t])
+
+        m.delta_start = ConstraintList()
+        for i, (p, q, t0) in enumerate([(1, self.t_lowers, self.t_lowers),
+                                        (self.t_lowers, self.t_uppers, self.t_uppers)]):
+            for j in range(t0, self.T):
+                m.delta_start.add(m.delta_type[j, i] <= sum(m.switch_off[j-z] for z in range(p, q)))
+
+        m.delta_sum = ConstraintList()
+        for t in range(self.T):
+            if self.formulation == "tight":
+                m.delta_sum.add(sum(m.delta_type[t, i] for i in range(3)) == m.switch_on[t])
+            else:
+                m.delta_sum.add(sum(m.delta_type[t, i] for i in range(3)) >= m.switch_on[t])
+
+        # One row per month; months without maintenance get a limit that cannot bind
+        m.maint_limit = Param(range(len(self.month_days)), mutable=True, initialize=self._window_length)
+        m.maint_cons = ConstraintList()
+        for i in range(len(self.month_days)):
+            st = self.start_index[i]
+            m.maint_cons.add(sum(m.ON[j] for j in range(st, min(st + self.month_days[i] + 1, self.T)))
+                             <= m.maint_limit[i])
+
+    def _window_length(self, m, i):
+        st = self.start_index[i]
+        return min(st + self.month_days[i] + 1, self.T) - st
+
+    def load(self, model):
+        """ Writes the coefficients of a DispatchModel/DispatchModelPPA into the Params """
+        m = self.model
+        m.margin.store_values(dict(enumerate(hourly_margin(model).tolist())))
+        adders = start_adders(model)
+        if self.kind == "ppa":
+            adders = adders + model.Startcost_hot
+            mover_on = model.mover_on
+            m.mover_on.store_values(dict(enumerate(mover_on.tolist())))
+        else:
+            m.type_cost.store_values({0: model.Startcost_hot, 1: model.Startcost_warm, 2: model.Startcost_cold})
+            limits = {}
+            for i in range(len(self.month_days)):
+                if model.maint_per[i] == 0.0:
+                    limits[i] = self._window_length(m, i)
+                else:
+                    limits[i] = self.month_days[i] - math.ceil(self.month_days[i] * model.maint_per[i])
+            m.maint_limit.store_values(limits)
+        m.start_adder.store_values(dict(enumerate(adders.tolist())))
+        m.eoh.set_value(float(model.eoh))
+        m.mincap.set_value(float(model.mincap))
+        m.maxcap.set_value(float(model.maxcap))
+
+        # Hours fixed by a previous user of the template (e.g. a seam repair) are free again
+        m.ON.unfix()
+        self.owner = weakref.ref(model)
+        self.loads += 1
+        return m
+
+    def solve(self, solver_name, executable, options, warmstart=False):
+        """ Re-solves the loaded model; HiGHS keeps one persistent instance per template """
+        if solver_name == "highs":
+            backend = HighsBackend()
+            if self.solver is None:
+                self.solver = backend.persistent()
+            return solve_pyomo(self.model, solver_name, executable, options, warmstart, persistent=self.solver)
+        return solve_pyomo(self.model, solver_name, executable, options, warmstart)
@@ -0,0 +1,135 @@
+import numpy as np
+from scripts.dynamicDispatch import maintenance_windows
+from scripts.economics import hourly_margin, hourly_on_value, start_adders, start_type_costs
+
+
+def _best_interval(value, start_cost):
+    """ For every hour t, the best total value of a run [s, e) containing t, each run paying
+    start_cost[s] (Kadane passes in both directions) """
+    T = len(value)
+    left = np.empty(T)
+    best = -np.inf
+    for t in range(T):
+        best = value[t] + max(best, -start_cost[t])
+        left[t] = best
+    right = np.zeros(T + 1)
+    for t in range(T - 1, -1, -1):
+        right[t] = max(0.0, value[t] + right[t + 1])
+    return left + right[1:]
+
+
+def _worst_interval(value):
+    """ For every hour t, the lowest total value of an interval [a, b) containing t """
+    T = len(value)
+    left = np.empty(T)
+    worst = np.inf
+    for t in range(T):
+        worst = value[t] + min(worst, 0.0)
+        left[t] = worst
+    right = np.zeros(T + 1)
+    for t in range(T - 1, -1, -1):
+        right[t] = min(0.0, value[t] + right[t + 1])
+    return left + right[1:]
+
+
+def screen_commitment(model):
+    """ Hours whose commitment is the same in every optimal solution, from the model's hourly
+    coefficients alone. Returns (off, on) boolean arrays.
+
+    value[t] is the margin of being on at the best output, net of EOH. An hour is off when every
+    run through it loses money: its best value, less the start cost of the run (none for a run
+    from hour 0), stays negative even after allowing for the dearer start type a later start
+    can need once the run is gone. Removing a run keeps min up/down time, the mover dependency
+    and the monthly maintenance limits. An hour is on when every off-period through it would
+    earn more by running: filling an off-period merges it with the runs around it and never
+    adds a start. Filling can break a maintenance limit, so hours in a month with a limit are
+    not fixed on; behind a mover, an off-period cut short by the mover's off hours needs a
+    start of its own, whose cost is added. Models with the maintenance-window formulation
+    (check_maint_con) are not screened.
+    """
+    T = model.T
+    off, on = np.zeros(T, dtype=bool), np.zeros(T, dtype=bool)
+    if getattr(model, "check_maint_con", False):
+        return off, on
+
+    value = hourly_on_value(model, hourly_margin(model))
+    type_costs = start_type_costs(model)
+    start_cost = start_adders(model) + type_costs.min()
+    start_cost[0] = 0.0
+    allowed = np.ones(T, dtype=bool)
+    mover_on = getattr(model, "mover_on", None)
+    if mover_on is not None:
+        allowed = np.round(mover_on) == 1
+    tol = 1e-6 * max(1.0, float(np.abs(value).max()) if T else 1.0)
+
+    # With hot <= warm <= cold only the next start depends on the switch-off before it; other
+    # cost orders are not screened beyond the mover's off hours
+    monotone = bool(np.all(np.diff(type_costs) >= 0))
+    slack = type_costs.max() - type_costs.min() if monotone else np.inf
+    best = _best_interval(np.where(allowed, value, -np.inf), start_cost)
+    off = ~allowed | (best + slack < -tol)
+
+    if not monotone:
+        return off, on
+    capped = np.zeros(T, dtype=bool)
+    if hasattr(model, "maint_per"):
+        for st, end, _ in maintenance_windows(model):
+            capped[st:end] = True
+    bounds = np.flatnonzero(np.diff(np.concatenate([[0], allowed.astype(np.int8), [0]])))
+    for s, e in zip(bounds[0::2], bounds[1::2]):
+        # An off-period reaching the mover's off hours before s has to start again at s
+        penalty = 0.0 if s == 0 else float(start_adders(model)[s] + type_costs.max())
+        worst = _worst_interval(value[s:e]) - penalty
+        on[s:e] = (worst > tol) & ~capped[s:e]
+    return off, on
+
+
+def prescreen(model):
+    """ Fixes the screened hours of a built model before it is solved: ON, the switch variables
+    between two fixed hours, the start types of hours that cannot start and the output of hours
+    that are off. Returns counts of the fixed hours and variables, None for the DP engine, which
+    is exact on its own """
+    if model.engine == "dp":
+        return None
+    off, on = screen_commitment(model)
+    fixed = off | on
+    stats = {"hours": model.T, "fixed_off": int(off.sum()), "fixed_on": int(on.sum()),
+             "share": float(fixed.mean()) if model.T else 0.0, "variables": 0}
+    if not fixed.any():
+        return stats
+    schedule = on.astype(float)
+    model.fix_commitment(schedule, ~fixed)
+    stats["variables"] = int(fixed.sum())
+    if model.engine == "persistent":
+        # The shared template only unfixes ON on its next load
+        return stats
+
+    # Switches between two fixed hours follow from them; hour 0 has no switch rows
+    pairs = np.flatnonzero(fixed[1:] & fixed[:-1]) + 1
+    switch_on = np.maximum(schedule[pairs] - schedule[pairs - 1], 0)
+    switch_off = np.maximum(schedule[pairs - 1] - schedule[pairs], 0)
+    no_start = pairs[switch_on == 0]
+    hours_off = np.flatnonzero(off)
+    if model.engine == "matrix":
+        mm = model.matrix
+        has_delta = "delta_type" in mm.var_offsets
+        mm.fix("switch_on", pairs, switch_on)
+        mm.fix("switch_off", pairs, switch_off)
+        mm.fix("elect", hours_off, np.zeros(len(hours_off)))
+        if has_delta:
+            for j in range(3):
+                mm.fix("delta_type", 3 * no_start + j, np.zeros(len(no_start)))
+    else:
+        m = model.model
+        has_delta = hasattr(m, "delta_type")
+        for t, up, down in zip(pairs, switch_on, switch_off):
+            m.switch_on[int(t)].fix(int(up))
+            m.switch_off[int(t)].fix(int(down))
+        for t in hours_off:
+            m.elect[int(t)].fix(0)
+        if has_delta:
+            for t in no_start:
+                for j in range(3):
+                    m.delta_type[int(t), j].fix(0)
+    stats["variables"] += 2 * len(pairs) + len(hours_off) + (3 * len(no_start) if has_delta else 0)
+    return stats
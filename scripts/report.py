@@ -1,7 +1,9 @@
 import pandas as pd
 import numpy as np
-from calendar import monthrange
-from datetime import datetime
+
+MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+               "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
 
 class OutputReport:
     def __init__(self, data, start_year, end_year):
@@ -13,81 +15,85 @@ class OutputReport:
 
 
     def _get_dict_ready_(self):
-        self.years = []
-        for i in range(self.start_year, self.end_year + 1):
-            self.years.append(i)
-        
-        n = len(self.years)
-        data_out = {
-            "Jan": [0] * n,
-            "Feb": [0] * n,
-            "Mar": [0] * n,
-            "Apr": [0] * n,
-            "May": [0] * n,
-            "Jun": [0] * n,
-            "Jul": [0] * n,
-            "Aug": [0] * n,
-            "Sep": [0] * n,
-            "Oct": [0] * n,
-            "Nov": [0] * n,
-            "Dec": [0] * n,
-        }
-
-        df = pd.DataFrame(data_out, index=self.years).T
+        """ Precomputes a (year, month) bucket per hour, -1 for hours outside the report range """
+        self.years = list(range(self.start_year, self.end_year + 1))
+        self.n_buckets = len(self.years) * 12
+
+        year = pd.to_numeric(self.data["Year"], errors="coerce").to_numpy(dtype=float)
+        month = pd.to_numeric(self.data["Month"], errors="coerce").to_numpy(dtype=float)
+        valid = ((year >= self.start_year) & (year <= self.end_year)
+                 & (month >= 1) & (month <= 12) & ~np.isnan(year) & ~np.isnan(month))
+        self.bucket = np.where(valid, (np.nan_to_num(year) - self.start_year) * 12
+                               + np.nan_to_num(month) - 1, -1).astype(np.int64)
+        self.valid = valid
+
+        # Hours per (year, month) in the results, the denominator of percent-on
+        self.month_data = self._to_frame(np.bincount(self.bucket[valid], minlength=self.n_buckets))
+        self.data_out = self._to_frame(np.zeros(self.n_buckets))
+
+    def _to_frame(self, counts):
+        """ Month x Year frame from a flat array of year-major (year, month) buckets """
+        df = pd.DataFrame(np.asarray(counts).reshape(len(self.years), 12).T,
+                          index=MONTH_NAMES, columns=self.years)
         df.index.name = "Month"
-        self.data_out = df
+        return df
+
+    def _on_counts(self, ppa_type):
+        on = np.round(pd.to_numeric(self.data[f"ON_{ppa_type}"], errors="coerce").to_numpy(dtype=float)) == 1
+        return np.bincount(self.bucket[self.valid & on], minlength=self.n_buckets)
 
-    
     def get_output(self, ppa_type):
-        month_names = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
-                   "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-        
-        self.month_data = self.data_out.copy()
-
-        for t in range(len(self.data)):
-            yr = self.data.loc[t, "Year"]
-            if yr in self.years:
-                month_raw = self.data.loc[t, "Month"]
-                if pd.notna(month_raw):
-                    month_num = int(month_raw)
-                    is_on = self.data.loc[t, f"ON_{ppa_type}"]
-                    if is_on == 1 and 1 <= month_num <= 12:
-                        month_str = month_names[month_num - 1]
-                        self.data_out.at[month_str,yr] += 1
-                    if 1<= month_num <= 12:
-                        month_str = month_names[month_num - 1]
-                        self.month_data.at[month_str,yr] += 1
-    
-        return self.data_out 
-
-    def compute_monthly_percentage(self):
+        """ ON hours per month and year for one contract, as a new frame on every call """
+        self.data_out = self._to_frame(self._on_counts(ppa_type))
+        return self.data_out
+
+    def compute_monthly_percentage(self, ppa_type=None):
         """Compute percentage contribution of each month to total ON count in a year"""
-        df = self.data_out.copy()
-        df1 = self.month_data.copy()
-            
-        df_percent = (df/df1).fillna(0) * 100 
+        df = self.get_output(ppa_type) if ppa_type is not None else self.data_out
+        df_percent = (df / self.month_data).fillna(0) * 100
         self.data_out_percent = df_percent
 
         return self.data_out_percent
-    
+
+    def get_all_outputs(self, ppa_names):
+        """ ON-hour counts and percent-on for several contracts in one pass over the hours """
+        ppa_names = list(ppa_names)
+        k = len(ppa_names)
+        on = self.data[[f"ON_{name}" for name in ppa_names]].apply(pd.to_numeric, errors="coerce")
+        on = (np.round(on.to_numpy(dtype=float)) == 1) & self.valid[:, None]
+        flat = (self.bucket[:, None] + np.arange(k) * self.n_buckets)[on]
+        counts = np.bincount(flat, minlength=k * self.n_buckets).reshape(k, self.n_buckets)
+
+        outputs = {}
+        for i, name in enumerate(ppa_names):
+            df = self._to_frame(counts[i])
+            outputs[name] = (df, (df / self.month_data).fillna(0) * 100)
+        return outputs
+
+    def get_all_capacity_factors(self, result, maxcaps):
+        """ Monthly capacity factors for every contract in `maxcaps` ({name: maxcap}) from one groupby """
+        cols = ["Power_" + name for name in maxcaps]
+        grouped = result.groupby(["Year", "Month"])[cols].sum().reset_index()
+        days = pd.to_datetime(pd.DataFrame({"year": grouped["Year"].astype(int),
+                                            "month": grouped["Month"].astype(int),
+                                            "day": 1})).dt.days_in_month
+        return {name: grouped[["Year", "Month"]].assign(**{"Power_" + name: grouped["Power_" + name]
+                                                            / (maxcap * 24 * days)})
+                for name, maxcap in maxcaps.items()}
+
     def get_capacity_factor(self, ppa_name, result, maxcap):
         results_group = result.groupby(["Year","Month"])["Power_"+ppa_name].sum().reset_index()
-        results_group["Power_"+ppa_name] = results_group.apply(
-            lambda row: row["Power_"+ppa_name] / (maxcap*24 * monthrange(row["Year"].astype(int), row["Month"].astype(int))[1]),
-            axis=1
-        )
+        days = pd.to_datetime(pd.DataFrame({"year": results_group["Year"].astype(int),
+                                            "month": results_group["Month"].astype(int),
+                                            "day": 1})).dt.days_in_month
+        results_group["Power_"+ppa_name] = results_group["Power_"+ppa_name] / (maxcap * 24 * days)
 
         return results_group
 
     def get_pivot_table(self, result, ppa_name):
-        results_pivot = round(pd.pivot_table(result, 
+        results_pivot = round(pd.pivot_table(result,
                                      values="Power_"+ppa_name,
-                                     index='Month', 
-                                     columns='Year', 
-                                     aggfunc="sum"),2) 
-        return results_pivot       
-
-
-
-
-    
\ No newline at end of file
+                                     index='Month',
+                                     columns='Year',
+                                     aggfunc="sum"),2)
+        return results_pivot
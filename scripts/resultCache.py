@@ -0,0 +1,118 @@
+import hashlib
+import importlib.util
+import os
+import pandas as pd
+from scripts.snapshotCache import has_frame, load_frame, save_frame
+
+# Bump when a change outside MODEL_MODULES (e.g. a solver default) alters the results for the same inputs
+RESULT_VERSION = "2"
+# Modules whose code decides a yearly result; their source is hashed into every key, so a change to a
+# constraint, objective or coefficient solves the years again instead of serving stale results
+MODEL_MODULES = ("scripts.dispatchBase", "scripts.dispatchPpa", "scripts.economics", "scripts.matrixBuilder",
+                 "scripts.parametricModel", "scripts.dynamicDispatch", "scripts.warmStart", "scripts.prescreen",
+                 "scripts.decomposition", "scripts.fleetModel", "scripts.aggregation")
+# Source hash of each set of modules, computed once per process
+_CODE_VERSIONS = {}
+# Columns every model reads besides the ones named by its arguments
+COMMON_COLUMNS = ["Date", "Year", "Month", "Day", "Hour", "Adder_bid", "Adder_st"]
+# Model options that change how fast a result is found, not what it is
+IGNORED_KWARGS = ("workers",)
+
+
+def input_columns(data, args, name):
+    """ Columns of `data` a yearly model actually reads: the hubs, zones and VOM type named by its
+    arguments, the mover's ON column, and the calendar and adder columns """
+    cols = [col for col in COMMON_COLUMNS if col in data.columns]
+    outputs = ("ON_" + name, "Power_" + name)
+    for arg in _flatten(args):
+        if isinstance(arg, str):
+            cols += [col for col in (arg, "ON_" + arg)
+                     if col in data.columns and col not in cols and col not in outputs]
+    return cols
+
+
+def _flatten(args):
+    """ Scalars of nested argument tuples, such as the units of a FleetDispatch """
+    for arg in args:
+        if isinstance(arg, (tuple, list)):
+            yield from _flatten(arg)
+        else:
+            yield arg
+
+
+def code_version(modules):
+    """ Hash of the source files of `modules` """
+    modules = tuple(sorted(set(modules)))
+    if modules not in _CODE_VERSIONS:
+        h = hashlib.sha256()
+        for name in modules:
+            spec = importlib.util.find_spec(name)
+            if spec is not None and spec.origin and os.path.exists(spec.origin):
+                with open(spec.origin, "rb") as f:
+                    h.update(f.read())
+        _CODE_VERSIONS[modules] = h.hexdigest()[:16]
+    return _CODE_VERSIONS[modules]
+
+
+def job_key(job):
+    """ Content hash of everything that determines the result of a YearJob: the model class,
+    its hourly input columns, its scalar parameters (costs, capacities, maintenance shares,
+    mover name), the model and solve options, and the source of the model code """
+    data, args = job.args[0], job.args[1:]
+    h = hashlib.sha256()
+    version = code_version(MODEL_MODULES + (job.model_cls.__module__,))
+    h.update(f"{RESULT_VERSION}|{version}|{job.model_cls.__name__}|{job.name}|{job.year}".encode())
+    h.update(repr(args).encode())
+    h.update(repr(sorted((k, v) for k, v in job.kwargs.items() if k not in IGNORED_KWARGS)).encode())
+    h.update(repr(sorted(job.solve_kwargs.items())).encode())
+    cols = input_columns(data, args, job.name)
+    h.update(repr(cols).encode())
+    h.update(pd.util.hash_pandas_object(data[cols], index=False).to_numpy().tobytes())
+    return h.hexdigest()[:24]
+
+
+class ResultCache:
+    """ On-disk results of yearly solves, one entry per (contract, year) keyed by job_key.
+
+    Only the columns the solve added (ON_/Power_ of the contract, or of every unit of a fleet)
+    are stored; a hit re-attaches them to the job's current input frame. A dependent PPA's key covers its mover's ON column, so it is solved
+    again exactly when the mover's schedule changed. Entries are written as soon as a solve
+    finishes, so an interrupted run resumes from the years it already has.
+    """
+    def __init__(self, cache_dir):
+        self.path = os.path.join(cache_dir, "results")
+        self.hits = 0
+        self.misses = 0
+
+    def _stem(self, job, key):
+        return os.path.join(self.path, str(job.name), f"{job.year}_{key}")
+
+    def lookup(self, job):
+        """ (key, cached results or None) of a job; take the key before solving, as the models
+        write their results into the input frame """
+        key = job_key(job)
+        stem = self._stem(job, key)
+        if not has_frame(stem):
+            self.misses += 1
+            return key, None
+        self.hits += 1
+        print(f"{job.name} {job.year}: inputs and model code unchanged, result taken from the cache")
+        stored = load_frame(stem)
+        data = job.args[0].copy()
+        for col in stored.columns:
+            data.loc[:, col] = stored[col].to_numpy()
+        return key, data
+
+    def put(self, job, key, result):
+        """ Stores the job's result columns, replacing the entry of an earlier key """
+        folder = os.path.join(self.path, str(job.name))
+        os.makedirs(folder, exist_ok=True)
+        for entry in os.listdir(folder):
+            if entry.startswith(f"{job.year}_") and not entry.startswith(f"{job.year}_{key}."):
+                os.remove(os.path.join(folder, entry))
+        # The columns the solve added: ON_/Power_ of the contract, or of every unit of a fleet
+        cols = [col for col in result.columns if col not in job.args[0].columns]
+        save_frame(self._stem(job, key), result[cols].reset_index(drop=True))
+
+    def report(self):
+        return f"{self.hits} cached, {self.misses} solved"
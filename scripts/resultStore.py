@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+FIELDS = ("ON", "Power")
+
+
+def pyomo_values(var, T):
+    """ Values of an indexed Pyomo Var over 0..T-1 as one float array (NaN where unset) """
+    values = var.extract_values()
+    return np.fromiter((np.nan if values[t] is None else values[t] for t in range(T)), dtype=float, count=T)
+
+
+class ResultStore:
+    """ ON and Power of every contract, preallocated on the master timeline.
+
+    The timeline is the hourly input frame the yearly slices are cut from; a solve's results
+    are written into the (hours x contracts*2) array by the row positions of their index
+    labels, so assembling the results of a run never concatenates or merges frames. Hours a
+    contract did not solve stay 0. `frame` builds the DataFrame for export.
+    """
+    def __init__(self, timeline, names):
+        self.timeline = timeline
+        self.names = list(names)
+        self.values = np.zeros((len(timeline), 2 * len(self.names)))
+        self.written = np.zeros((len(timeline), len(self.names)), dtype=bool)
+        self._col = {name: i for i, name in enumerate(self.names)}
+
+    def rows(self, frame):
+        """ Positions of the frame's hours on the timeline, a slice when they are contiguous """
+        rows = self.timeline.index.get_indexer(frame.index)
+        if len(rows) and (rows < 0).any():
+            raise KeyError("Results contain hours that are not on the timeline")
+        if len(rows) and rows[-1] - rows[0] + 1 == len(rows) and (np.diff(rows) == 1).all():
+            return slice(int(rows[0]), int(rows[-1]) + 1)
+        return rows
+
+    def write(self, name, result):
+        """ Stores the ON_<name>/Power_<name> columns of one solve; hours where ON is NaN (outside
+        the contract of a fleet unit) are not the contract's and are skipped """
+        i = self._col[name]
+        solved = result[f"ON_{name}"].notna().to_numpy()
+        if not solved.all():
+            result = result[solved]
+        rows = self.rows(result)
+        for j, field in enumerate(FIELDS):
+            self.values[rows, 2 * i + j] = result[f"{field}_{name}"].to_numpy(dtype=float)
+        self.written[rows, i] = True
+
+    def column(self, name, field="ON", frame=None):
+        """ One result column (a view), or its values on the hours of `frame` """
+        values = self.values[:, 2 * self._col[name] + FIELDS.index(field)]
+        return values if frame is None else values[self.rows(frame)]
+
+    def attach(self, data, name):
+        """ `data` with the ON_<name> column of the store on its hours """
+        return data.assign(**{"ON_" + name: self.column(name, "ON", data)})
+
+    def frame(self, names=None, features=True, only=None):
+        """ DataFrame of the timeline with the ON_/Power_ columns of `names` (all by default).
+        features=False keeps only the time keys; `only` restricts the rows to the hours that
+        contract solved """
+        names = self.names if names is None else list(names)
+        cols = [2 * self._col[name] + j for name in names for j in range(len(FIELDS))]
+        rows = slice(None) if only is None else self.written[:, self._col[only]]
+        base = self.timeline if features else self.timeline[["Year", "Month", "Day", "Hour"]]
+        results = pd.DataFrame(self.values[rows][:, cols], index=base.index[rows],
+                               columns=[f"{field}_{name}" for name in names for field in FIELDS])
+        return pd.concat([base[rows], results], axis=1).reset_index(drop=True)
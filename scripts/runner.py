@@ -0,0 +1,197 @@
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from scripts import instrumentation
+
+# Marks the end of the jobs on the pipeline queues
+_END = object()
+
+
+class YearJob:
+    """ One yearly solve (contract, year) that can be shipped to a worker process """
+    def __init__(self, name, year, model_cls, args, kwargs=None, solve_kwargs=None):
+        self.name = name
+        self.year = year
+        self.model_cls = model_cls
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.solve_kwargs = solve_kwargs or {}
+        # Instrumentation settings of the creating process, so workers measure the same way
+        self.instrument = instrumentation.active().settings()
+
+
+def build_job(job):
+    """ Builds the model of one job. Returns (timer, model); the timer records this job's phases """
+    timer = instrumentation.Instrumentation(**job.instrument)
+    with timer.phase("model build", job.name, job.year) as record:
+        model = job.model_cls(*job.args, **job.kwargs)
+    stats = getattr(model, "prescreen_stats", None)
+    if stats:
+        record.update({f"prescreen_{key}": value for key, value in stats.items()})
+    return timer, model
+
+
+def solve_model(job, timer, model):
+    with timer.phase("solver call", job.name, job.year) as record:
+        model.solve(**job.solve_kwargs)
+    record.update(instrumentation.solver_stats(model))
+    # Summary of wrapped solves (WindowedDispatch, AggregatedDispatch), e.g. their error against a full solve
+    record.update(getattr(model, "stats", None) or {})
+
+
+def extract_results(job, timer, model):
+    with timer.phase("result extraction", job.name, job.year):
+        results = model.get_results()
+    return timer.attach(results)
+
+
+def solve_job(job):
+    """ Builds, solves and extracts the results of one yearly model. Runs inside the worker;
+    the phase timings travel back with the results (see Instrumentation.collect) """
+    timer, model = build_job(job)
+    solve_model(job, timer, model)
+    return extract_results(job, timer, model)
+
+
+def _shares_template(job):
+    """ Persistent-engine models load their parameters into a template shared with the next job
+    of the same structure, so they are built, solved and read back in one go """
+    return job.kwargs.get("engine") == "persistent"
+
+
+def collect(result):
+    """ Moves the phase timings a worker attached to `result` into this process """
+    return instrumentation.active().collect(result)
+
+
+def default_workers():
+    """ One worker per core, the solver itself runs single threaded """
+    return os.cpu_count() or 1
+
+
+def run_pipeline(jobs, cache=None, depth=1, on_result=None):
+    """ Solves the jobs one after another, in order, as three stages: a thread builds the next
+    models (and evaluates `jobs`, which may be a generator slicing each year's data) while the
+    calling thread has the current one in the solver, and a third thread extracts and stores the
+    results of the previous one. The queues between the stages hold at most `depth` jobs each,
+    so no more than 2 * depth + 1 models are alive at once.
+
+    With a ResultCache, cached jobs skip the build and solve stages and each new result is stored
+    on the extraction stage. on_result(job, result) is called there as well, in job order, and
+    the results are then not kept; otherwise they are returned in job order. Phases of
+    neighbouring jobs overlap, so with memory instrumentation their peaks are shared.
+    """
+    built, solved = queue.Queue(maxsize=depth), queue.Queue(maxsize=depth)
+    failed = threading.Event()
+    errors = []
+    results = []
+
+    def put(q, item):
+        while not failed.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(q):
+        while not failed.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return _END
+
+    def stage(work):
+        try:
+            work()
+        except BaseException as exc:
+            errors.append(exc)
+            failed.set()
+
+    def build():
+        for job in jobs:
+            key, result = cache.lookup(job) if cache is not None else (None, None)
+            state = build_job(job) if result is None and not _shares_template(job) else None
+            if not put(built, (job, key, result, state)):
+                return
+        put(built, _END)
+
+    def extract():
+        while True:
+            item = get(solved)
+            if item is _END:
+                return
+            job, key, result, state = item
+            if result is None:
+                result = collect(extract_results(job, *state))
+                if cache is not None:
+                    cache.put(job, key, result)
+            if on_result is not None:
+                on_result(job, result)
+            else:
+                results.append(result)
+
+    def solve():
+        while True:
+            item = get(built)
+            if item is _END:
+                break
+            job, key, result, state = item
+            if result is None and state is None:
+                result = collect(solve_job(job))
+                if cache is not None:
+                    cache.put(job, key, result)
+            elif result is None:
+                solve_model(job, *state)
+            if not put(solved, (job, key, result, state)):
+                return
+        put(solved, _END)
+
+    threads = [threading.Thread(target=stage, args=(work,), daemon=True) for work in (build, extract)]
+    for thread in threads:
+        thread.start()
+
+    stage(solve)
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return None if on_result is not None else results
+
+
+def run_jobs(jobs, workers=1, cache=None, depth=1):
+    """ Solves the jobs, in parallel when workers > 1, and returns the results in job order.
+    With a single worker the jobs run through run_pipeline, building each model while the
+    previous one is in the solver. With a ResultCache, cached jobs are not solved and each new
+    result is stored as it finishes """
+    jobs = list(jobs)
+    if workers is None:
+        workers = default_workers()
+    if workers <= 1:
+        return run_pipeline(jobs, cache, depth)
+    if cache is None:
+        if len(jobs) <= 1:
+            return [collect(solve_job(job)) for job in jobs]
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            return [collect(result) for result in pool.map(solve_job, jobs)]
+
+    results, keys = [None] * len(jobs), [None] * len(jobs)
+    for i, job in enumerate(jobs):
+        keys[i], results[i] = cache.lookup(job)
+    todo = [i for i, result in enumerate(results) if result is None]
+    if len(todo) <= 1:
+        for i in todo:
+            results[i] = collect(solve_job(jobs[i]))
+            cache.put(jobs[i], keys[i], results[i])
+        return results
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+        futures = {pool.submit(solve_job, jobs[i]): i for i in todo}
+        for future in as_completed(futures):
+            i = futures[future]
+            results[i] = collect(future.result())
+            cache.put(jobs[i], keys[i], results[i])
+    return results
@@ -0,0 +1,237 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from scripts.dispatchBase import DispatchModel
+from scripts.dispatchPpa import DispatchModelPPA
+from scripts.runner import default_workers
+from scripts.scheduler import attach_mover_on, MERGE_KEYS
+from scripts.sharedFrame import SharedFrame
+
+# Column groups a scenario can scale; emission groups match the zone column prefixes
+GROUPS = ("gas", "lmp", "co2", "nox", "sox")
+# net_margin is the model objective: energy margin less start, EOH and LTSA costs
+METRICS = ["net_margin", "run_hours", "starts", "generation"]
+
+
+class Scenario:
+    """ One price path: multipliers on the hourly price columns.
+
+    `factors` maps a group from GROUPS or a column name to a multiplier: a scalar, or an array
+    with one value per month of the feature frame (its months in time order).
+    """
+    def __init__(self, name, factors):
+        self.name = name
+        self.factors = dict(factors)
+
+    def __repr__(self):
+        return f"Scenario({self.name!r})"
+
+    def apply(self, data, groups, month_pos):
+        """ Scaled copy of the columns this scenario touches; month_pos indexes monthly factors """
+        scaled = {}
+        for key, factor in self.factors.items():
+            factor = np.asarray(factor, dtype=float)
+            if factor.ndim:
+                factor = factor[month_pos]
+            for col in groups.get(key, [key]):
+                if col in data.columns:
+                    scaled[col] = data[col].to_numpy(dtype=float) * factor
+        return data.assign(**scaled) if scaled else data
+
+
+def sample_scenarios(n, n_months, seed=None, vol=None, corr=0.7, prefix="MC"):
+    """ Monte Carlo price paths as monthly mean-one log-normal random walks.
+
+    vol holds the monthly volatility per group; gas and LMP shocks are correlated by `corr`
+    so spark spreads stay plausible, emission groups move independently.
+    """
+    vol = vol or {"gas": 0.08, "lmp": 0.06, "co2": 0.05}
+    rng = np.random.default_rng(seed)
+    groups = list(vol)
+    cov = np.diag([vol[g] ** 2 for g in groups])
+    if "gas" in vol and "lmp" in vol:
+        i, j = groups.index("gas"), groups.index("lmp")
+        cov[i, j] = cov[j, i] = corr * vol["gas"] * vol["lmp"]
+    shocks = rng.multivariate_normal(np.zeros(len(groups)), cov, size=(n, n_months))
+    # Drift correction keeps every month's expected multiplier at 1
+    steps = np.arange(1, n_months + 1)[None, :, None]
+    paths = np.exp(np.cumsum(shocks, axis=1) - 0.5 * np.diag(cov)[None, None, :] * steps)
+    return [Scenario(f"{prefix}{k + 1}", {g: paths[k, :, i] for i, g in enumerate(groups)})
+            for k in range(n)]
+
+
+def multiplier_scenarios(sets):
+    """ Deterministic scenarios from {name: {group or column: multiplier}} """
+    return [Scenario(name, factors) for name, factors in sets.items()]
+
+
+def contract_groups(contracts, names):
+    """ Contracts that have to be solved together, movers before their dependents.
+    A PPA following the Base unit joins the Base group; when the Base unit is not among `names`
+    (not dispatched) its followers stand alone and run against an all-off mover, as in PPAScheduler """
+    movers = {}
+    for name in names:
+        mover = contracts[name].mover_dependency if name != "Base" else None
+        if mover == "Base" and "Base" not in names:
+            mover = None
+        elif mover is not None and mover not in names:
+            raise ValueError(f"{name} depends on {mover}, which is not an enabled contract")
+        movers[name] = mover
+
+    def root(name, seen=()):
+        if name in seen:
+            raise ValueError(f"Circular Mover_Dependency involving {name}")
+        return name if movers[name] is None else root(movers[name], seen + (name,))
+
+    def depth(name):
+        return 0 if movers[name] is None else 1 + depth(movers[name])
+
+    groups = {}
+    for name in names:
+        groups.setdefault(root(name), []).append(name)
+    return [sorted(members, key=depth) for members in groups.values()]
+
+
+class ScenarioEngine:
+    """ Values every enabled contract (or the contracts in `names`, movers first) under many
+    price scenarios.
+
+    The hourly feature frame is put in shared memory once. Each (scenario, contract group,
+    year) is solved in a worker process, which slices the year out of shared memory, applies
+    the scenario multipliers and solves the group's contracts in mover order. Workers return
+    only the metrics per contract and year, aggregated by `summary`.
+    """
+    def __init__(self, thermal_input, features, scenarios, MinUpTime=8, MinDownTime=8, model_kwargs=None,
+                 solve_kwargs=None, workers=None, names=None):
+        self.thermal_input = thermal_input
+        self.features = features
+        self.scenarios = list(scenarios)
+        self.model_kwargs = model_kwargs or {}
+        self.solve_kwargs = solve_kwargs or {}
+        self.workers = default_workers() if workers is None else workers
+        self.MinUpTime, self.MinDownTime = MinUpTime, MinDownTime
+
+        ti = thermal_input
+        if names is None:
+            names = ti.enabled_ppas()
+            if "Base" in ti.contracts and ti.contracts["Base"].dispatch_run:
+                names = ["Base"] + [name for name in names if name != "Base"]
+        self.contracts = {name: ti.contracts[name] for name in names}
+        self.groups = contract_groups(self.contracts, names)
+
+        # Contiguous row range of every year, and each row's month position for monthly factors
+        year = features["Year"].to_numpy()
+        self.years = {}
+        for y in pd.unique(year):
+            rows = np.flatnonzero(year == y)
+            if len(rows) and rows[-1] - rows[0] + 1 != len(rows):
+                raise ValueError(f"Rows of year {y} are not contiguous in the feature frame")
+            self.years[int(y)] = (int(rows[0]), int(rows[-1]) + 1)
+        code = features["Year"].to_numpy(dtype=np.int64) * 12 + features["Month"].to_numpy(dtype=np.int64) - 1
+        self.month_pos = np.searchsorted(np.unique(code), code)
+        self.maint = {y: ti.get_maint_per(y) for y in self.years}
+
+    def column_groups(self):
+        """ Feature-frame columns behind each scenario group """
+        cols = self.features.columns
+        groups = {"gas": sorted({c.gas_hub for c in self.contracts.values()}),
+                  "lmp": sorted({c.lmp_hub for c in self.contracts.values()})}
+        for prefix in ("co2", "nox", "sox"):
+            groups[prefix] = [c for c in cols if str(c).lower().startswith(prefix + "_")]
+        return groups
+
+    def tasks(self):
+        for scenario in self.scenarios:
+            for group in self.groups:
+                years = set()
+                for name in group:
+                    first, last = self.contracts[name].years
+                    years |= {y for y in self.years if first <= y <= last}
+                for year in sorted(years):
+                    yield scenario, group, year
+
+    def context(self, handle):
+        return {"frame": handle, "contracts": self.contracts, "plant": self.thermal_input.plant,
+                "groups": self.column_groups(), "years": self.years, "month_pos": self.month_pos,
+                "maint": self.maint, "MinUpTime": self.MinUpTime, "MinDownTime": self.MinDownTime,
+                "model_kwargs": self.model_kwargs, "solve_kwargs": self.solve_kwargs}
+
+    def run(self):
+        """ Solves every task and returns one row per (scenario, contract, year) """
+        rows = []
+        with SharedFrame.create(self.features) as shared:
+            context = self.context(shared.handle())
+            tasks = list(self.tasks())
+            print(f"Running {len(tasks)} scenario tasks on {self.workers} worker(s)...")
+            if self.workers <= 1:
+                _init_worker(context)
+                for task in tasks:
+                    rows += _solve_task(task)
+                _close_worker()
+            else:
+                with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                         initargs=(context,)) as pool:
+                    futures = [pool.submit(_solve_task, task) for task in tasks]
+                    for future in as_completed(futures):
+                        rows += future.result()
+        self.results = pd.DataFrame(rows, columns=["scenario", "contract", "year"] + METRICS)
+        return self.results
+
+    def summary(self, quantiles=(0.1, 0.5, 0.9), by_year=False):
+        return summarize(self.results, quantiles, by_year)
+
+
+def summarize(results, quantiles=(0.1, 0.5, 0.9), by_year=False):
+    """ Mean and P10/P50/P90 of every metric per contract (and year), over scenarios.
+    Without by_year the metrics are first summed over the years of each scenario """
+    keys = ["contract", "year"] if by_year else ["contract"]
+    totals = results.groupby(["scenario"] + keys)[METRICS].sum().reset_index()
+    grouped = totals.groupby(keys)[METRICS]
+    frames = [grouped.mean().add_suffix("_mean")]
+    for q in quantiles:
+        frames.append(grouped.quantile(q).add_suffix(f"_P{round(q * 100)}"))
+    return pd.concat(frames, axis=1).reset_index()
+
+
+# Per-worker state: the attached shared frame and the run context
+_WORKER = {}
+
+
+def _init_worker(context):
+    _WORKER.update(context)
+    _WORKER["shared"] = SharedFrame.attach(context["frame"])
+
+
+def _close_worker():
+    _WORKER.pop("shared").close()
+
+
+def _solve_task(task):
+    """ Solves one contract group for one scenario and year; returns metric rows """
+    scenario, group, year = task
+    w = _WORKER
+    lo, hi = w["years"][year]
+    data_year = scenario.apply(w["shared"].rows(lo, hi), w["groups"], w["month_pos"][lo:hi])
+
+    results, rows = {}, []
+    for name in group:
+        config = w["contracts"][name]
+        data = data_year[(data_year["Date"] >= config.ppa_start) & (data_year["Date"] <= config.ppa_end)]
+        if data.shape[0] == 0:
+            continue
+        T = data.shape[0]
+        mover = config.mover_dependency if name != "Base" else None
+        if mover is not None:
+            data = attach_mover_on(data, mover, results.get(mover))
+            model = DispatchModelPPA(*config.ppa_args(w["plant"], data, T), **w["model_kwargs"])
+        else:
+            args = config.dispatch_args(w["plant"], data, T, w["maint"][year], w["MinUpTime"], w["MinDownTime"])
+            model = DispatchModel(*args, **w["model_kwargs"])
+        model.solve(**w["solve_kwargs"])
+        out = model.get_results()
+        results[name] = out[MERGE_KEYS + ["ON_" + name]]
+
+        on = np.round(out["ON_" + name].to_numpy(dtype=float))
+        rows.append((scenario.name, name, year, float(model.get_objective()), float(on.sum()),
+                     int((np.diff(on) > 0).sum()), float(out["Power_" + name].sum())))
+    return rows
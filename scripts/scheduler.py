@@ -0,0 +1,184 @@
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from scripts.runner import solve_job, default_workers, collect, run_pipeline
+
+MERGE_KEYS = ["Year", "Month", "Day", "Hour"]
+
+
+def attach_mover_on(data, mover, mover_results):
+    """ `data` with the mover's ON column taken from its results on Year/Month/Day/Hour.
+    Hours the mover did not solve, or a mover without results, count as off """
+    col = "ON_" + mover
+    data = data.drop(columns=[col], errors="ignore")
+    if mover_results is None:
+        # The mover does not run this year, so the dependent unit cannot run either
+        return data.assign(**{col: 0.0})
+    merged = data.merge(mover_results[MERGE_KEYS + [col]], on=MERGE_KEYS, how="left")
+    merged.index = data.index
+    merged[col] = merged[col].fillna(0)
+    return merged
+
+
+class PPAScheduler:
+    """ Runs the enabled PPAs as a dependency graph built from Mover_Dependency.
+
+    Every (PPA, year) solve is a node. A PPA without a mover (or with the Base unit as its
+    mover) only needs the base results and is ready immediately. A dependent PPA's year is
+    submitted as soon as its mover's result for the same year exists. Inputs are cut from the
+    timeline of the ResultStore holding the base results, the mover's ON column is read from
+    the store, and every result is written into it. With a ResultCache, a node whose inputs
+    (including its mover's ON column) are unchanged is taken from the cache. PPAs in `solved`
+    already have their results in the store (e.g. from a FleetDispatch) and are left out, and
+    `names` limits the run to some PPAs (every enabled one by default). With a single worker the
+    nodes run through run_pipeline, `depth` models ahead of the solver.
+    """
+    def __init__(self, thermal_input, store, make_job, workers=None, on_complete=None, cache=None, solved=(),
+                 depth=1, names=None):
+        self.thermal_input = thermal_input
+        self.store = store
+        self.make_job = make_job
+        self.workers = default_workers() if workers is None else workers
+        # Called as on_complete(name, frame) once every year of a PPA is solved
+        self.on_complete = on_complete
+        self.cache = cache
+        self.solved = set(solved)
+        self.depth = depth
+        self._build_graph(names)
+        self.done = {name: set() for name in self.names}
+
+    def _build_graph(self, names=None):
+        """ Collects the PPAs to run, their years and mover edges, and checks for cycles """
+        ti = self.thermal_input
+        names = ti.enabled_ppas() if names is None else names
+        self.names = [name for name in names if name not in self.solved]
+        self.movers = {}
+
+        for name in self.names:
+            mover = ti.get_mover_dependency(name)
+            if pd.isna(mover) or mover == "Base" or mover in self.solved:
+                self.movers[name] = None
+            elif mover in self.names:
+                self.movers[name] = mover
+            else:
+                raise ValueError(f"{name} depends on {mover}, which is not an enabled PPA")
+
+        self.dependents = {name: [] for name in self.names}
+        for name, mover in self.movers.items():
+            if mover is not None:
+                self.dependents[mover].append(name)
+
+        self.order = self._topological_order()
+
+        # Years in which each PPA has hours on the timeline
+        self.years = {}
+        for name in self.names:
+            data = ti.get_data_file(name, self.store.timeline)
+            st_year, end_year = ti.get_time(name)
+            self.years[name] = [y for y in range(st_year, end_year + 1)
+                                if ti.get_year_data(data, y).shape[0] > 0]
+
+    def _topological_order(self):
+        order, state = [], {}
+
+        def visit(name):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Circular Mover_Dependency involving {name}")
+            state[name] = "visiting"
+            if self.movers[name] is not None:
+                visit(self.movers[name])
+            state[name] = "done"
+            order.append(name)
+
+        for name in self.names:
+            visit(name)
+        return order
+
+    def _levels(self):
+        """ The PPAs grouped by the length of their mover chain, in topological order """
+        level = {}
+        for name in self.order:
+            mover = self.movers[name]
+            level[name] = 0 if mover is None else level[mover] + 1
+        depth = max(level.values(), default=-1) + 1
+        return [[name for name in self.order if level[name] == i] for i in range(depth)]
+
+    def _year_data(self, name, year):
+        """ Year slice of the timeline for `name`, with the ON column of its mover (the Base unit
+        or another PPA) attached from the store; hours the mover did not solve count as off """
+        ti = self.thermal_input
+        data = ti.get_year_data(ti.get_data_file(name, self.store.timeline), year)
+        mover = ti.get_mover_dependency(name)
+        if mover is None:
+            return data
+        return self.store.attach(data, mover)
+
+    def _is_ready(self, name, year):
+        mover = self.movers[name]
+        if mover is None or year not in self.years[mover]:
+            return True
+        return year in self.done[mover]
+
+    def run(self):
+        """ Solves every (PPA, year) node into the store and returns the store """
+        pending = {(name, year) for name in self.order for year in self.years[name]}
+        for name in self.order:
+            print(f"running for {name} (mover dependency {self.movers[name]})...")
+
+        if self.workers <= 1:
+            # A mover is in an earlier level than its dependents, so every node of a level can be
+            # built while the one before it is in the solver; the jobs are made as they are built
+            for level in self._levels():
+                jobs = (self.make_job(name, year, self._year_data(name, year))
+                        for name in level for year in self.years[name])
+                run_pipeline(jobs, self.cache, self.depth,
+                             on_result=lambda job, result: self._store(job.name, job.year, result))
+            return self.store
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            running = {}
+
+            def submit_ready():
+                # Cache hits can make further nodes ready, so repeat until nothing changes
+                progress = True
+                while progress:
+                    progress = False
+                    for node in sorted(pending, key=lambda n: (self.order.index(n[0]), n[1])):
+                        if self._is_ready(*node):
+                            pending.discard(node)
+                            job, key, cached = self._lookup(*node)
+                            if cached is not None:
+                                self._store(*node, cached)
+                                progress = True
+                            else:
+                                running[pool.submit(solve_job, job)] = (node, job, key)
+
+            submit_ready()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    (name, year), job, key = running.pop(future)
+                    self._store(name, year, self._solved(job, key, collect(future.result())))
+                    print(f"Finished {name} year {year}")
+                submit_ready()
+
+        return self.store
+
+    def _lookup(self, name, year):
+        """ (job, cache key, cached results or None) of one node """
+        job = self.make_job(name, year, self._year_data(name, year))
+        if self.cache is None:
+            return job, None, None
+        return (job,) + self.cache.lookup(job)
+
+    def _solved(self, job, key, result):
+        if self.cache is not None:
+            self.cache.put(job, key, result)
+        return result
+
+    def _store(self, name, year, result):
+        self.store.write(name, result)
+        self.done[name].add(year)
+        if self.on_complete is not None and len(self.done[name]) == len(self.years[name]):
+            self.on_complete(name, self.store.frame([name], features=False, only=name))
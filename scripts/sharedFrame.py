@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+from multiprocessing import shared_memory
+
+
+class SharedFrame:
+    """ A DataFrame held in shared memory, so worker processes read it without a pickled copy each.
+
+    Columns are grouped by dtype into one shared block per dtype (datetimes are stored as
+    int64). Object columns cannot live in shared memory and travel with the handle instead.
+    The creating process owns the blocks and must `close()` them; workers `attach(handle)`.
+    """
+    def __init__(self, blocks, columns, extra, index, owner):
+        self.blocks = blocks
+        self.columns = columns
+        self.extra = extra
+        self.index = index
+        self.owner = owner
+
+    @classmethod
+    def create(cls, df):
+        blocks = {}
+        extra = {}
+        groups = {}
+        for col in df.columns:
+            dtype = df[col].dtype
+            if pd.api.types.is_datetime64_dtype(dtype):
+                groups.setdefault(("datetime64[ns]", "int64"), []).append(col)
+            elif isinstance(dtype, np.dtype) and dtype.kind in "biuf":
+                groups.setdefault((dtype.str, dtype.str), []).append(col)
+            else:
+                extra[col] = df[col].to_numpy()
+
+        for (logical, stored), cols in groups.items():
+            values = np.empty((len(df), len(cols)), dtype=stored)
+            for j, col in enumerate(cols):
+                if logical == "datetime64[ns]":
+                    values[:, j] = df[col].to_numpy(dtype="datetime64[ns]").view("int64")
+                else:
+                    values[:, j] = df[col].to_numpy()
+            shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(values.shape, dtype=stored, buffer=shm.buf)[:] = values
+            blocks[logical] = (shm, stored, values.shape, cols)
+        return cls(blocks, list(df.columns), extra, df.index.to_numpy(), owner=True)
+
+    def handle(self):
+        """ Picklable description to pass to workers """
+        return {"blocks": {logical: (shm.name, stored, shape, cols)
+                           for logical, (shm, stored, shape, cols) in self.blocks.items()},
+                "columns": self.columns, "extra": self.extra, "index": self.index}
+
+    @classmethod
+    def attach(cls, handle):
+        blocks = {logical: (shared_memory.SharedMemory(name=name), stored, shape, cols)
+                  for logical, (name, stored, shape, cols) in handle["blocks"].items()}
+        return cls(blocks, handle["columns"], handle["extra"], handle["index"], owner=False)
+
+    def __len__(self):
+        return len(self.index)
+
+    def rows(self, lo=0, hi=None):
+        """ Rows lo..hi as a regular DataFrame; only this slice is copied out of shared memory """
+        hi = len(self) if hi is None else hi
+        columns = {}
+        for logical, (shm, stored, shape, cols) in self.blocks.items():
+            values = np.ndarray(shape, dtype=stored, buffer=shm.buf)[lo:hi]
+            for j, col in enumerate(cols):
+                column = values[:, j].copy()
+                columns[col] = column.view(logical) if logical == "datetime64[ns]" else column
+        for col, values in self.extra.items():
+            columns[col] = values[lo:hi]
+        return pd.DataFrame({col: columns[col] for col in self.columns}, index=self.index[lo:hi])
+
+    def close(self):
+        """ Detaches, and frees the blocks when called by the creating process """
+        for shm, _, _, _ in self.blocks.values():
+            shm.close()
+            if self.owner:
+                shm.unlink()
+        self.blocks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
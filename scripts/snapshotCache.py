@@ -0,0 +1,76 @@
+import hashlib
+import os
+import shutil
+import pandas as pd
+
+# Bump when the sheet parsing or the feature assembly changes, so old snapshots are not reused
+CACHE_VERSION = "5"
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """ SHA-256 of the file content """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def has_frame(stem):
+    return os.path.exists(stem + ".parquet") or os.path.exists(stem + ".pkl")
+
+
+def load_frame(stem):
+    """ Frame saved by save_frame under `stem` (a path without extension) """
+    if os.path.exists(stem + ".parquet"):
+        return pd.read_parquet(stem + ".parquet", memory_map=True)
+    return pd.read_pickle(stem + ".pkl")
+
+
+def save_frame(stem, df):
+    """ Writes `df` as stem.parquet, or stem.pkl when Parquet is not possible; atomically """
+    try:
+        tmp = stem + ".parquet.tmp"
+        df.to_parquet(tmp)
+        os.replace(tmp, stem + ".parquet")
+    except Exception:
+        # No pyarrow, or mixed-type columns such as the PPA sheet
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        tmp = stem + ".pkl.tmp"
+        df.to_pickle(tmp)
+        os.replace(tmp, stem + ".pkl")
+
+
+class SnapshotCache:
+    """ On-disk snapshot of DataFrames keyed by the content hash of an input workbook.
+
+    Frames are stored as Parquet (read back memory-mapped) when pyarrow is available and the
+    frame is Arrow-compatible, otherwise as pickle. Any change to the workbook changes the key,
+    and snapshots of older versions of the same workbook are removed.
+    """
+    def __init__(self, cache_dir, source_path):
+        self.cache_dir = cache_dir
+        self.stem = os.path.splitext(os.path.basename(source_path))[0]
+        self.key = f"{self.stem}_{file_digest(source_path)[:16]}_v{CACHE_VERSION}"
+        self.path = os.path.join(cache_dir, self.key)
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def has(self, name):
+        return has_frame(self._file(name))
+
+    def load(self, name):
+        return load_frame(self._file(name))
+
+    def save(self, name, df):
+        os.makedirs(self.path, exist_ok=True)
+        self._prune()
+        save_frame(self._file(name), df)
+
+    def _prune(self):
+        """ Removes snapshots of earlier versions of the same workbook """
+        for entry in os.listdir(self.cache_dir):
+            if entry != self.key and entry.rsplit("_", 2)[0] == self.stem:
+                shutil.rmtree(os.path.join(self.cache_dir, entry), ignore_errors=True)
@@ -0,0 +1,452 @@
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+import numpy as np
+
+PRESOLVE_LEVELS = (None, "off", "on", "aggressive")
+# Statuses that leave a usable solution; anything else raises SolverError
+USABLE = ("optimal", "feasible")
+# Shell backends already reported as taking no start solution, so the note is printed once per process
+_UNSEEDED = set()
+
+
+class SolverError(RuntimeError):
+    """ Raised when a solve ends without a solution that can be read back as results """
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+
+class SolverOptions:
+    """ Per-run solver settings, translated to every backend's own parameter names.
+    gap is the relative MIP gap, time_limit in seconds, presolve one of PRESOLVE_LEVELS
+    (None keeps the solver default) """
+    __slots__ = ("gap", "time_limit", "threads", "presolve")
+
+    def __init__(self, gap=None, time_limit=None, threads=None, presolve=None):
+        if presolve not in PRESOLVE_LEVELS:
+            raise ValueError(f"Unknown presolve level {presolve}, expected one of {PRESOLVE_LEVELS}")
+        self.gap = gap
+        self.time_limit = time_limit
+        self.threads = threads
+        self.presolve = presolve
+
+
+class SolveResult:
+    """ Outcome of one solve: normalized status, the solver's own termination code and statistics """
+    def __init__(self, solver, status, termination, objective=None, bound=None, nodes=None, seconds=None):
+        self.solver = solver
+        self.status = status
+        self.termination = termination
+        self.objective = objective
+        self.bound = bound
+        self.nodes = nodes
+        self.seconds = seconds
+
+    @property
+    def gap(self):
+        if self.objective is None or self.bound is None:
+            return None
+        return abs(self.bound - self.objective) / max(abs(self.objective), 1e-10)
+
+    def as_dict(self):
+        return {"solver": self.solver, "status": self.status, "termination": self.termination,
+                "objective": self.objective, "bound": self.bound, "gap": self.gap,
+                "nodes": self.nodes, "seconds": self.seconds}
+
+    def check(self, name=""):
+        """ Raises SolverError unless the solve produced a usable solution """
+        if self.status not in USABLE:
+            raise SolverError(f"{self.solver} solve of {name} ended with {self.status} ({self.termination})", self)
+        if self.status == "feasible":
+            print(f"{self.solver} stopped on {self.termination} for {name}, gap {self.gap}")
+        return self
+
+    def __repr__(self):
+        return f"SolveResult({self.solver}, {self.status}, {self.termination}, objective={self.objective})"
+
+
+def default_executable(solver_name):
+    return f"{solver_name}.exe" if os.name == "nt" else solver_name
+
+
+class ScipBackend:
+    """ SCIP as an external binary: through Pyomo's shell interface, or an MPS file for the matrix engine """
+    name = "scip"
+    # Model engines whose start solution the backend reads (Pyomo's SCIP interface drops it)
+    start_engines = ("matrix",)
+
+    def pyomo_options(self, options):
+        params = {}
+        if options.gap is not None:
+            params["limits/gap"] = options.gap
+        if options.time_limit is not None:
+            params["limits/time"] = options.time_limit
+        if options.threads is not None:
+            params["parallel/maxnthreads"] = options.threads
+        if options.presolve == "off":
+            params["presolving/maxrounds"] = 0
+        elif options.presolve == "aggressive":
+            params["presolving/maxrestarts"] = -1
+        return params
+
+    def solve_pyomo(self, model, options, executable=None, warmstart=False):
+        return _solve_pyomo_shell(self.name, model, self.pyomo_options(options),
+                                  executable or default_executable("scip"), warmstart)
+
+    def solve_matrix(self, mm, options, executable=None, initial=None):
+        executable = executable or default_executable("scip")
+        workdir = tempfile.mkdtemp(prefix="dispatch_")
+        try:
+            mps_file = os.path.join(workdir, "model.mps")
+            sol_file = os.path.join(workdir, "model.sol")
+            mm.write_mps(mps_file)
+            commands = []
+            if options.gap is not None:
+                commands.append(f"set limits gap {options.gap}")
+            if options.time_limit is not None:
+                commands.append(f"set limits time {options.time_limit}")
+            if options.threads is not None:
+                commands.append(f"set parallel maxnthreads {options.threads}")
+            if options.presolve is not None and options.presolve != "on":
+                commands.append(f"set presolving emphasis {options.presolve}")
+            commands.append(f"read {mps_file}")
+            if initial is not None:
+                start_file = os.path.join(workdir, "start.sol")
+                write_scip_solution(start_file, initial)
+                commands.append(f"read {start_file}")
+            commands += ["optimize", f"write solution {sol_file}", "quit"]
+
+            time_start = time.time()
+            run = subprocess.run([executable, "-c", " ".join(commands)], capture_output=True, text=True)
+            seconds = time.time() - time_start
+            if run.returncode != 0 or not os.path.exists(sol_file):
+                return None, SolveResult(self.name, "error", f"exit code {run.returncode}", seconds=seconds)
+
+            x, termination = read_scip_solution(sol_file, mm.n_cols)
+            stats = _scip_statistics(run.stdout)
+            status = _scip_status(termination, x is not None)
+            objective = mm.objective_value(x) if x is not None else None
+            return x, SolveResult(self.name, status, termination, objective, stats.get("bound"),
+                                  stats.get("nodes"), seconds)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+class HighsBackend:
+    """ HiGHS in-process: Pyomo's APPSI interface for Pyomo models, highspy for the matrix engine """
+    name = "highs"
+    start_engines = ("pyomo", "persistent", "matrix")
+
+    def highs_options(self, options):
+        params = {"output_flag": False}
+        if options.gap is not None:
+            params["mip_rel_gap"] = options.gap
+        if options.time_limit is not None:
+            params["time_limit"] = float(options.time_limit)
+        if options.threads is not None:
+            params["threads"] = int(options.threads)
+        if options.presolve is not None:
+            params["presolve"] = "off" if options.presolve == "off" else "on"
+        return params
+
+    def persistent(self):
+        """ APPSI HiGHS instance that keeps its model between solves and only pushes changed
+        parameters, fixed variables and bounds; constraints and variables are taken as unchanged """
+        from pyomo.contrib.appsi.solvers import Highs
+
+        solver = Highs()
+        solver.update_config.check_for_new_or_removed_constraints = False
+        solver.update_config.check_for_new_or_removed_vars = False
+        solver.update_config.check_for_new_or_removed_params = False
+        solver.update_config.check_for_new_objective = False
+        solver.update_config.update_constraints = False
+        solver.update_config.update_named_expressions = False
+        return solver
+
+    def solve_pyomo(self, model, options, executable=None, warmstart=False, persistent=None):
+        from pyomo.contrib.appsi.solvers import Highs
+        from pyomo.contrib.appsi.base import TerminationCondition
+
+        solver = persistent if persistent is not None else Highs()
+        solver.config.load_solution = False
+        # Passes the values on the model's variables (the heuristic commitment) as the start solution
+        solver.config.warmstart = bool(warmstart)
+        solver.highs_options = self.highs_options(options)
+        time_start = time.time()
+        results = solver.solve(model)
+        seconds = time.time() - time_start
+
+        termination = results.termination_condition
+        has_solution = results.best_feasible_objective is not None
+        if termination == TerminationCondition.optimal:
+            status = "optimal"
+        elif termination in (TerminationCondition.maxTimeLimit, TerminationCondition.maxIterations,
+                             TerminationCondition.objectiveLimit, TerminationCondition.interrupted):
+            status = "feasible" if has_solution else "no_solution"
+        elif termination == TerminationCondition.infeasible:
+            status = "infeasible"
+        elif termination in (TerminationCondition.unbounded, TerminationCondition.infeasibleOrUnbounded):
+            status = "unbounded"
+        else:
+            status = "error"
+        if status in USABLE:
+            results.solution_loader.load_vars()
+        return SolveResult(self.name, status, str(termination), results.best_feasible_objective,
+                           results.best_objective_bound, None, seconds)
+
+    def solve_matrix(self, mm, options, executable=None, initial=None):
+        import highspy
+
+        c, lb, ub, integer, (indptr, indices, data), row_lo, row_hi = mm.finalize()
+        lp = highspy.HighsLp()
+        lp.num_col_ = mm.n_cols
+        lp.num_row_ = mm.n_rows
+        lp.sense_ = highspy.ObjSense.kMaximize
+        lp.col_cost_ = c
+        lp.col_lower_ = lb
+        lp.col_upper_ = ub
+        lp.row_lower_ = row_lo
+        lp.row_upper_ = row_hi
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kRowwise
+        lp.a_matrix_.start_ = indptr
+        lp.a_matrix_.index_ = indices
+        lp.a_matrix_.value_ = data
+        lp.integrality_ = [highspy.HighsVarType.kInteger if f else highspy.HighsVarType.kContinuous
+                           for f in integer]
+
+        h = highspy.Highs()
+        for key, val in self.highs_options(options).items():
+            h.setOptionValue(key, val)
+        h.passModel(lp)
+        if initial is not None:
+            start = highspy.HighsSolution()
+            start.col_value = list(initial)
+            h.setSolution(start)
+        time_start = time.time()
+        h.run()
+        seconds = time.time() - time_start
+
+        model_status = h.getModelStatus()
+        info = h.getInfo()
+        has_solution = info.primal_solution_status == 2
+        s = highspy.HighsModelStatus
+        if model_status == s.kOptimal:
+            status = "optimal"
+        elif model_status in (s.kTimeLimit, s.kIterationLimit, s.kSolutionLimit, s.kInterrupt):
+            status = "feasible" if has_solution else "no_solution"
+        elif model_status == s.kInfeasible:
+            status = "infeasible"
+        elif model_status in (s.kUnbounded, s.kUnboundedOrInfeasible):
+            status = "unbounded"
+        else:
+            status = "error"
+        x = np.asarray(h.getSolution().col_value) if has_solution else None
+        return x, SolveResult(self.name, status, h.modelStatusToString(model_status),
+                              info.objective_function_value if has_solution else None,
+                              info.mip_dual_bound, info.mip_node_count, seconds)
+
+
+class CbcBackend:
+    """ CBC as an external binary: through Pyomo's shell interface, or an MPS file for the matrix engine """
+    name = "cbc"
+    # With the Pyomo engine when the binary reads LP-file starts (see _solve_pyomo_shell)
+    start_engines = ("pyomo",)
+
+    def pyomo_options(self, options):
+        params = {}
+        if options.gap is not None:
+            params["ratioGap"] = options.gap
+        if options.time_limit is not None:
+            params["seconds"] = options.time_limit
+        if options.threads is not None:
+            params["threads"] = options.threads
+        if options.presolve is not None:
+            params["presolve"] = {"off": "off", "on": "on", "aggressive": "more"}[options.presolve]
+        return params
+
+    def solve_pyomo(self, model, options, executable=None, warmstart=False):
+        return _solve_pyomo_shell(self.name, model, self.pyomo_options(options),
+                                  executable or default_executable("cbc"), warmstart)
+
+    def solve_matrix(self, mm, options, executable=None, initial=None):
+        # CBC reads no start solution from the command line here; `initial` is ignored
+        executable = executable or default_executable("cbc")
+        workdir = tempfile.mkdtemp(prefix="dispatch_")
+        try:
+            mps_file = os.path.join(workdir, "model.mps")
+            sol_file = os.path.join(workdir, "model.sol")
+            mm.write_mps(mps_file)
+            args = [executable, mps_file]
+            for key, val in self.pyomo_options(options).items():
+                args += [f"-{key}", str(val)]
+            args += ["-solve", "-solution", sol_file]
+
+            time_start = time.time()
+            run = subprocess.run(args, capture_output=True, text=True)
+            seconds = time.time() - time_start
+            if run.returncode != 0 or not os.path.exists(sol_file):
+                return None, SolveResult(self.name, "error", f"exit code {run.returncode}", seconds=seconds)
+
+            x, termination = read_cbc_solution(sol_file, mm.n_cols)
+            if termination.startswith("Optimal"):
+                status = "optimal"
+            elif termination.startswith("Infeasible"):
+                status = "infeasible"
+            elif termination.startswith("Unbounded"):
+                status = "unbounded"
+            elif termination.startswith("Stopped") and "objective value" in termination:
+                status = "feasible"
+            else:
+                status = "no_solution"
+            if status not in USABLE:
+                x = None
+            objective = mm.objective_value(x) if x is not None else None
+            return x, SolveResult(self.name, status, termination, objective, None, None, seconds)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+BACKENDS = {"scip": ScipBackend, "highs": HighsBackend, "cbc": CbcBackend}
+
+
+def get_backend(solver_name):
+    try:
+        return BACKENDS[solver_name]()
+    except KeyError:
+        raise ValueError(f"Unknown solver {solver_name}, expected one of {sorted(BACKENDS)}") from None
+
+
+def takes_start(solver_name, engine):
+    """ Whether the named backend reads a start solution from models of the given engine """
+    return engine in get_backend(solver_name).start_engines
+
+
+def solve_pyomo(model, solver_name="scip", executable=None, options=None, warmstart=False, persistent=None):
+    """ Solves a Pyomo model with the named backend; loads the solution only when it is usable.
+    `persistent` is a solver instance from HighsBackend.persistent() to re-solve in place """
+    backend = get_backend(solver_name)
+    if persistent is not None:
+        return backend.solve_pyomo(model, options or SolverOptions(), executable, warmstart, persistent)
+    return backend.solve_pyomo(model, options or SolverOptions(), executable, warmstart)
+
+
+def solve_matrix(mm, solver_name="scip", executable=None, options=None, initial=None):
+    """ Solves a MatrixModel with the named backend. Returns (solution vector or None, SolveResult) """
+    return get_backend(solver_name).solve_matrix(mm, options or SolverOptions(), executable, initial)
+
+
+def _solve_pyomo_shell(name, model, params, executable, warmstart):
+    from pyomo.environ import SolverFactory
+    from pyomo.opt import TerminationCondition
+
+    solver = SolverFactory(name, executable=executable)
+    for key, val in params.items():
+        solver.options[key] = val
+    kwargs = {"load_solutions": False}
+    if warmstart and solver.warm_start_capable():
+        kwargs["warmstart"] = True
+    elif warmstart and name not in _UNSEEDED:
+        # Models only pass a start to backends listed as taking one (takes_start); this is a CBC binary
+        # built without LP-file start support
+        _UNSEEDED.add(name)
+        print(f"{name} at {executable} reads no start solution, the warm start is not used")
+    time_start = time.time()
+    results = solver.solve(model, **kwargs)
+    seconds = time.time() - time_start
+
+    termination = results.solver.termination_condition
+    has_solution = len(results.solution) > 0
+    if termination == TerminationCondition.optimal:
+        status = "optimal" if has_solution else "no_solution"
+    elif termination in (TerminationCondition.maxTimeLimit, TerminationCondition.maxIterations,
+                         TerminationCondition.maxEvaluations, TerminationCondition.userInterrupt):
+        status = "feasible" if has_solution else "no_solution"
+    elif termination == TerminationCondition.infeasible:
+        status = "infeasible"
+    elif termination in (TerminationCondition.unbounded, TerminationCondition.infeasibleOrUnbounded):
+        status = "unbounded"
+    elif termination == TerminationCondition.other and results.solver.message:
+        # Pyomo's SCIP plugin reports the gap, memory and solution limits as "other"; read its message instead
+        termination = str(results.solver.message).strip().lower()
+        status = _scip_status(termination, has_solution)
+    else:
+        status = "error"
+
+    objective = None
+    if status in USABLE:
+        model.solutions.load_from(results)
+        from pyomo.environ import value, Objective
+        objective = value(next(model.component_data_objects(Objective, active=True)))
+    bound = results.problem.upper_bound
+    bound = None if bound is None or not np.isfinite(float(bound)) else float(bound)
+    return SolveResult(name, status, str(termination), objective, bound, None, seconds)
+
+
+def _scip_status(termination, has_solution):
+    """ Status from SCIP's termination text. Reaching the requested gap is a normal finish;
+    the time, node, memory and solution limits leave a feasible solution """
+    if "optimal" in termination or "gap limit" in termination:
+        return "optimal" if has_solution else "no_solution"
+    if "infeasible" in termination:
+        return "infeasible"
+    if "unbounded" in termination:
+        return "unbounded"
+    if "limit" in termination or "interrupt" in termination:
+        return "feasible" if has_solution else "no_solution"
+    return "error"
+
+
+def _scip_statistics(output):
+    """ Dual bound and node count from SCIP's end-of-solve summary """
+    stats = {}
+    bound = re.search(r"Dual Bound\s*:\s*([-+.\deE]+)", output)
+    nodes = re.search(r"Solving Nodes\s*:\s*(\d+)", output)
+    if bound:
+        # The MPS file minimizes the negated objective
+        stats["bound"] = -float(bound.group(1))
+    if nodes:
+        stats["nodes"] = int(nodes.group(1))
+    return stats
+
+
+def write_scip_solution(sol_file, x):
+    """ Writes a solution vector in SCIP's solution file format, for use as a start solution """
+    with open(sol_file, "w") as f:
+        for j in np.flatnonzero(x):
+            f.write(f"x{j} {repr(float(x[j]))}\n")
+
+
+def read_scip_solution(sol_file, n_cols):
+    """ Parses a SCIP solution file written for a model with columns named x0..xN.
+    Returns (solution or None, solution status line) """
+    x = np.zeros(n_cols)
+    termination = ""
+    has_solution = False
+    with open(sol_file) as f:
+        for line in f:
+            if line.startswith("solution status:"):
+                termination = line.split(":", 1)[1].strip()
+                continue
+            if line.startswith("objective value:"):
+                has_solution = True
+                continue
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].startswith("x") and parts[0][1:].isdigit():
+                x[int(parts[0][1:])] = float(parts[1])
+    return (x if has_solution else None), termination
+
+
+def read_cbc_solution(sol_file, n_cols):
+    """ Parses a CBC solution file for columns named x0..xN. Returns (solution, status line) """
+    x = np.zeros(n_cols)
+    with open(sol_file) as f:
+        termination = f.readline().strip()
+        for line in f:
+            parts = line.replace("**", "").split()
+            if len(parts) >= 3 and parts[1].startswith("x") and parts[1][1:].isdigit():
+                x[int(parts[1][1:])] = float(parts[2])
+    return x, termination
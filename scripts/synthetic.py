@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+from scripts.contractConfig import PPA_ROWS
+from scripts.dataEngine import SHEETS
+from scripts.report import MONTH_NAMES
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def synthetic_sheets(start_year=2025, years=2, lmp_hubs=2, gas_hubs=2, zones=2, ppas=3, movers=True,
+                     maint_share=0.1, seed=0):
+    """ Input sheets with the layout ThermalDispatchInput reads, filled with plausible random data.
+
+    Hours run over whole non-leap years (Feb 29 is left out, as DispatchModel assumes 8760
+    hours). LMPs follow a daily and seasonal shape on top of their gas hub's price, so every
+    contract has profitable and unprofitable hours. Contracts are Base plus PPA1..PPAn with
+    staggered terms; with movers=True every second PPA follows the contract before it (PPA2
+    follows Base, PPA4 follows PPA3, ...).
+    """
+    rng = np.random.default_rng(seed)
+    hours = pd.date_range(f"{start_year}-01-01", f"{start_year + years - 1}-12-31 23:00", freq="h")
+    hours = hours[~((hours.month == 2) & (hours.day == 29))]
+    months = pd.DataFrame({"Year": [y for y in range(start_year, start_year + years) for _ in range(12)],
+                           "Month": list(range(1, 13)) * years})
+    n_months = len(months)
+
+    gas_names = [f"Gas_{chr(65 + i)}" for i in range(gas_hubs)]
+    gas = months.copy()
+    for i, hub in enumerate(gas_names):
+        seasonal = 0.6 * np.cos(2 * np.pi * (months["Month"].to_numpy() - 1) / 12)
+        gas[hub] = np.round(3.0 + 0.3 * i + seasonal + np.cumsum(rng.normal(0, 0.1, n_months)), 3).clip(1.0)
+
+    lmp = pd.DataFrame({"Date": hours.normalize(), "Year": hours.year, "Month": hours.month,
+                        "Day": hours.day, "Hour": hours.hour + 1,
+                        "Weekday": [WEEKDAYS[d] for d in hours.dayofweek],
+                        "Type": np.where((hours.dayofweek < 5) & (hours.hour >= 7) & (hours.hour < 23),
+                                         "OnPeak", "OffPeak"),
+                        "Leap": 0})
+    month_pos = (hours.year.to_numpy() - start_year) * 12 + hours.month.to_numpy() - 1
+    daily = np.sin(2 * np.pi * (hours.hour.to_numpy() - 6) / 24)
+    summer = np.exp(-0.5 * ((hours.month.to_numpy() - 7.5) / 1.5) ** 2)
+    for i in range(lmp_hubs):
+        gas_price = gas[gas_names[i % gas_hubs]].to_numpy()[month_pos]
+        price = gas_price * 7.2 + 12 * daily + 25 * summer * (daily > 0) + rng.normal(0, 6, len(hours))
+        lmp[f"LMP_{chr(65 + i)}"] = np.round(price, 2)
+
+    zone_names = [f"Z{i + 1}" for i in range(zones)]
+    emissions = {}
+    for sheet, level in (("NOx", 2.0), ("SOx", 0.5), ("CO2", 15.0)):
+        frame = months.copy()
+        for z in zone_names:
+            frame[z] = np.round(level * (1 + 0.1 * rng.random(n_months)), 3)
+        emissions[sheet] = frame
+
+    vom = months.copy()
+    vom_types = ["Fixed", "Indexed"]
+    vom["Fixed"] = 3.0
+    vom["Indexed"] = np.round(2.5 * 1.02 ** (months["Year"].to_numpy() - start_year), 3)
+
+    maint = pd.DataFrame({"Year": range(start_year, start_year + years)})
+    for name in MONTH_NAMES:
+        # Spring and autumn outages
+        maint[name] = maint_share if name in ("Apr", "Oct") else np.nan
+
+    adder_st = pd.DataFrame({"Year": range(start_year, start_year + years)})
+    adder_bid = adder_st.copy()
+    for name in MONTH_NAMES:
+        adder_st[name] = 150.0
+        adder_bid[name] = 0.02
+
+    param = pd.DataFrame({"Param": ["SOx_Rate", "NOx_Rate", "CO2_Rate"], "Value": [0.001, 0.01, 0.053]})
+
+    end = f"{start_year + years - 1}-12-31"
+    contracts = {"Base": _contract(rng, f"{start_year}-01-01", end, 0, gas_names[0], "LMP_A",
+                                   zone_names[0], vom_types[0], None, 450)}
+    for k in range(1, ppas + 1):
+        # Later PPAs start later, so contracts overlap in some years only
+        first = start_year + (k - 1) % years
+        mover = None
+        if movers and k % 2 == 0:
+            mover = "Base" if k == 2 else f"PPA{k - 1}"
+            first = max(first, contracts["Base" if k == 2 else f"PPA{k - 1}"]["PPA_Start"].year)
+        contracts[f"PPA{k}"] = _contract(rng, f"{first}-01-01", end, k, gas_names[k % gas_hubs],
+                                         f"LMP_{chr(65 + k % lmp_hubs)}", zone_names[k % zones],
+                                         vom_types[k % 2], mover, 100 + 50 * (k % 3))
+    ppa = pd.DataFrame({"Param": list(PPA_ROWS.values())})
+    for name, values in contracts.items():
+        ppa[name] = [values[label] for label in PPA_ROWS.values()]
+
+    frames = {"df_lmp": lmp, "df_param": param, "df_gas": gas, "df_nox": emissions["NOx"],
+              "df_sox": emissions["SOx"], "df_co2": emissions["CO2"], "df_vom": vom, "df_maint": maint,
+              "df_ppa": ppa, "df_adder_st": adder_st, "df_adder_bid": adder_bid}
+    return {SHEETS[attr]: frame for attr, frame in frames.items()}
+
+
+def _contract(rng, start, end, k, gas_hub, lmp_hub, zone, vom, mover, cap):
+    """ PPA sheet column of one contract, by row label """
+    hot = 3000 + 500 * k
+    return {"Gas_Hub": gas_hub, "LMP_Hub": lmp_hub, "NOx": zone, "SOx": zone, "CO2": zone,
+            "Hot Start Duration (hour)": "H8", "Cold Start Duration (hour)": "H48",
+            "Hot Start Cost ($/start)": hot, "Warm start Cost ($/start)": 2 * hot,
+            "Cold start Cost ($/start)": 3 * hot, "Ramp up rate (MW/min)": 10,
+            "Heat_Rate": round(float(rng.uniform(6800, 7600))),
+            "PPA_Start": pd.Timestamp(start), "PPA_End": pd.Timestamp(end),
+            "Contracted_Min": round(cap * 0.4), "Contracted_Cap": cap, "VOM": vom,
+            "Dispatch_Run": "Yes", "Mover_Dependency": mover, "EOH ($/h)": 25, "LTSA ($/start)": 500}
+
+
+def write_workbook(path, **kwargs):
+    """ Writes synthetic_sheets(**kwargs) as an input workbook and returns its path """
+    sheets = synthetic_sheets(**kwargs)
+    with pd.ExcelWriter(path) as writer:
+        for sheet, frame in sheets.items():
+            frame.to_excel(writer, sheet_name=sheet, index=False)
+    return path
@@ -0,0 +1,174 @@
+import math
+import numpy as np
+from scripts.economics import (hourly_margin, hourly_output, hourly_on_value, start_adders,
+                               start_type_costs, allowed_start_types, runs)
+
+
+def heuristic_schedule(model, schedule=None):
+    """ Feasible 0/1 commitment for a DispatchModel or DispatchModelPPA.
+
+    Starts from `schedule` (e.g. the previous year's or previous run's ON column) when given,
+    otherwise from the hours where being on pays (price above fuel + VOM + emissions at the best
+    output). The schedule is then repaired for min up/down times, runs that do not cover their
+    start cost are dropped, and months over their maintenance limit lose their weakest runs.
+    Hours the model has fixed (fix_commitment) are kept; returns None when the repairs cannot
+    keep them, or when the model has constraints the heuristic does not handle.
+    """
+    if getattr(model, "check_maint_con", False):
+        return None
+
+    T = model.T
+    value = hourly_on_value(model)
+    if schedule is None:
+        on = value > 0
+    else:
+        schedule = np.asarray(schedule, dtype=float)[:T]
+        on = np.zeros(T, dtype=bool)
+        on[:len(schedule)] = np.round(np.nan_to_num(schedule)) == 1
+
+    mover_on = getattr(model, "mover_on", None)
+    if mover_on is not None:
+        on &= np.round(mover_on) == 1
+    fixed = getattr(model, "fixed", {})
+    if fixed:
+        hours = np.array(list(fixed))
+        on[hours] = np.array(list(fixed.values())) == 1
+
+    min_up = getattr(model, "MinUpTime", 1)
+    min_down = getattr(model, "MinDownTime", 1)
+    start_cost = start_adders(model) + start_type_costs(model).min()
+
+    for _ in range(10):
+        before = on.copy()
+        on = _fill_short_gaps(on, min_down)
+        on = _fix_short_runs(on, value, min_up, start_cost)
+        on = _drop_unprofitable_runs(on, value, start_cost)
+        if mover_on is not None:
+            on &= np.round(mover_on) == 1
+        if np.array_equal(before, on):
+            break
+
+    # Final pass that cannot reintroduce a violation: filling gaps only lengthens runs,
+    # dropping short runs only lengthens gaps
+    on = _fill_short_gaps(on, min_down)
+    on = _drop_short_runs(on, min_up)
+
+    if hasattr(model, "maint_per"):
+        on = _apply_maintenance(model, on, value)
+    if fixed and np.any(on[hours] != (np.array(list(fixed.values())) == 1)):
+        return None
+    return on.astype(float)
+
+
+def _fill_short_gaps(on, min_down):
+    """ Turns on off-periods between two runs that are shorter than the minimum down time """
+    on = on.copy()
+    off_runs = runs(~on)
+    for start, end in off_runs:
+        if start > 0 and end < len(on) and end - start < min_down:
+            on[start:end] = True
+    return on
+
+
+def _fix_short_runs(on, value, min_up, start_cost):
+    """ Runs shorter than the minimum up time (other than at the horizon ends) are extended
+    to min_up hours when that pays, and dropped otherwise """
+    on = on.copy()
+    T = len(on)
+    for start, end in runs(on):
+        if end - start >= min_up or start == 0 or end == T:
+            continue
+        new_end = min(start + min_up, T)
+        if value[start:new_end].sum() - start_cost[start] > 0:
+            on[start:new_end] = True
+        else:
+            on[start:end] = False
+    return on
+
+
+def _drop_short_runs(on, min_up):
+    """ Drops runs shorter than the minimum up time, other than at the horizon ends """
+    on = on.copy()
+    for start, end in runs(on):
+        if end - start < min_up and start > 0 and end < len(on):
+            on[start:end] = False
+    return on
+
+
+def _drop_unprofitable_runs(on, value, start_cost):
+    on = on.copy()
+    for start, end in runs(on):
+        cost = start_cost[start] if start > 0 else 0.0
+        if value[start:end].sum() - cost < 0:
+            on[start:end] = False
+    return on
+
+
+def _apply_maintenance(model, on, value):
+    """ Drops whole runs, weakest value per hour first, until each maintenance month is under its limit """
+    on = on.copy()
+    for i in range(len(model.maint_per)):
+        if model.maint_per[i] == 0.0:
+            continue
+        st = model.start_index[i]
+        end = min(st + model.month_days[i] + 1, model.T)
+        limit = model.month_days[i] - math.ceil(model.month_days[i] * model.maint_per[i])
+        while on[st:end].sum() > limit:
+            overlapping = [(s, e) for s, e in runs(on) if s < end and e > st]
+            s, e = min(overlapping, key=lambda r: value[r[0]:r[1]].mean())
+            on[s:e] = False
+    return on
+
+
+def warm_start_values(model, on):
+    """ Values of every model variable implied by a 0/1 ON schedule """
+    T = model.T
+    on = np.asarray(on, dtype=float)
+    switch_on = np.zeros(T)
+    switch_off = np.zeros(T)
+    switch_on[1:] = np.maximum(on[1:] - on[:-1], 0)
+    switch_off[1:] = np.maximum(on[:-1] - on[1:], 0)
+
+    # Cheapest start type the delta_start constraints allow, from the downtime before each start.
+    # DispatchModelPPA does not price start types, so its delta_type stays at 0
+    delta = np.zeros((T, 3))
+    costs = start_type_costs(model)
+    last_off = None
+    for t in range(T if hasattr(model, "MinUpTime") else 0):
+        if switch_off[t] == 1:
+            last_off = t
+        if switch_on[t] == 1:
+            downtime = t - last_off if last_off is not None else None
+            allowed = allowed_start_types(t, downtime, model.t_lowers, model.t_uppers)
+            j = min((k for k in range(3) if allowed[k]), key=lambda k: costs[k])
+            delta[t, j] = 1
+
+    elect = on * hourly_output(model, hourly_margin(model))
+    return {"ON": on, "switch_on": switch_on, "switch_off": switch_off, "delta_type": delta, "elect": elect}
+
+
+def load_warm_start(model, values):
+    """ Loads variable values into the model. Returns the initial solution vector for the matrix
+    engine, None for Pyomo where the values are set on the variables themselves """
+    if model.engine == "matrix":
+        x0 = np.zeros(model.matrix.n_cols)
+        for name, vals in values.items():
+            if name in model.matrix.var_offsets:
+                offset, size = model.matrix.var_offsets[name]
+                x0[offset:offset + size] = np.ravel(vals)
+        return x0
+
+    # Parametric templates leave out the variables that do not enter the model
+    m = model.model
+    has_delta, has_start_cost = hasattr(m, "delta_type"), hasattr(m, "start_cost")
+    for t in range(model.T):
+        m.ON[t].set_value(float(values["ON"][t]))
+        m.switch_on[t].set_value(float(values["switch_on"][t]))
+        m.switch_off[t].set_value(float(values["switch_off"][t]))
+        m.elect[t].set_value(float(values["elect"][t]))
+        if has_start_cost:
+            m.start_cost[t].set_value(0.0)
+        if has_delta:
+            for j in range(3):
+                m.delta_type[t, j].set_value(float(values["delta_type"][t, j]))
+    return None
@@ -0,0 +1,45 @@
+from unittest import mock
+
+import pyomo.environ as pyo
+from pyomo.opt import SolverResults, TerminationCondition
+
+from scripts.solvers import _scip_status, _solve_pyomo_shell
+
+
+def _shell_solve(message, has_solution=True):
+    """ Runs _solve_pyomo_shell on a one-variable model with SolverFactory returning a canned SCIP result """
+    model = pyo.ConcreteModel()
+    model.x = pyo.Var(initialize=2.0)
+    model.obj = pyo.Objective(expr=model.x)
+
+    results = SolverResults()
+    results.solver.termination_condition = TerminationCondition.other
+    results.solver.message = message
+    if has_solution:
+        results.solution.insert(results.solution.add())
+    solver = mock.MagicMock()
+    solver.solve.return_value = results
+    with mock.patch("pyomo.environ.SolverFactory", return_value=solver), \
+            mock.patch.object(model.solutions, "load_from"):
+        return _solve_pyomo_shell("scip", model, {"limits/gap": 0.003}, "scip", False)
+
+
+def test_shell_gap_limit_is_optimal():
+    result = _shell_solve("gap limit reached")
+    assert result.status == "optimal"
+    assert result.objective == 2.0
+    assert result.check("Base") is result
+
+
+def test_shell_other_limits_are_feasible():
+    assert _shell_solve("memory limit reached").status == "feasible"
+    assert _shell_solve("solution limit reached").status == "feasible"
+    assert _shell_solve("gap limit reached", has_solution=False).status == "no_solution"
+
+
+def test_matrix_gap_limit_is_a_normal_finish():
+    assert _scip_status("gap limit reached", True) == "optimal"
+    assert _scip_status("time limit reached", True) == "feasible"
+    assert _scip_status("node limit reached", True) == "feasible"
+    assert _scip_status("memory limit reached", True) == "feasible"
+    assert _scip_status("time limit reached", False) == "no_solution"
@@ -0,0 +1,9 @@
+from scripts.dataEngine import ThermalDispatchInput
+from scripts.synthetic import synthetic_sheets
+
+
+def test_start_durations_parse():
+    thermal_input = ThermalDispatchInput.from_frames(synthetic_sheets(years=1, ppas=2))
+    for name in thermal_input.contracts:
+        hot_st, cold_st = thermal_input.get_start_time(name)
+        assert (hot_st, cold_st) == (8, 48), name